@@ -0,0 +1,141 @@
+"""
+Agrupación de facturas por cliente + email (UN SOLO correo por cliente).
+
+AgrupacionClientes recorre las facturas una sola vez, vectorizado
+(pandas.factorize + numpy.bincount), y calcula:
+
+- el grupo de cada factura (ids en orden de primera aparición),
+- por grupo: los datos del cliente (de su primera factura), los conteos y
+  subtotales por estado, el saldo total y el cupo disponible.
+
+Las listas de facturas de cada grupo (lo que necesita el correo) se arman
+solo para los grupos que se piden, con las mismas facturas de la corrida
+(sin copiarlas); cliente_plano() da la versión con dicts para JSON y
+huellas. Las sumas se acumulan en el orden de las facturas, igual que la
+suma en Python, así los totales no cambian.
+"""
+
+import numpy as np
+import pandas as pd
+
+from facturas import ESTADOS, codigo_estado
+
+
+SUFIJOS_ESTADO = ("vencidas", "proximas", "no_vencidas")
+
+# Datos del cliente (de la primera factura del grupo) y de cada factura
+CAMPOS_CLIENTE = ("cliente", "correo_cliente", "vendedor", "correo_vendedor", "local")
+CAMPOS_FACTURA = ("numero_factura", "fecha_emision", "fecha_vencimiento", "dias", "saldo", "saldo_numerico", "estado")
+
+# Columnas del resumen por grupo
+CAMPOS_RESUMEN = CAMPOS_CLIENTE + (
+    "total_facturas", "total_vencidas", "total_proximas", "total_no_vencidas",
+    "subtotal_vencidas", "subtotal_proximas", "subtotal_no_vencidas",
+    "total_saldo", "cupo", "cupo_disponible"
+)
+
+
+def _codigos(valores):
+    """Códigos enteros por valor, en orden de primera aparición (None es un valor más)."""
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=False)
+    return codigos.astype(np.int64), len(unicos)
+
+
+class AgrupacionClientes:
+    """Facturas (recordatorios) agrupadas por cliente + email."""
+
+    __slots__ = ("recordatorios", "ids", "resumen", "_orden", "_inicios")
+
+    def __init__(self, recordatorios):
+        self.recordatorios = recordatorios
+
+        codigos_cliente, _ = _codigos([r.get("cliente") for r in recordatorios])
+        codigos_correo, cantidad_correos = _codigos([r.get("correo_cliente") for r in recordatorios])
+        ids, _ = pd.factorize(codigos_cliente * cantidad_correos + codigos_correo)
+        ids = ids.astype(np.int64)
+        grupos = int(ids.max()) + 1 if len(ids) else 0
+
+        estados = np.fromiter(
+            (len(ESTADOS) if codigo is None else codigo for codigo in map(codigo_estado, recordatorios)),
+            dtype=np.int64, count=len(recordatorios)
+        )
+        saldos = np.array([r.get("saldo_numerico", 0) for r in recordatorios], dtype=float)
+
+        # Conteo y suma por (grupo, estado); la última columna son estados desconocidos
+        celdas = ids * (len(ESTADOS) + 1) + estados
+        forma = (grupos, len(ESTADOS) + 1)
+        conteos = np.bincount(celdas, minlength=grupos * forma[1]).reshape(forma)
+        subtotales = np.bincount(celdas, weights=saldos, minlength=grupos * forma[1]).reshape(forma)
+        totales = np.bincount(ids, weights=saldos, minlength=grupos)
+
+        primeras = np.unique(ids, return_index=True)[1]
+        resumen = {
+            campo: [recordatorios[i].get(campo) for i in primeras.tolist()]
+            for campo in CAMPOS_CLIENTE
+        }
+        resumen["total_facturas"] = conteos.sum(axis=1).tolist()
+        for i, sufijo in enumerate(SUFIJOS_ESTADO):
+            resumen[f"total_{sufijo}"] = conteos[:, i].tolist()
+        for i, sufijo in enumerate(SUFIJOS_ESTADO):
+            # Sin facturas en el estado el subtotal queda en 0 (entero), como la suma en Python
+            resumen[f"subtotal_{sufijo}"] = [
+                subtotal if conteo else 0
+                for subtotal, conteo in zip(subtotales[:, i].tolist(), conteos[:, i].tolist())
+            ]
+        resumen["total_saldo"] = totales.tolist()
+        resumen["cupo"] = [recordatorios[i].get("cupo", 0) for i in primeras.tolist()]
+        resumen["cupo_disponible"] = [cupo - total for cupo, total in zip(resumen["cupo"], resumen["total_saldo"])]
+
+        self.ids = ids
+        self.resumen = resumen
+        self._orden = np.argsort(ids, kind="stable")
+        self._inicios = np.concatenate(([0], np.cumsum(resumen["total_facturas"], dtype=np.int64)))
+
+    def __len__(self):
+        return len(self._inicios) - 1
+
+    def cliente(self, grupo):
+        """Cliente agrupado `grupo` con sus tres listas de facturas (las de la corrida, sin copiar)."""
+        resumen = self.resumen
+        facturas = {estado: [] for estado in ESTADOS}
+        for posicion in self._orden[self._inicios[grupo]:self._inicios[grupo + 1]].tolist():
+            recordatorio = self.recordatorios[posicion]
+            lista = facturas.get(recordatorio.get("estado"))
+            if lista is not None:
+                lista.append(recordatorio)
+
+        cliente = {campo: resumen[campo][grupo] for campo in CAMPOS_CLIENTE}
+        for estado, sufijo in zip(ESTADOS, SUFIJOS_ESTADO):
+            cliente[f"facturas_{sufijo}"] = facturas[estado]
+        for campo in CAMPOS_RESUMEN[len(CAMPOS_CLIENTE):]:
+            cliente[campo] = resumen[campo][grupo]
+        return cliente
+
+    def clientes(self, grupos=None):
+        """Clientes agrupados de `grupos` (todos si es None), en orden de grupo y sin repetidos."""
+        if grupos is None:
+            grupos = range(len(self))
+        else:
+            grupos = sorted({g for g in grupos if 0 <= g < len(self)})
+        return [self.cliente(g) for g in grupos]
+
+    def columnas(self, grupos):
+        """Resumen de `grupos` en columnas, con su "id"."""
+        columnas = {"id": list(grupos)}
+        for campo in CAMPOS_RESUMEN:
+            valores = self.resumen[campo]
+            columnas[campo] = [valores[g] for g in grupos]
+        return columnas
+
+
+def cliente_plano(cliente):
+    """
+    Cliente agrupado con cada factura como dict de CAMPOS_FACTURA (solo
+    tipos básicos): para guardarlo en JSON o calcular su huella.
+    """
+    plano = dict(cliente)
+    for sufijo in SUFIJOS_ESTADO:
+        clave = f"facturas_{sufijo}"
+        if clave in plano:
+            plano[clave] = [{campo: factura.get(campo) for campo in CAMPOS_FACTURA} for factura in plano[clave]]
+    return plano
@@ -1,794 +1,117 @@
 import os
 import json
-import smtplib
+import cProfile
+import time
 import webbrowser
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
-from threading import Timer
-from dotenv import load_dotenv
-from datetime import datetime, date, timedelta
-import pandas as pd
-from io import BytesIO
-
-
-# Cargar variables de entorno desde .env
-load_dotenv()
+from werkzeug.exceptions import RequestEntityTooLarge
+from threading import Lock, Timer
+from datetime import datetime
+
+import metricas
+import registro
+import subidas
+from corridas import AlmacenCorridas
+from compresion import comprimir_respuesta
+from facturas import como_dicts
+import procesamiento
+from procesamiento import (
+    EMAIL_HOST, EMAIL_PASSWORD, EMAIL_PORT, EMAIL_USER, SEGUNDOS_ETAPA, TiposNoDetectados,
+    agrupar_recordatorios_por_cliente, cache_clientes, enviar_email_individual, iniciar_envio,
+    procesar_archivos, registrar_resumen_agrupacion, trabajos_envio
+)
 
 
 app = Flask(__name__)
 CORS(app)
 
+# Registro según LOG_NIVEL, LOG_FORMATO y LOG_MUESTRA (leídos en procesamiento.py)
+registro.configurar(procesamiento.LOG_NIVEL, procesamiento.LOG_FORMATO, procesamiento.LOG_MUESTRA)
+log = registro.obtener("app")
 
-# ==========================================
-# CONFIGURACIÓN DE CORREO ELECTRÓNICO
-# ==========================================
-EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
-EMAIL_USER = os.getenv("EMAIL_USER", "")  
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")  
-EMAIL_FROM_NAME = os.getenv("EMAIL_FROM_NAME", "Cartera Lomarosa")
-EMAIL_FROM_ADDRESS = os.getenv("EMAIL_FROM_ADDRESS", EMAIL_USER)
-
-
-MAX_WORKERS = int(os.getenv("MAX_WORKERS", "3"))
+# Pool SMTP, bitácora, reintentos y planificador (con la cola guardada en la
+# bitácora): el servidor los necesita desde la primera petición
+procesamiento.inicializar()
 
 
 # ==========================================
-# FUNCIONES DE NORMALIZACIÓN
+# CORRIDAS DE PROCESAMIENTO
 # ==========================================
+# Los recordatorios de cada /procesar-excel quedan en el servidor para que
+# /enviar-correos reciba solo el id de la corrida y la selección de clientes.
+CORRIDAS_TTL = int(os.getenv("CORRIDAS_TTL", "3600"))
+CORRIDAS_MAX = int(os.getenv("CORRIDAS_MAX", "8"))
+CORRIDAS_MAX_FACTURAS = int(os.getenv("CORRIDAS_MAX_FACTURAS", "500000"))
 
+corridas = AlmacenCorridas(ttl=CORRIDAS_TTL, max_corridas=CORRIDAS_MAX, max_facturas=CORRIDAS_MAX_FACTURAS)
 
-def normalizar_nombre(nombre):
-    """Normaliza un nombre para hacer matching: trim + lowercase"""
-    if not nombre:
-        return ""
-    return str(nombre).strip().lower()
-
-
-def normalizar_columna(col):
-    """Normaliza nombre de columna para búsqueda flexible"""
-    return str(col).strip().lower().replace('  ', ' ')
+# Formato columnar de /procesar-excel (?formato=columnar): facturas por página.
+# Las respuestas JSON desde COMPRIMIR_DESDE bytes van comprimidas (br o gzip).
+FACTURAS_POR_PAGINA = int(os.getenv("FACTURAS_POR_PAGINA", "20000"))
+COMPRIMIR_DESDE = int(os.getenv("COMPRIMIR_DESDE", "1024"))
 
 
 # ==========================================
-# FUNCIONES DE AGRUPACIÓN
+# SUBIDAS DE ARCHIVOS
 # ==========================================
+# Los Excel subidos se escriben en temporales en SUBIDAS_DIR (vacío = la
+# carpeta temporal del sistema) y se leen por mmap (subidas.py). Un archivo
+# de más de SUBIDA_MAX_MB se rechaza con 413 mientras se recibe (0 = sin límite).
+SUBIDAS_DIR = os.getenv("SUBIDAS_DIR", "")
+SUBIDA_MAX_MB = float(os.getenv("SUBIDA_MAX_MB", "100"))
+if SUBIDAS_DIR:
+    os.makedirs(SUBIDAS_DIR, exist_ok=True)
 
 
-def agrupar_recordatorios_por_cliente(recordatorios):
-    """
-    Agrupa recordatorios por cliente+email (sin separar por estado).
-
-    Retorna una estructura unificada con:
-    - facturas_vencidas[]
-    - facturas_proximas[]
-    - facturas_no_vencidas[]
-    - métricas agregadas
-    """
-    agrupados = {}
-
-    for recordatorio in recordatorios:
-        cliente_nombre = recordatorio.get("cliente")
-        cliente_email = recordatorio.get("correo_cliente")
-        estado = recordatorio.get("estado")
-
-        # Key único: cliente + email (UN SOLO correo por cliente)
-        key = f"{cliente_nombre}|{cliente_email}"
-
-        if key not in agrupados:
-            agrupados[key] = {
-                "cliente": cliente_nombre,
-                "correo_cliente": cliente_email,
-                "vendedor": recordatorio.get("vendedor"),
-                "correo_vendedor": recordatorio.get("correo_vendedor"),
-                "local": recordatorio.get("local"),
-                "facturas_vencidas": [],
-                "facturas_proximas": [],
-                "facturas_no_vencidas": [],
-                "total_facturas": 0,
-                "total_vencidas": 0,
-                "total_proximas": 0,
-                "total_no_vencidas": 0,
-                "total_saldo": 0,
-                "cupo": recordatorio.get("cupo", 0),
-                "cupo_disponible": 0  # Se calcula al final
-            }
-
-        # Construir objeto de factura
-        factura_obj = {
-            "numero_factura": recordatorio.get("numero_factura"),
-            "fecha_emision": recordatorio.get("fecha_emision"),
-            "fecha_vencimiento": recordatorio.get("fecha_vencimiento"),
-            "dias": recordatorio.get("dias"),
-            "saldo": recordatorio.get("saldo"),
-            "saldo_numerico": recordatorio.get("saldo_numerico"),
-            "estado": estado
-        }
-
-        # Clasificar en array correspondiente
-        if estado == "vencido":
-            agrupados[key]["facturas_vencidas"].append(factura_obj)
-            agrupados[key]["total_vencidas"] += 1
-        elif estado == "proximo":
-            agrupados[key]["facturas_proximas"].append(factura_obj)
-            agrupados[key]["total_proximas"] += 1
-        elif estado == "no_vencido":
-            agrupados[key]["facturas_no_vencidas"].append(factura_obj)
-            agrupados[key]["total_no_vencidas"] += 1
-
-        # Actualizar métricas generales
-        agrupados[key]["total_facturas"] += 1
-        agrupados[key]["total_saldo"] += recordatorio.get("saldo_numerico", 0)
-
-    # Calcular cupo_disponible para cada cliente
-    for cliente in agrupados.values():
-        cliente["cupo_disponible"] = cliente["cupo"] - cliente["total_saldo"]
+class Solicitud(subidas.SolicitudEnDisco):
+    directorio_subidas = SUBIDAS_DIR or None
+    max_bytes_subida = int(SUBIDA_MAX_MB * 1024 * 1024)
 
-    resultado = list(agrupados.values())
 
-    print(f"\n[INFO] Agrupación unificada por cliente + email:")
-    print(f"  - Recordatorios individuales (facturas): {len(recordatorios)}")
-    print(f"  - Clientes únicos a notificar: {len(resultado)}")
-
-    total_vencidas = sum(c["total_vencidas"] for c in resultado)
-    total_proximas = sum(c["total_proximas"] for c in resultado)
-    total_no_vencidas = sum(c["total_no_vencidas"] for c in resultado)
-
-    print(f"    • Total facturas vencidas: {total_vencidas}")
-    print(f"    • Total facturas próximas: {total_proximas}")
-    print(f"    • Total facturas no vencidas: {total_no_vencidas}")
-    print(f"  - Nota: Cada cliente recibirá UN SOLO correo con todas sus facturas")
-
-    return resultado
-
-
-
-
-def dividir_en_lotes(recordatorios, limite=450):
-    """Divide los recordatorios en lotes de máximo 'limite' correos."""
-    lote1 = recordatorios[:limite]
-    lote2 = recordatorios[limite:]
-    return lote1, lote2
+app.request_class = Solicitud
 
 
 # ==========================================
-# FUNCIONES DE LECTURA DE EXCEL
+# MÉTRICAS Y PERFILES
 # ==========================================
+# /metrics expone en formato Prometheus las métricas de procesamiento.py
+# (duración de cada etapa y contadores de envío). Con PERFILES_DIR
+# configurado, /procesar-excel?perfil=1 guarda un perfil de cProfile de esa
+# petición en ese directorio. Vacío = desactivado.
+PERFILES_DIR = os.getenv("PERFILES_DIR", "")
 
-
-def detectar_tipo_excel(df):
-    """Detecta si el Excel es Excel 1 (Clientes) o Excel 2 (Cartera) según sus columnas."""
-    columnas_lower = [normalizar_columna(col) for col in df.columns]
-    columnas_str = " ".join(columnas_lower)
-    
-    print("=" * 60)
-    print(f"[DEBUG] Detectando tipo de Excel...")
-    print(f"[DEBUG] Total columnas: {len(columnas_lower)}")
-    print(f"[DEBUG] Primeras 15 columnas: {columnas_lower[:15]}")
-    print("=" * 60)
-    
-    tiene_nit = "nit" in columnas_str
-    tiene_cliente = "cliente" in columnas_str
-    tiene_correo_cliente = "correo cliente" in columnas_str or "correocliente" in columnas_str.replace(' ', '')
-    
-    tiene_nombre_tercero = "nombre tercero" in columnas_str or "nombretercero" in columnas_str.replace(' ', '')
-    tiene_numero_fac = "numero fac" in columnas_str or "numerofac" in columnas_str.replace(' ', '') or " fac " in columnas_str
-    tiene_vencimiento = "vencimiento" in columnas_str
-    tiene_dias = "dias" in columnas_str or "días" in columnas_str
-    tiene_saldo = "saldo" in columnas_str
-    
-    print(f"[DEBUG] Verificación Excel 1:")
-    print(f"  - tiene_nit: {tiene_nit}")
-    print(f"  - tiene_cliente: {tiene_cliente}")
-    print(f"  - tiene_correo_cliente: {tiene_correo_cliente}")
-    print()
-    print(f"[DEBUG] Verificación Excel 2:")
-    print(f"  - tiene_nombre_tercero: {tiene_nombre_tercero}")
-    print(f"  - tiene_numero_fac: {tiene_numero_fac}")
-    print(f"  - tiene_vencimiento: {tiene_vencimiento}")
-    print(f"  - tiene_dias: {tiene_dias}")
-    print(f"  - tiene_saldo: {tiene_saldo}")
-    print("=" * 60)
-    
-    if tiene_nit and tiene_cliente and tiene_correo_cliente:
-        print("[DEBUG] ✓ Detectado como: CLIENTES")
-        return "clientes"
-    elif tiene_nombre_tercero and tiene_numero_fac and tiene_vencimiento and tiene_dias and tiene_saldo:
-        print("[DEBUG] ✓ Detectado como: CARTERA")
-        return "cartera"
-    else:
-        print("[DEBUG] ✗ NO DETECTADO (devolviendo None)")
-        return None
-
-
-def buscar_columna_exacta(df, nombres_esperados):
-    """Busca una columna en el DataFrame con nombres esperados (flexible con espacios)."""
-    columnas_map = {normalizar_columna(col): col for col in df.columns}
-    
-    for nombre_esperado in nombres_esperados:
-        nombre_norm = normalizar_columna(nombre_esperado)
-        
-        if nombre_norm in columnas_map:
-            return columnas_map[nombre_norm]
-        
-        nombre_sin_espacios = nombre_norm.replace(' ', '')
-        for col_norm, col_original in columnas_map.items():
-            if nombre_sin_espacios == col_norm.replace(' ', ''):
-                return col_original
-        
-        for col_norm, col_original in columnas_map.items():
-            if nombre_norm in col_norm or nombre_sin_espacios in col_norm.replace(' ', ''):
-                return col_original
-    
-    return None
-
-
-def leer_excel_clientes(archivo_bytes):
-    """Lee Excel 1 (Clientes y Vendedores) y retorna dos diccionarios."""
-    df = pd.read_excel(BytesIO(archivo_bytes))
-
-    print(f"[DEBUG] Columnas en Excel 1: {list(df.columns)}")
-
-    col_nit = buscar_columna_exacta(df, ["Nit", "NIT"])
-    col_cliente = buscar_columna_exacta(df, ["Cliente", "cliente"])
-    col_nombre_comercial = buscar_columna_exacta(df, ["Nombre comercial", "Nombrecomercial"])
-    col_correo_cliente = buscar_columna_exacta(df, ["Correo cliente", "Correocliente", "Email cliente"])
-    col_vendedor = buscar_columna_exacta(df, ["Vendedor", "vendedor"])
-    col_correo_vendedor = buscar_columna_exacta(df, ["Correo vendedor", "Correovendedor", "Email vendedor"])
-    col_canal = buscar_columna_exacta(df, ["Canal", "canal"])
-    col_cupo = buscar_columna_exacta(df, ["Cupo", "cupo", "Cupo de crédito", "Cupo de credito", "Cupo credito"])
-
-    if not col_cliente:
-        raise ValueError(f"No se encontró columna 'Cliente' en Excel 1. Columnas: {list(df.columns)}")
-    if not col_correo_cliente:
-        raise ValueError(f"No se encontró columna 'Correo cliente' en Excel 1. Columnas: {list(df.columns)}")
-
-    print(f"[INFO] Columnas detectadas en Excel 1:")
-    print(f"  - Cliente: {col_cliente}")
-    print(f"  - Correo cliente: {col_correo_cliente}")
-    print(f"  - Vendedor: {col_vendedor}")
-    print(f"  - Correo vendedor: {col_correo_vendedor}")
-    print(f"  - Cupo: {col_cupo if col_cupo else '❌ NO ENCONTRADO (se usará $0)'}")
-
-    dict_clientes = {}
-    dict_vendedores = {}
-
-    for _, row in df.iterrows():
-        cliente = row[col_cliente] if pd.notna(row[col_cliente]) else None
-        correo_cliente = row[col_correo_cliente] if pd.notna(row[col_correo_cliente]) else None
-
-        if cliente and correo_cliente:
-            cliente_norm = normalizar_nombre(cliente)
-            if cliente_norm:
-                # Procesar cupo (validar que sea numérico)
-                cupo_valor = 0
-                if col_cupo and pd.notna(row[col_cupo]):
-                    try:
-                        cupo_valor = float(row[col_cupo])
-                    except (ValueError, TypeError):
-                        cupo_valor = 0
-                        print(f"[WARNING] Cupo inválido para cliente '{cliente}': {row[col_cupo]}")
-
-                dict_clientes[cliente_norm] = {
-                    "nit": str(row[col_nit]).strip() if col_nit and pd.notna(row[col_nit]) else "N/A",
-                    "cliente": str(cliente).strip(),
-                    "nombre_comercial": str(row[col_nombre_comercial]).strip() if col_nombre_comercial and pd.notna(row[col_nombre_comercial]) else "N/A",
-                    "correo_cliente": str(correo_cliente).strip(),
-                    "canal": str(row[col_canal]).strip() if col_canal and pd.notna(row[col_canal]) else "N/A",
-                    "cupo": cupo_valor
-                }
-
-        if col_vendedor and col_correo_vendedor:
-            vendedor = row[col_vendedor] if pd.notna(row[col_vendedor]) else None
-            correo_vendedor = row[col_correo_vendedor] if pd.notna(row[col_correo_vendedor]) else None
-
-            if vendedor and correo_vendedor:
-                vendedor_norm = normalizar_nombre(vendedor)
-                if vendedor_norm:
-                    dict_vendedores[vendedor_norm] = str(correo_vendedor).strip()
-
-    print(f"[INFO] Excel 1 procesado: {len(dict_clientes)} clientes, {len(dict_vendedores)} vendedores")
-
-    return dict_clientes, dict_vendedores
-
-
-def leer_excel_cartera(archivo_bytes, dict_clientes, dict_vendedores):
-    """Lee Excel 2 (Cartera) - Procesa TODAS las facturas (vencidas, próximas y no vencidas)."""
-    df = pd.read_excel(BytesIO(archivo_bytes), sheet_name="Cartera por edades", header=11)
-
-    col_nombre_tercero = buscar_columna_exacta(df, ["Nombre tercero", "Nombretercero", "Cliente"])
-    col_numero_fac = buscar_columna_exacta(df, ["Numero FAC", "NumeroFAC", "Factura", "Numero Factura"])
-    col_emision = buscar_columna_exacta(df, ["Emision", "Emisión", "Fecha Emision", "FechaEmision"])
-    col_vencimiento = buscar_columna_exacta(df, ["Vencimiento", "Fecha Vencimiento", "FechaVencimiento"])
-    col_saldo = buscar_columna_exacta(df, ["Saldo", "saldo"])
-    col_vendedor = buscar_columna_exacta(df, ["Vendedor", "vendedor"])
-    col_local = buscar_columna_exacta(df, ["Local", "local", "Sucursal", "sucursal"])
-
-    columnas_faltantes = []
-    if not col_nombre_tercero: columnas_faltantes.append("Nombre tercero")
-    if not col_numero_fac: columnas_faltantes.append("Numero FAC")
-    if not col_vencimiento: columnas_faltantes.append("Vencimiento")
-    if not col_saldo: columnas_faltantes.append("Saldo")
-
-    if columnas_faltantes:
-        raise ValueError(f"Columnas faltantes: {', '.join(columnas_faltantes)}")
-
-    print(f"[INFO] Columnas detectadas en Excel 2:")
-    print(f"  - Nombre tercero: {col_nombre_tercero}")
-    print(f"  - Numero FAC: {col_numero_fac}")
-    print(f"  - Vencimiento: {col_vencimiento}")
-    print(f"  - Saldo: {col_saldo}")
-
-    recordatorios = []
-    sin_cliente = 0
-    vencimiento_vacio = 0
-    saldo_cero = 0
-
-    # Contadores por categoría
-    vencidas = 0
-    proximas = 0
-    no_vencidas = 0
-
-    hoy = date.today()
-    print(f"\n[INFO] Fecha de HOY: {hoy.strftime('%d/%m/%Y')}")
-    print(f"\n[DEBUG] Clientes NO identificados en Excel 1:")
-    print("-" * 80)
-
-    for _, row in df.iterrows():
-        nombre_tercero = row[col_nombre_tercero] if pd.notna(row[col_nombre_tercero]) else None
-        if not nombre_tercero:
-            continue
-
-        nombre_tercero_norm = normalizar_nombre(nombre_tercero)
-
-        if nombre_tercero_norm not in dict_clientes:
-            sin_cliente += 1
-            print(f"  [{sin_cliente}] NO ENCONTRADO")
-            print(f"       Original: '{nombre_tercero}'")
-            print(f"       Normalizado: '{nombre_tercero_norm}'")
-            print()
-            continue
-
-        cliente_info = dict_clientes[nombre_tercero_norm]
-        correo_cliente = cliente_info["correo_cliente"]
-        cliente_nombre = cliente_info["cliente"]
-        cupo_cliente = cliente_info.get("cupo", 0)
-
-        vendedor = row[col_vendedor] if col_vendedor and pd.notna(row[col_vendedor]) else None
-        correo_vendedor = None
-
-        if vendedor:
-            vendedor_norm = normalizar_nombre(vendedor)
-            if vendedor_norm in dict_vendedores:
-                correo_vendedor = dict_vendedores[vendedor_norm]
-
-        numero_fac = row[col_numero_fac] if pd.notna(row[col_numero_fac]) else "N/A"
-        emision = row[col_emision] if col_emision and pd.notna(row[col_emision]) else None
-        vencimiento = row[col_vencimiento] if pd.notna(row[col_vencimiento]) else None
-        saldo = row[col_saldo] if pd.notna(row[col_saldo]) else 0
-
-        if not pd.notna(vencimiento):
-            vencimiento_vacio += 1
-            continue
-
-        try:
-            saldo_float = float(saldo)
-            if saldo_float == 0:
-                saldo_cero += 1
-                continue
-        except:
-            saldo_float = 0
-
-        try:
-            vencimiento_date = pd.to_datetime(vencimiento).date()
-            dias = (vencimiento_date - hoy).days
-        except Exception as e:
-            print(f"[ERROR] Factura {numero_fac}: Error al calcular días: {e}")
-            continue
-
-        # CAMBIO: NO filtrar por ventana de días, procesar TODAS las facturas
-
-        try:
-            emision_str = pd.to_datetime(emision).strftime("%d/%m/%Y") if pd.notna(emision) else "N/A"
-        except:
-            emision_str = str(emision) if emision else "N/A"
-
-        vencimiento_str = vencimiento_date.strftime("%d/%m/%Y")
-
-        try:
-            saldo_formateado = f"${saldo_float:,.0f}"
-        except:
-            saldo_formateado = "$0"
-
-        # CAMBIO: Clasificar en 3 categorías
-        if dias < 0:
-            estado = "vencido"
-            badge_class = "badge-danger"
-            vencidas += 1
-        elif dias <= 5:
-            estado = "proximo"
-            badge_class = "badge-warning"
-            proximas += 1
-        else:
-            estado = "no_vencido"
-            badge_class = "badge-success"
-            no_vencidas += 1
-
-        local = row[col_local] if col_local and pd.notna(row[col_local]) else "N/A"
-
-        recordatorios.append({
-            "cliente": cliente_nombre,
-            "correo_cliente": correo_cliente,
-            "vendedor": vendedor if vendedor else "N/A",
-            "correo_vendedor": correo_vendedor if correo_vendedor else "N/A",
-            "local": str(local),
-            "numero_factura": str(numero_fac),
-            "fecha_emision": emision_str,
-            "fecha_vencimiento": vencimiento_str,
-            "dias": dias,
-            "saldo": saldo_formateado,
-            "saldo_numerico": saldo_float,
-            "estado": estado,
-            "badge_class": badge_class,
-            "cupo": cupo_cliente
-        })
-
-    print("-" * 80)
-
-    print(f"\n[INFO] Excel 2 procesado:")
-    print(f"  - Total recordatorios generados: {len(recordatorios)}")
-    print(f"    • Vencidas (días < 0): {vencidas}")
-    print(f"    • Próximas (0 <= días <= 5): {proximas}")
-    print(f"    • No vencidas (días > 5): {no_vencidas}")
-    print(f"  - Sin cliente (omitidos): {sin_cliente}")
-    print(f"  - Vencimiento vacío: {vencimiento_vacio}")
-    print(f"  - Saldo en cero: {saldo_cero}")
-
-    return recordatorios
+# cProfile admite un solo perfil activo a la vez
+_perfil_lock = Lock()
 
 
 # ==========================================
-# FUNCIONES DE ENVÍO DE CORREO
+# REENVÍOS Y REANUDACIONES
 # ==========================================
+# Trabajo que está reanudando cada lote de la bitácora. El lock lo comparten
+# los reenvíos de fallidos y las reanudaciones: cada uno decide qué enviar y
+# consume la cuota sin que otro lo haga a la vez con los mismos clientes.
+reanudaciones = {}
+lock_reanudaciones = Lock()
 
 
-def crear_mensaje_email(destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto=None):
-    """Crea un mensaje de email en formato MIME con CC."""
-    mensaje = MIMEMultipart("alternative")
-    mensaje["Subject"] = asunto
-    mensaje["From"] = f"{EMAIL_FROM_NAME} <{EMAIL_FROM_ADDRESS}>"
-    mensaje["To"] = destinatario_principal
-    
-    if destinatario_cc:
-        mensaje["Cc"] = destinatario_cc
-    
-    if cuerpo_texto:
-        parte_texto = MIMEText(cuerpo_texto, "plain", "utf-8")
-        mensaje.attach(parte_texto)
-    
-    parte_html = MIMEText(cuerpo_html, "html", "utf-8")
-    mensaje.attach(parte_html)
-    
-    return mensaje
-
-
-def enviar_email_individual(destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto=None):
-    """Envía un correo electrónico individual con CC opcional."""
-    try:
-        if not EMAIL_USER or not EMAIL_PASSWORD:
-            return {
-                "success": False,
-                "destinatario": destinatario_principal,
-                "error": "Credenciales de correo no configuradas. Revisa el archivo .env"
-            }
-        
-        if not destinatario_principal or "@" not in destinatario_principal:
-            return {
-                "success": False,
-                "destinatario": destinatario_principal,
-                "error": "Email de destinatario principal inválido"
-            }
-        
-        mensaje = crear_mensaje_email(destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto)
-        
-        destinatarios = [destinatario_principal]
-        if destinatario_cc and "@" in destinatario_cc:
-            destinatarios.append(destinatario_cc)
-        
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=30) as server:
-            server.ehlo()
-            server.starttls()  
-            server.ehlo()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_FROM_ADDRESS, destinatarios, mensaje.as_string())
-        
-        return {
-            "success": True,
-            "destinatario": destinatario_principal,
-            "destinatario_cc": destinatario_cc,
-            "error": None
-        }
-    
-    except smtplib.SMTPAuthenticationError:
-        return {
-            "success": False,
-            "destinatario": destinatario_principal,
-            "error": "Error de autenticación SMTP. Verifica tu correo y contraseña de aplicación."
-        }
-    
-    except smtplib.SMTPException as e:
-        return {
-            "success": False,
-            "destinatario": destinatario_principal,
-            "error": f"Error SMTP: {str(e)}"
-        }
-    
-    except Exception as e:
-        return {
-            "success": False,
-            "destinatario": destinatario_principal,
-            "error": f"Error inesperado: {str(e)}"
-        }
-
-
-def generar_html_recordatorio_agrupado(cliente_agrupado):
-    """Genera HTML con TRES secciones: Vencidas, Próximas y No Vencidas."""
-    cliente = cliente_agrupado.get("cliente", "Cliente")
-    correo_vendedor = cliente_agrupado.get("correo_vendedor", "N/A")
-    vendedor = cliente_agrupado.get("vendedor", "N/A")
-
-    facturas_vencidas = cliente_agrupado.get("facturas_vencidas", [])
-    facturas_proximas = cliente_agrupado.get("facturas_proximas", [])
-    facturas_no_vencidas = cliente_agrupado.get("facturas_no_vencidas", [])
-
-    total_facturas = cliente_agrupado.get("total_facturas", 0)
-    total_vencidas = cliente_agrupado.get("total_vencidas", 0)
-    total_proximas = cliente_agrupado.get("total_proximas", 0)
-    total_no_vencidas = cliente_agrupado.get("total_no_vencidas", 0)
-    total_saldo = cliente_agrupado.get("total_saldo", 0)
-    cupo = cliente_agrupado.get("cupo", 0)
-    cupo_disponible = cliente_agrupado.get("cupo_disponible", 0)
-
-    logo_url = "https://images.jumpseller.com/store/lomarosa/store/logo/LR_LogotipoEslogan_CMYK.png?1662998750"
-
-    # Formatear montos
-    total_saldo_formateado = f"${total_saldo:,.0f}"
-    cupo_formateado = f"${cupo:,.0f}"
-    cupo_disponible_formateado = f"${cupo_disponible:,.0f}"
-
-    # Color para cupo disponible (rojo si es negativo, verde si es positivo)
-    cupo_disponible_color = "#dc2626" if cupo_disponible < 0 else "#10b981"
-    cupo_disponible_emoji = "⚠️" if cupo_disponible < 0 else "✅"
-
-    def generar_tabla_facturas(facturas, titulo, color_bg, emoji):
-        """Helper para generar tabla de facturas por categoría."""
-        if len(facturas) == 0:
-            return ""
-
-        filas = ""
-        for factura in facturas:
-            filas += f"""
-            <tr style="border-bottom: 1px solid #e0e0e0;">
-                <td style="padding: 10px; font-weight: bold;">{factura['numero_factura']}</td>
-                <td style="padding: 10px; text-align: center;">{factura['fecha_emision']}</td>
-                <td style="padding: 10px; text-align: center;">{factura['fecha_vencimiento']}</td>
-                <td style="padding: 10px; text-align: center;">{factura['dias']} días</td>
-                <td style="padding: 10px; text-align: right; font-weight: bold;">{factura['saldo']}</td>
-            </tr>
-            """
-
-        subtotal = sum(f["saldo_numerico"] for f in facturas)
-        subtotal_formateado = f"${subtotal:,.0f}"
-
-        return f"""
-        <div style="margin: 30px 0;">
-            <h3 style="color: {color_bg}; border-bottom: 3px solid {color_bg}; padding-bottom: 10px; margin-bottom: 15px;">
-                {emoji} {titulo} ({len(facturas)})
-            </h3>
-            <table style="width: 100%; border-collapse: collapse; margin: 15px 0;">
-                <thead>
-                    <tr style="background-color: {color_bg}; color: white;">
-                        <th style="padding: 12px; text-align: left;">Factura</th>
-                        <th style="padding: 12px; text-align: center;">Emisión</th>
-                        <th style="padding: 12px; text-align: center;">Vencimiento</th>
-                        <th style="padding: 12px; text-align: center;">Días</th>
-                        <th style="padding: 12px; text-align: right;">Saldo</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {filas}
-                    <tr style="background-color: #f8f9fa; font-weight: bold; border-top: 2px solid {color_bg};">
-                        <td colspan="4" style="text-align: right; padding: 12px;">SUBTOTAL:</td>
-                        <td style="text-align: right; padding: 12px;">{subtotal_formateado}</td>
-                    </tr>
-                </tbody>
-            </table>
-        </div>
-        """
-
-    # Generar secciones solo si hay facturas
-    seccion_vencidas = generar_tabla_facturas(
-        facturas_vencidas,
-        "FACTURAS VENCIDAS",
-        "#dc2626",
-        "🔴"
-    )
-
-    seccion_proximas = generar_tabla_facturas(
-        facturas_proximas,
-        "FACTURAS PRÓXIMAS A VENCER (≤ 5 días)",
-        "#f59e0b",
-        "🟡"
-    )
-
-    seccion_no_vencidas = generar_tabla_facturas(
-        facturas_no_vencidas,
-        "FACTURAS NO VENCIDAS (> 5 días)",
-        "#10b981",
-        "🟢"
-    )
-
-    total_saldo_formateado = f"${total_saldo:,.0f}"
-
-    return f"""
-    <!DOCTYPE html>
-    <html lang="es">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <style>
-            body {{font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 900px; margin: 0 auto; padding: 20px;}}
-            .container {{background-color: white; border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);}}
-            .logo {{text-align: center; padding: 25px;}}
-            .logo img {{max-width: 250px;}}
-            .header {{background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;}}
-            .header h1 {{margin: 0; font-size: 26px;}}
-            .content {{padding: 30px;}}
-            .resumen {{display: flex; justify-content: space-around; margin: 20px 0; background-color: #f8f9fa; padding: 20px; border-radius: 8px; flex-wrap: wrap;}}
-            .resumen-item {{text-align: center; margin: 10px;}}
-            .resumen-numero {{font-size: 32px; font-weight: bold; color: #667eea;}}
-            .info-vendedor {{background-color: #e3f2fd; padding: 15px; margin: 20px 0; border-left: 4px solid #2196F3; border-radius: 4px;}}
-            .footer {{background-color: #0f172a; color: #94a3b8; padding: 25px; text-align: center; border-radius: 0 0 10px 10px;}}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="logo">
-                <img src="{logo_url}" alt="Lomarosa">
-            </div>
-
-            <div class="header">
-                <h1>📧 Recordatorio de Estado de Facturas</h1>
-                <p>Cliente: <strong>{cliente}</strong></p>
-            </div>
-
-            <div class="content">
-                <p>Estimado Cliente <strong>{cliente}</strong>,</p>
-                <p>A continuación presentamos el estado completo de sus facturas pendientes:</p>
-
-                <div class="resumen">
-                    <div class="resumen-item">
-                        <div class="resumen-numero">{total_facturas}</div>
-                        <div>Total Facturas</div>
-                    </div>
-                    <div class="resumen-item">
-                        <div class="resumen-numero" style="color: #dc2626;">{total_vencidas}</div>
-                        <div>🔴 Vencidas</div>
-                    </div>
-                    <div class="resumen-item">
-                        <div class="resumen-numero" style="color: #f59e0b;">{total_proximas}</div>
-                        <div>🟡 Próximas</div>
-                    </div>
-                    <div class="resumen-item">
-                        <div class="resumen-numero" style="color: #10b981;">{total_no_vencidas}</div>
-                        <div>🟢 No Vencidas</div>
-                    </div>
-                    <div class="resumen-item">
-                        <div class="resumen-numero" style="color: #dc2626;">{total_saldo_formateado}</div>
-                        <div>💰 Total Cartera</div>
-                    </div>
-                    <div class="resumen-item">
-                        <div class="resumen-numero" style="color: {cupo_disponible_color};">{cupo_disponible_emoji} {cupo_disponible_formateado}</div>
-                        <div>Cupo Disponible</div>
-                    </div>
-                </div>
-
-                {seccion_vencidas}
-                {seccion_proximas}
-                {seccion_no_vencidas}
-
-                <div style="background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%); padding: 20px; margin: 30px 0; border-radius: 8px; border-top: 4px solid #667eea;">
-                    <h3 style="margin: 0 0 10px 0; text-align: center;">TOTAL GENERAL</h3>
-                    <p style="font-size: 32px; font-weight: bold; text-align: center; margin: 0; color: #667eea;">{total_saldo_formateado}</p>
-                    <p style="text-align: center; margin: 10px 0 0 0; font-size: 14px; color: #666;">Total de {total_facturas} facturas pendientes</p>
-                </div>
-
-                <div class="info-vendedor">
-                    <strong>👤 Vendedor asignado:</strong> {vendedor}<br>
-                    <strong>📧 Contacto:</strong> {correo_vendedor if correo_vendedor != 'N/A' else 'No asignado'}<br>
-                    <strong>📞 Para consultas:</strong> Comuníquese con su vendedor<br>
-                    <strong>⚠️ Dudas o solicitudes:</strong> Si cree que hay algo equivocado o quiere la cartera completa comuníquese con <a href="mailto:tesoreria@grupolom.com" style="color: #2196F3; text-decoration: none;">tesoreria@grupolom.com</a>
-                </div>
-            </div>
-
-            <div class="footer">
-                <p><strong>Lomarosa</strong><br>
-                <em>Campo bien hecho, cerdos bien criados</em></p>
-                <hr style="border: 1px solid #475569; margin: 15px 0;">
-                <p style="font-size: 11px;">Este es un mensaje automático. No responder directamente a este correo.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-
-
-def _enviar_lote_agrupado(recordatorios_agrupados):
-    """Envía lote de correos UNIFICADOS (vencidas + próximas + no vencidas)."""
-    resultados = []
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        tareas = {}
-
-        for cliente_agrupado in recordatorios_agrupados:
-            destinatario_principal = cliente_agrupado.get("correo_cliente", "")
-            destinatario_cc = cliente_agrupado.get("correo_vendedor", None)
-
-            total_facturas = cliente_agrupado.get("total_facturas", 0)
-            total_vencidas = cliente_agrupado.get("total_vencidas", 0)
-            total_proximas = cliente_agrupado.get("total_proximas", 0)
-
-            # Generar asunto descriptivo
-            asunto = f"Estado de Facturas - {total_facturas} facturas - {cliente_agrupado.get('cliente', 'Cliente')}"
-            cuerpo_html = generar_html_recordatorio_agrupado(cliente_agrupado)
-            cuerpo_texto = f"Tiene {total_facturas} facturas pendientes ({total_vencidas} vencidas, {total_proximas} próximas)"
-
-            future = executor.submit(
-                enviar_email_individual,
-                destinatario_principal,
-                destinatario_cc,
-                asunto,
-                cuerpo_html,
-                cuerpo_texto
-            )
-
-            tareas[future] = cliente_agrupado
+# ==========================================
+# RUTAS DE LA APLICACIÓN
+# ==========================================
 
-        for future in as_completed(tareas):
-            cliente_agrupado = tareas[future]
-            try:
-                resultado = future.result()
-                resultados.append({
-                    "destinatario": resultado["destinatario"],
-                    "cliente": cliente_agrupado.get("cliente"),
-                    "facturas": cliente_agrupado.get("total_facturas", 0),
-                    "vencidas": cliente_agrupado.get("total_vencidas", 0),
-                    "proximas": cliente_agrupado.get("total_proximas", 0),
-                    "no_vencidas": cliente_agrupado.get("total_no_vencidas", 0),
-                    "success": resultado["success"],
-                    "error": resultado["error"]
-                })
-            except Exception as e:
-                resultados.append({
-                    "destinatario": cliente_agrupado.get("correo_cliente"),
-                    "cliente": cliente_agrupado.get("cliente"),
-                    "facturas": cliente_agrupado.get("total_facturas", 0),
-                    "vencidas": cliente_agrupado.get("total_vencidas", 0),
-                    "proximas": cliente_agrupado.get("total_proximas", 0),
-                    "no_vencidas": cliente_agrupado.get("total_no_vencidas", 0),
-                    "success": False,
-                    "error": str(e)
-                })
 
-    return resultados
+@app.after_request
+def comprimir_json(respuesta):
+    return comprimir_respuesta(respuesta, request.accept_encodings, minimo=COMPRIMIR_DESDE)
 
 
-# ==========================================
-# RUTAS DE LA APLICACIÓN
-# ==========================================
+@app.errorhandler(RequestEntityTooLarge)
+def subida_demasiado_grande(error):
+    """Archivo subido de más de SUBIDA_MAX_MB (se corta mientras se recibe)."""
+    return jsonify({
+        "success": False,
+        "message": f"El archivo supera el tamaño máximo permitido ({SUBIDA_MAX_MB:g} MB)."
+    }), 413
 
 
 @app.route("/")
@@ -860,9 +183,76 @@ def test_email():
         }), 500
 
 
+@app.route("/cache-clientes", methods=["GET"])
+def estado_cache_clientes():
+    """Aciertos/fallos de la caché del listado de clientes."""
+    return jsonify({
+        "success": True,
+        "cache": cache_clientes.estadisticas()
+    })
+
+
+@app.route("/cola-envios", methods=["GET"])
+def cola_envios():
+    """Estado de la cuota y de los correos en cola para la siguiente ventana."""
+    return jsonify({
+        "success": True,
+        "cola": procesamiento.planificador.estimacion(EMAIL_USER)
+    })
+
+
+@app.route("/metrics", methods=["GET"])
+def metricas_prometheus():
+    """Duración de las etapas y contadores de envío en formato de texto de Prometheus."""
+    return Response(metricas.exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _con_perfil(nombre, funcion):
+    """
+    Ejecuta la vista `funcion` bajo cProfile y guarda el perfil en
+    PERFILES_DIR (se lee con `python -m pstats archivo`). El nombre del
+    archivo va en la cabecera X-Perfil. Si ya hay otra petición
+    perfilándose, esta se atiende sin perfil.
+    """
+    if not _perfil_lock.acquire(blocking=False):
+        log.warning("Perfil omitido: ya hay otra petición con perfil en curso", ruta=request.path)
+        return funcion()
+
+    try:
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        respuesta = app.make_response(perfil.runcall(funcion))
+        segundos = time.perf_counter() - inicio
+
+        os.makedirs(PERFILES_DIR, exist_ok=True)
+        archivo = os.path.join(PERFILES_DIR, f"{nombre}-{datetime.now():%Y%m%d-%H%M%S-%f}.prof")
+        perfil.dump_stats(archivo)
+    finally:
+        _perfil_lock.release()
+
+    respuesta.headers["X-Perfil"] = os.path.basename(archivo)
+    log.info("Perfil guardado", ruta=request.path, archivo=archivo, segundos=round(segundos, 3))
+    return respuesta
+
+
 @app.route("/procesar-excel", methods=["POST"])
 def procesar_excel():
-    """Procesa ambos archivos Excel y retorna recordatorios con matching por nombre."""
+    """
+    Procesa ambos archivos Excel y retorna recordatorios con matching por nombre.
+
+    Con ?formato=columnar (o el campo de formulario `formato`) retorna la
+    primera página del formato columnar de la corrida en lugar de la lista
+    de recordatorios; el resto se pide a /corridas/<id>/facturas.
+
+    Con ?perfil=1 y PERFILES_DIR configurado guarda un perfil de cProfile
+    de la petición (ver _con_perfil).
+    """
+    if PERFILES_DIR and request.args.get("perfil", "").lower() in ("1", "true", "si", "sí", "yes"):
+        return _con_perfil("procesar-excel", _procesar_excel)
+    return _procesar_excel()
+
+
+def _procesar_excel():
     try:
         if 'file1' not in request.files or 'file2' not in request.files:
             return jsonify({
@@ -872,41 +262,21 @@ def procesar_excel():
         
         file1 = request.files['file1']
         file2 = request.files['file2']
-        
-        contenido1 = file1.read()
-        contenido2 = file2.read()
-        
-        df1 = pd.read_excel(BytesIO(contenido1))
-        
-        try:
-            df2 = pd.read_excel(BytesIO(contenido2), sheet_name="Cartera por edades", header=11)
-            print("[INFO] Excel 2: Leyendo hoja 'Cartera por edades' (desde fila 12) ✓")
-        except Exception as e:
-            return jsonify({
-                "success": False,
-                "message": f"No se encontró la hoja 'Cartera por edades' en el Excel 2. Error: {str(e)}"
-            }), 400
-        
-        tipo1 = detectar_tipo_excel(df1)
-        tipo2 = detectar_tipo_excel(df2)
-        
-        print(f"[INFO] Archivo 1 detectado como: {tipo1}")
-        print(f"[INFO] Archivo 2 detectado como: {tipo2}")
-        
-        if tipo1 == "clientes" and tipo2 == "cartera":
-            archivo_clientes = contenido1
-            archivo_cartera = contenido2
-        elif tipo1 == "cartera" and tipo2 == "clientes":
-            archivo_clientes = contenido2
-            archivo_cartera = contenido1
-        else:
-            return jsonify({
-                "success": False,
-                "message": f"No se pudieron detectar los tipos de archivo correctamente. Tipo1: {tipo1}, Tipo2: {tipo2}."
-            }), 400
-        
-        dict_clientes, dict_vendedores = leer_excel_clientes(archivo_clientes)
-        recordatorios = leer_excel_cartera(archivo_cartera, dict_clientes, dict_vendedores)
+
+        # Los archivos se leen desde sus temporales en disco (mmap, sin copias
+        # en memoria) y se liberan apenas termina el parseo
+        with subidas.mapear(file1) as contenido1, subidas.mapear(file2) as contenido2:
+            try:
+                resultado = procesar_archivos(contenido1, contenido2)
+            except TiposNoDetectados as e:
+                return jsonify({
+                    "success": False,
+                    "message": str(e)
+                }), 400
+
+        recordatorios = resultado["recordatorios"]
+        reporte_clientes = resultado["reporte_clientes"]
+        reporte_emparejamiento = resultado["reporte_emparejamiento"]
 
         if not recordatorios:
             return jsonify({
@@ -918,54 +288,153 @@ def procesar_excel():
                     "proximas": 0,
                     "no_vencidas": 0
                 },
-                "message": "No se encontraron facturas con email asignado."
+                "message": "No se encontraron facturas con email asignado.",
+                "reporte_clientes": reporte_clientes,
+                "reporte_emparejamiento": reporte_emparejamiento,
+                "cache_clientes": resultado["cache_clientes"],
+                "tiempos_ms": resultado["tiempos_ms"]
             })
 
-        # Contar facturas por categoría
-        vencidas = len([r for r in recordatorios if r["estado"] == "vencido"])
-        proximas = len([r for r in recordatorios if r["estado"] == "proximo"])
-        no_vencidas = len([r for r in recordatorios if r["estado"] == "no_vencido"])
+        corrida = corridas.guardar(recordatorios)
 
-        return jsonify({
+        # Contar facturas por categoría (de la agrupación de la corrida)
+        with SEGUNDOS_ETAPA.cronometrar(etapa="agrupar_recordatorios_por_cliente"):
+            agrupacion = corrida.agrupacion()
+        registrar_resumen_agrupacion(agrupacion)
+        vencidas = sum(agrupacion.resumen["total_vencidas"])
+        proximas = sum(agrupacion.resumen["total_proximas"])
+        no_vencidas = sum(agrupacion.resumen["total_no_vencidas"])
+
+        respuesta = {
             "success": True,
-            "recordatorios": recordatorios,
+            "corrida_id": corrida.id,
             "stats": {
                 "total": len(recordatorios),
                 "vencidas": vencidas,
                 "proximas": proximas,
                 "no_vencidas": no_vencidas
-            }
-        })
+            },
+            "reporte_clientes": reporte_clientes,
+            "reporte_emparejamiento": reporte_emparejamiento,
+            "cache_clientes": resultado["cache_clientes"],
+            "tiempos_ms": resultado["tiempos_ms"]
+        }
+
+        if request.values.get("formato") == "columnar":
+            respuesta["formato"] = "columnar"
+            respuesta.update(corrida.pagina(1, _facturas_por_pagina()))
+        else:
+            respuesta["recordatorios"] = como_dicts(recordatorios)
+
+        return jsonify(respuesta)
     
+    except RequestEntityTooLarge:
+        # Lo responde el manejador de 413 (subida_demasiado_grande)
+        raise
     except Exception as e:
-        print(f"[ERROR] Error al procesar Excel: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error al procesar Excel")
         return jsonify({
             "success": False,
             "message": "Error al procesar archivos Excel",
             "error": str(e)
         }), 500
 
+
+def _facturas_por_pagina():
+    """Parámetro `por_pagina` de la petición, entre 1 y FACTURAS_POR_PAGINA."""
+    try:
+        por_pagina = int(request.values.get("por_pagina", FACTURAS_POR_PAGINA))
+    except ValueError:
+        por_pagina = FACTURAS_POR_PAGINA
+    return max(1, min(por_pagina, FACTURAS_POR_PAGINA))
+
+
+@app.route("/corridas/<corrida_id>/facturas", methods=["GET"])
+def facturas_corrida(corrida_id):
+    """Página ?pagina=N (desde 1) del formato columnar de una corrida."""
+    corrida = corridas.obtener(corrida_id)
+    if corrida is None:
+        return jsonify({
+            "success": False,
+            "codigo": "corrida_expirada",
+            "message": "La corrida ya no está disponible; vuelve a analizar los archivos"
+        }), 410
+
+    por_pagina = _facturas_por_pagina()
+    total_paginas = max(1, -(-len(corrida.recordatorios) // por_pagina))
+    try:
+        numero = int(request.args.get("pagina", "1"))
+    except ValueError:
+        numero = 0
+    if not 1 <= numero <= total_paginas:
+        return jsonify({
+            "success": False,
+            "message": f"Página inválida; la corrida tiene {total_paginas} páginas de {por_pagina} facturas"
+        }), 400
+
+    return jsonify({"success": True, "corrida_id": corrida.id, **corrida.pagina(numero, por_pagina)})
+
+
 @app.route("/enviar-correos", methods=["POST"])
 def enviar_correos():
-    """Envía correos UNIFICADOS por cliente (incluye vencidas + próximas + no vencidas)."""
+    """
+    Envía correos UNIFICADOS por cliente (incluye vencidas + próximas + no vencidas).
+
+    Cuerpo: {"corrida_id", "grupos": [ids]} para enviar a los clientes
+    agrupados seleccionados de una corrida de /procesar-excel (ids de
+    "grupos" en sus páginas), {"corrida_id", "clientes": [{"cliente", "email"}]}
+    para elegirlos por nombre y email, o {"recordatorios": [...]} con la
+    lista completa.
+    """
     try:
         datos = request.get_json()
 
-        if not datos or "recordatorios" not in datos:
+        if not datos or ("recordatorios" not in datos and "corrida_id" not in datos):
             return jsonify({
                 "success": False,
                 "message": "Datos incorrectos"
             }), 400
 
-        recordatorios = datos["recordatorios"]
+        if "corrida_id" in datos:
+            corrida = corridas.obtener(datos["corrida_id"])
+            if corrida is None:
+                return jsonify({
+                    "success": False,
+                    "codigo": "corrida_expirada",
+                    "message": "La corrida ya no está disponible; vuelve a analizar los archivos"
+                }), 410
 
-        if not isinstance(recordatorios, list) or len(recordatorios) == 0:
-            return jsonify({
-                "success": False,
-                "message": "Lista vacía"
-            }), 400
+            seleccion = datos.get("grupos", datos.get("clientes"))
+            if not isinstance(seleccion, list) or len(seleccion) == 0:
+                return jsonify({
+                    "success": False,
+                    "message": "Lista vacía"
+                }), 400
+
+            if "grupos" in datos:
+                if not all(type(grupo) is int for grupo in seleccion):
+                    return jsonify({
+                        "success": False,
+                        "message": "Los grupos deben ser ids enteros"
+                    }), 400
+                recordatorios_agrupados = corrida.seleccionar_grupos(seleccion)
+            else:
+                recordatorios_agrupados = corrida.seleccionar(seleccion)
+            if not recordatorios_agrupados:
+                return jsonify({
+                    "success": False,
+                    "message": "Ninguno de los clientes seleccionados está en la corrida"
+                }), 400
+        else:
+            recordatorios = datos["recordatorios"]
+
+            if not isinstance(recordatorios, list) or len(recordatorios) == 0:
+                return jsonify({
+                    "success": False,
+                    "message": "Lista vacía"
+                }), 400
+
+            recordatorios_agrupados = None
 
         if not EMAIL_USER or not EMAIL_PASSWORD:
             return jsonify({
@@ -973,26 +442,32 @@ def enviar_correos():
                 "message": "Credenciales no configuradas"
             }), 500
 
-        # ← AGRUPAR por cliente + email (UN SOLO correo por cliente)
-        print("\n[INFO] Agrupando recordatorios por cliente + email (unificado)...")
-        recordatorios_agrupados = agrupar_recordatorios_por_cliente(recordatorios)
+        # ← AGRUPAR por cliente + email (UN SOLO correo por cliente); las
+        # corridas ya vienen agrupadas
+        if recordatorios_agrupados is None:
+            recordatorios_agrupados = agrupar_recordatorios_por_cliente(recordatorios)
+
+        # ← PLANIFICAR: vencidas primero; lo que excede la cuota diaria queda en cola
+        admitidos, en_cola = procesamiento.planificador.planificar(recordatorios_agrupados, EMAIL_USER)
 
-        print(f"\n[INFO] Iniciando envío de {len(recordatorios_agrupados)} correos unificados...")
+        log.info("Iniciando envío de correos unificados", correos=len(admitidos), en_cola=en_cola)
 
-        # ← ENVIAR LOTE
-        resultados = _enviar_lote_agrupado(recordatorios_agrupados)
+        # ← ENVIAR LOTE en segundo plano
+        trabajo = iniciar_envio(admitidos)
 
-        exitosos = sum(1 for r in resultados if r["success"])
-        fallidos = len(resultados) - exitosos
+        mensaje = f"📤 Envío iniciado: {len(admitidos)} correos unificados"
+        if en_cola:
+            mensaje += f" ({en_cola} en cola por cuota diaria)"
 
         return jsonify({
             "success": True,
-            "message": f"✅ Envío completado: {len(recordatorios_agrupados)} correos unificados",
-            "total": len(resultados),
-            "exitosos": exitosos,
-            "fallidos": fallidos,
-            "resultados": resultados
-        })
+            "message": mensaje,
+            "trabajo_id": trabajo.id,
+            "total": len(admitidos),
+            "en_cola": en_cola,
+            "estimacion": procesamiento.planificador.estimacion(EMAIL_USER),
+            "progreso": f"/enviar-correos/{trabajo.id}/progreso"
+        }), 202
 
     except Exception as e:
         return jsonify({
@@ -1001,6 +476,254 @@ def enviar_correos():
         }), 500
 
 
+def _formatear_evento_sse(tipo, indice, datos):
+    """Serializa un evento de TrabajoEnvio.eventos() en formato server-sent events."""
+    if tipo == "latido":
+        return ": latido\n\n"
+    lineas = [f"event: {tipo}"]
+    if indice is not None:
+        lineas.append(f"id: {indice}")
+    lineas.append(f"data: {json.dumps(datos, ensure_ascii=False)}")
+    return "\n".join(lineas) + "\n\n"
+
+
+def _trabajo_o_404(trabajo_id):
+    trabajo = trabajos_envio.obtener(trabajo_id)
+    if trabajo is None:
+        return None, (jsonify({
+            "success": False,
+            "message": "Trabajo no encontrado"
+        }), 404)
+    return trabajo, None
+
+
+@app.route("/enviar-correos/<trabajo_id>", methods=["GET"])
+def estado_trabajo_envio(trabajo_id):
+    """Resumen del trabajo; con ?resultados=1 incluye los resultados por destinatario."""
+    trabajo, error = _trabajo_o_404(trabajo_id)
+    if error:
+        return error
+
+    respuesta = {"success": True, **trabajo.resumen()}
+    if request.args.get("resultados"):
+        respuesta["resultados"] = list(trabajo.resultados)
+    return jsonify(respuesta)
+
+
+@app.route("/enviar-correos/<trabajo_id>/progreso", methods=["GET"])
+def progreso_trabajo_envio(trabajo_id):
+    """
+    Stream server-sent events del trabajo:
+    - `resultado`: un destinatario terminado (id = posición en la lista)
+    - `estado`: resumen cuando cambia el estado; el último llega al terminar
+
+    Si la conexión se corta, EventSource reconecta con Last-Event-ID y el
+    stream continúa desde el siguiente resultado.
+    """
+    trabajo, error = _trabajo_o_404(trabajo_id)
+    if error:
+        return error
+
+    ultimo_id = request.headers.get("Last-Event-ID", request.args.get("desde"))
+    try:
+        desde = int(ultimo_id) + 1 if ultimo_id not in (None, "") else 0
+    except ValueError:
+        desde = 0
+
+    def generar():
+        for tipo, indice, datos in trabajo.eventos(desde=desde):
+            yield _formatear_evento_sse(tipo, indice, datos)
+
+    return Response(generar(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@app.route("/enviar-correos/<trabajo_id>/pausar", methods=["POST"])
+def pausar_trabajo_envio(trabajo_id):
+    """Pausa el trabajo: los correos en vuelo terminan, los siguientes esperan."""
+    trabajo, error = _trabajo_o_404(trabajo_id)
+    if error:
+        return error
+    trabajo.pausar()
+    return jsonify({"success": True, **trabajo.resumen()})
+
+
+@app.route("/enviar-correos/<trabajo_id>/reanudar", methods=["POST"])
+def reanudar_trabajo_envio(trabajo_id):
+    """Reanuda un trabajo pausado: los correos que esperaban siguen saliendo."""
+    trabajo, error = _trabajo_o_404(trabajo_id)
+    if error:
+        return error
+    trabajo.reanudar()
+    return jsonify({"success": True, **trabajo.resumen()})
+
+
+@app.route("/enviar-correos/<trabajo_id>/cancelar", methods=["POST"])
+def cancelar_trabajo_envio(trabajo_id):
+    """Cancela el trabajo: los pendientes se marcan como 'Envío cancelado'."""
+    trabajo, error = _trabajo_o_404(trabajo_id)
+    if error:
+        return error
+    trabajo.cancelar()
+    return jsonify({"success": True, **trabajo.resumen()})
+
+
+@app.route("/enviar-correos/<trabajo_id>/reenviar-fallidos", methods=["POST"])
+def reenviar_fallidos(trabajo_id):
+    """
+    Reenvía, como un trabajo nuevo, solo los clientes cuyo resultado final
+    fue fallido en el trabajo indicado ("ultimo" = el más reciente). Si hay
+    bitácora, los resultados se anotan en el mismo lote.
+    """
+    trabajo = trabajos_envio.ultimo() if trabajo_id == "ultimo" else trabajos_envio.obtener(trabajo_id)
+    if trabajo is None:
+        return jsonify({
+            "success": False,
+            "message": "Trabajo no encontrado"
+        }), 404
+
+    if not trabajo.terminado:
+        return jsonify({
+            "success": False,
+            "message": "El trabajo todavía se está enviando"
+        }), 409
+
+    if not EMAIL_USER or not EMAIL_PASSWORD:
+        return jsonify({
+            "success": False,
+            "message": "Credenciales no configuradas"
+        }), 500
+
+    with lock_reanudaciones:
+        fallidos = trabajo.fallidos
+        disponibles = procesamiento.cuota_envio.disponibles_hoy()
+        if disponibles is not None:
+            fallidos = fallidos[:disponibles]
+
+        if not fallidos:
+            return jsonify({
+                "success": True,
+                "message": "El trabajo no tiene correos fallidos para reenviar",
+                "total": 0
+            })
+
+        clientes = [cliente for _, cliente in fallidos]
+        lote = trabajo.lote.sublote([indice for indice, _ in fallidos]) if trabajo.lote is not None else None
+
+        # Los que se reenvían pasan al trabajo nuevo (sus fallos quedarán en él)
+        trabajo.fallidos = trabajo.fallidos[len(fallidos):]
+        procesamiento.cuota_envio.consumir(len(clientes))
+        nuevo = iniciar_envio(clientes, lote)
+
+    log.info("Reenviando fallidos", correos=len(clientes), trabajo_original=trabajo.id, trabajo=nuevo.id)
+
+    return jsonify({
+        "success": True,
+        "message": f"📤 Reenviando {len(clientes)} correos fallidos",
+        "trabajo_id": nuevo.id,
+        "total": len(clientes),
+        "quedan_pendientes": len(trabajo.fallidos),
+        "progreso": f"/enviar-correos/{nuevo.id}/progreso"
+    }), 202
+
+
+def _bitacora_o_error():
+    if procesamiento.bitacora is None:
+        return jsonify({
+            "success": False,
+            "message": "La bitácora de envíos está desactivada (BITACORA_ENVIOS vacío)"
+        }), 404
+    return None
+
+
+@app.route("/bitacora", methods=["GET"])
+def lotes_bitacora():
+    """Lotes de envío con entradas sin enviar (pendientes o fallidas)."""
+    error = _bitacora_o_error()
+    if error:
+        return error
+    return jsonify({"success": True, "incompletos": procesamiento.bitacora.lotes_incompletos()})
+
+
+@app.route("/bitacora/<lote_id>", methods=["GET"])
+def lote_bitacora(lote_id):
+    """Resumen de un lote; con ?entradas=1 incluye una fila por cliente."""
+    error = _bitacora_o_error()
+    if error:
+        return error
+
+    resumen = procesamiento.bitacora.resumen_lote(lote_id)
+    if resumen is None:
+        return jsonify({
+            "success": False,
+            "message": "Lote no encontrado"
+        }), 404
+
+    respuesta = {"success": True, **resumen}
+    if request.args.get("entradas"):
+        respuesta["entradas"] = procesamiento.bitacora.entradas_lote(lote_id)
+    return jsonify(respuesta)
+
+
+@app.route("/bitacora/<lote_id>/reanudar", methods=["POST"])
+def reanudar_lote_bitacora(lote_id):
+    """
+    Reenvía solo las entradas pendientes o fallidas de un lote, como un
+    trabajo nuevo que anota en el mismo lote. Lo ya enviado nunca se repite.
+    Respeta la cuota diaria: lo que no cabe hoy sigue pendiente en el lote.
+    """
+    error = _bitacora_o_error()
+    if error:
+        return error
+
+    if not EMAIL_USER or not EMAIL_PASSWORD:
+        return jsonify({
+            "success": False,
+            "message": "Credenciales no configuradas"
+        }), 500
+
+    with lock_reanudaciones:
+        en_curso = [trabajos_envio.obtener(lote_id), reanudaciones.get(lote_id)]
+        if any(t is not None and not t.terminado for t in en_curso):
+            return jsonify({
+                "success": False,
+                "message": "El lote todavía se está enviando"
+            }), 409
+
+        lote, clientes = procesamiento.bitacora.lote_pendiente(
+            lote_id, limite=procesamiento.cuota_envio.disponibles_hoy()
+        )
+        if lote is None:
+            return jsonify({
+                "success": False,
+                "message": "Lote no encontrado"
+            }), 404
+
+        if not clientes:
+            return jsonify({
+                "success": True,
+                "message": "El lote no tiene correos sin enviar",
+                "total": 0,
+                "quedan_pendientes": 0
+            })
+
+        procesamiento.cuota_envio.consumir(len(clientes))
+        trabajo = iniciar_envio(clientes, lote)
+        reanudaciones[lote_id] = trabajo
+
+    resumen = procesamiento.bitacora.resumen_lote(lote_id)
+    log.info("Reanudando lote", lote=lote_id, correos=len(clientes), trabajo=trabajo.id)
+
+    return jsonify({
+        "success": True,
+        "message": f"📤 Reanudando lote: {len(clientes)} correos sin enviar",
+        "trabajo_id": trabajo.id,
+        "total": len(clientes),
+        "quedan_pendientes": resumen["pendientes"] + resumen["fallidos"] - len(clientes),
+        "progreso": f"/enviar-correos/{trabajo.id}/progreso"
+    }), 202
 
 
 def abrir_navegador():
@@ -1016,6 +739,9 @@ if __name__ == "__main__":
     print(f"Configuración SMTP: {EMAIL_HOST}:{EMAIL_PORT}")
     print(f"Usuario de correo: {EMAIL_USER if EMAIL_USER else '❌ NO CONFIGURADO'}")
     print("=" * 60)
+    if procesamiento.bitacora is not None:
+        for lote in procesamiento.bitacora.lotes_incompletos():
+            log.warning("Lote incompleto (POST /bitacora/<lote>/reanudar)", **lote)
     print("\nPresiona Ctrl+C para detener el servidor.\n")
     
     Timer(1.5, abrir_navegador).start()
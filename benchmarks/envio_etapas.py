@@ -0,0 +1,94 @@
+"""
+Benchmark del envío por etapas contra un servidor SMTP local (aiosmtpd).
+
+Envía el mismo lote sintético con la preparación en el mismo proceso
+(procesos=0) y en un pool de procesos, con el motor de hilos y con el
+asyncio, y muestra correos por segundo y memoria máxima del proceso.
+
+Uso (desde la raíz del proyecto; requiere aiosmtpd):
+    python benchmarks/envio_etapas.py [clientes] [facturas_por_cliente] [procesos]
+"""
+
+import contextlib
+import io
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sumidero_smtp
+
+PUERTO = 8125
+
+os.environ.update(
+    EMAIL_HOST="127.0.0.1",
+    EMAIL_PORT=str(PUERTO),
+    EMAIL_USE_TLS="false",
+    EMAIL_USER="benchmark@ejemplo.com",
+    EMAIL_PASSWORD="benchmark",
+    CUOTA_DIARIA="0",
+    BITACORA_ENVIOS=""
+)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import procesamiento
+    from etapas_envio import PreparadorProcesos
+    from render_correo import cliente_sintetico
+
+
+def medir(clientes, procesos, motor_async):
+    procesamiento.ENVIO_ASYNC = motor_async
+    # Antes de reemplazar el preparador: inicializar() no lo vuelve a crear
+    procesamiento.inicializar()
+    procesamiento.preparador_correos = PreparadorProcesos(
+        procesos,
+        tamano_lote=procesamiento.PREPARACION_LOTE,
+        max_lotes=procesamiento.PREPARACION_LOTES_PENDIENTES
+    )
+    try:
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultados = procesamiento._enviar_lote_agrupado(clientes)
+        duracion = time.perf_counter() - inicio
+    finally:
+        procesamiento.preparador_correos.cerrar()
+
+    exitosos = sum(1 for r in resultados if r["success"])
+    return exitosos, duracion
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    facturas = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    procesos = int(sys.argv[3]) if len(sys.argv) > 3 else max(2, min(4, (os.cpu_count() or 1) - 1))
+
+    clientes = []
+    for i in range(cantidad):
+        cliente = dict(cliente_sintetico(facturas, semilla=i))
+        cliente["correo_cliente"] = f"cliente{i}@ejemplo.com"
+        clientes.append(cliente)
+
+    sumidero, controlador = sumidero_smtp.iniciar(PUERTO)
+
+    print(f"{cantidad} clientes x {facturas} facturas, {os.cpu_count()} núcleos")
+    print(f"{'motor':>6} {'procesos':>9} {'correos/s':>10} {'segundos':>9} {'RSS máx (MB)':>13}")
+    try:
+        for motor_async in (False, True):
+            if motor_async and not procesamiento.envio_async.disponible():
+                continue
+            for n in (0, procesos):
+                exitosos, duracion = medir(clientes, n, motor_async)
+                if exitosos != cantidad:
+                    print(f"[WARNING] Solo {exitosos} de {cantidad} correos se enviaron")
+                rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                print(f"{'async' if motor_async else 'hilos':>6} {n:>9} {exitosos / duracion:>10.0f} "
+                      f"{duracion:>9.2f} {rss:>13.0f}")
+    finally:
+        controlador.stop()
+
+
+if __name__ == "__main__":
+    main()
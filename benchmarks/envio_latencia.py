@@ -0,0 +1,97 @@
+"""
+Benchmark del motor de envío con hilos contra el motor asyncio (ENVIO_ASYNC)
+con un servidor SMTP local (aiosmtpd) que responde con latencia.
+
+Con un proveedor remoto cada envío espera la ida y vuelta del EHLO y del
+DATA; el motor de hilos tiene --hilos envíos en vuelo (MAX_WORKERS) y el
+asyncio --conexiones (ENVIO_ASYNC_CONEXIONES). Para cada latencia envía el
+mismo lote sintético con los dos motores y muestra correos por segundo.
+
+Uso (desde la raíz del proyecto; requiere aiosmtpd y aiosmtplib):
+    python benchmarks/envio_latencia.py [--clientes N] [--facturas N] [--hilos N]
+                                        [--conexiones N] [--latencias 0,20,100]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sumidero_smtp
+
+PUERTO = 8127
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clientes", type=int, default=300)
+    parser.add_argument("--facturas", type=int, default=20, help="facturas por cliente")
+    parser.add_argument("--hilos", type=int, default=5, help="envíos simultáneos del motor de hilos")
+    parser.add_argument("--conexiones", type=int, default=20, help="conexiones del motor asyncio")
+    parser.add_argument("--latencias", default="0,20,100", help="latencias del EHLO y del DATA en ms, separadas por coma")
+    return parser.parse_args()
+
+
+def medir(procesamiento, clientes, motor_async):
+    procesamiento.ENVIO_ASYNC = motor_async
+    inicio = time.perf_counter()
+    resultados = procesamiento._enviar_lote_agrupado(clientes)
+    duracion = time.perf_counter() - inicio
+    # Las conexiones del pool no sobreviven al sumidero de la siguiente latencia
+    procesamiento.pool_smtp.cerrar()
+    return sum(1 for r in resultados if r["success"]), duracion
+
+
+def main():
+    opciones = _argumentos()
+    os.environ.update(
+        EMAIL_HOST="127.0.0.1",
+        EMAIL_PORT=str(PUERTO),
+        EMAIL_USE_TLS="false",
+        EMAIL_USER="benchmark@ejemplo.com",
+        EMAIL_PASSWORD="benchmark",
+        MAX_WORKERS=str(opciones.hilos),
+        ENVIO_ASYNC_CONEXIONES=str(opciones.conexiones),
+        CUOTA_DIARIA="0",
+        CUOTA_POR_SEGUNDO="0",
+        BITACORA_ENVIOS="",
+        LOG_NIVEL="WARNING"
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        import procesamiento
+        from render_correo import cliente_sintetico
+
+    if not procesamiento.envio_async.disponible():
+        sys.exit("Falta aiosmtplib (pip install aiosmtplib)")
+
+    clientes = []
+    for i in range(opciones.clientes):
+        cliente = dict(cliente_sintetico(opciones.facturas, semilla=i))
+        cliente["correo_cliente"] = f"cliente{i}@ejemplo.com"
+        clientes.append(cliente)
+
+    print(f"{opciones.clientes} clientes x {opciones.facturas} facturas, {opciones.hilos} hilos, "
+          f"{opciones.conexiones} conexiones asyncio, {os.cpu_count()} núcleos")
+    print(f"{'latencia (ms)':>13} {'motor':>6} {'correos/s':>10} {'segundos':>9} {'conexiones':>11}")
+
+    for latencia_ms in (float(x) for x in opciones.latencias.split(",")):
+        for motor_async in (False, True):
+            sumidero, controlador = sumidero_smtp.iniciar(PUERTO, latencia_ms / 1000)
+            try:
+                exitosos, duracion = medir(procesamiento, clientes, motor_async)
+            finally:
+                controlador.stop()
+
+            if exitosos != opciones.clientes:
+                print(f"[WARNING] Solo {exitosos} de {opciones.clientes} correos se enviaron")
+            print(f"{latencia_ms:>13g} {'async' if motor_async else 'hilos':>6} {exitosos / duracion:>10.0f} "
+                  f"{duracion:>9.2f} {sumidero.conexiones:>11}")
+
+
+if __name__ == "__main__":
+    main()
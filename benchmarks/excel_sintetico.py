@@ -0,0 +1,201 @@
+"""
+Generador de libros Excel sintéticos con el formato real (sin datos de clientes).
+
+- generar_clientes(): "Listado de clientes y vendedores con correo" (hoja
+  "Hoja1", encabezado en la primera fila).
+- generar_cartera(): "Cartera por edades" con las 11 filas de preámbulo del
+  reporte antes del encabezado.
+
+En la cartera, una fracción `tasa_fallos` de las facturas trae un "Nombre
+tercero" que no coincide exactamente con el listado: la mitad son variantes
+de un cliente real (puntuación, sufijo societario, tildes, una letra
+cambiada) para el emparejamiento canónico y aproximado, y la otra mitad
+terceros que no están en el listado. Cada cliente tiene entre 1 y
+2 × `facturas_por_cliente` - 1 facturas (ese es el promedio) y los
+vencimientos se reparten en ±`dispersion_dias` alrededor de hoy. Con la
+misma semilla el resultado es el mismo.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/excel_sintetico.py [clientes] [facturas_por_cliente] [carpeta]
+"""
+
+import os
+import random
+import sys
+import unicodedata
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from openpyxl import Workbook
+
+
+PALABRAS = (
+    "ALIMENTOS", "ANDINA", "AROMAS", "BODEGA", "CAFE", "CARNES", "CASA", "CENTRAL", "COMERCIAL",
+    "COSECHA", "CREMERIA", "DELICIAS", "DISTRIBUIDORA", "DORADA", "EL", "ESTRELLA", "FAMILIA",
+    "FRUTAS", "GOURMET", "GRANJA", "HOTEL", "HORNO", "IMPORTADORA", "INVERSIONES", "LA", "LOS",
+    "MERCADO", "MESA", "MONTAÑA", "NORTE", "OLIVO", "PANADERIA", "PARRILLA", "PLAZA", "PUERTO",
+    "REAL", "RESTAURANTE", "SABANA", "SABORES", "SAN", "SANTA", "SOL", "SUR", "TIENDA", "TRADICION",
+    "VALLE", "VERDE", "VILLA", "ZONA", "ÁNGEL", "GARCÍA", "MARÍA", "JOSÉ", "PEÑA", "ROSALES"
+)
+SUFIJOS = ("SAS", "S.A.S", "S.A.S.", "LTDA", "S.A.", "SAS BIC", "Y CIA S EN C", "")
+VENDEDORES = tuple(f"VENDEDOR {i:02d}" for i in range(1, 31))
+CANALES = ("HORECA", "Mayoristas", "Institucional", "Tiendas")
+LOCALES = ("Bogotá", "Medellín", "Cali", "Barranquilla", None)
+
+ENCABEZADO_CLIENTES = (
+    "Nit", "Cliente", "Nombre comercial", "Correo cliente", "Vendedor", "Correo vendedor", "Canal", "Cupo"
+)
+ENCABEZADO_CARTERA = (
+    "Tercero", "Nombre tercero", "Numero FAC", "Emision", "Vencimiento", "Dias", "Saldo",
+    "Sin vencer", "1 a 30", "31 a 60", "61 a 90", "Mas de 90", "Vendedor", "Local"
+)
+
+
+def _nombres_clientes(cantidad, aleatorio):
+    """`cantidad` razones sociales distintas."""
+    nombres = set()
+    resultado = []
+    while len(resultado) < cantidad:
+        palabras = aleatorio.sample(PALABRAS, aleatorio.randint(2, 4))
+        nombre = " ".join(palabras + [aleatorio.choice(SUFIJOS)]).strip()
+        if nombre not in nombres:
+            nombres.add(nombre)
+            resultado.append(nombre)
+    return resultado
+
+
+def _sin_tildes(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+
+
+def _correo(nombre, dominio):
+    usuario = "".join(c for c in _sin_tildes(nombre).lower() if c.isalnum())[:20] or "cliente"
+    return f"{usuario}@{dominio}"
+
+
+def _variante(nombre, aleatorio):
+    """Nombre que no coincide exactamente pero es el mismo cliente (o casi)."""
+    opcion = aleatorio.randrange(3)
+    if opcion == 0:
+        # Otro sufijo societario
+        base = nombre
+        for sufijo in sorted(filter(None, SUFIJOS), key=len, reverse=True):
+            if nombre.endswith(" " + sufijo):
+                base = nombre[:-len(sufijo) - 1]
+                break
+        return f"{base} {aleatorio.choice(('S. A. S.', 'S A S', 'Ltda.', 'SA'))}"
+    if opcion == 1:
+        # Sin tildes y con puntuación
+        return _sin_tildes(nombre).replace(" ", ". ", 1) + "."
+    # Una letra cambiada
+    posicion = aleatorio.randrange(len(nombre))
+    return nombre[:posicion] + aleatorio.choice("AEIOURSTLN") + nombre[posicion + 1:]
+
+
+def _guardar(libro):
+    salida = BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def generar_clientes(clientes=1000, semilla=0):
+    """Retorna (bytes del .xlsx, lista de nombres de cliente) del listado de clientes."""
+    aleatorio = random.Random(semilla)
+    nombres = _nombres_clientes(clientes, aleatorio)
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Hoja1")
+    hoja.append(ENCABEZADO_CLIENTES)
+    for i, nombre in enumerate(nombres):
+        vendedor = aleatorio.choice(VENDEDORES)
+        hoja.append((
+            float(900000000 + i),
+            nombre,
+            None if aleatorio.random() < 0.8 else nombre.split()[0],
+            _correo(nombre, "ejemplo.com").upper() if aleatorio.random() < 0.3 else _correo(nombre, "ejemplo.com"),
+            vendedor,
+            _correo(vendedor, "ejemplo.com"),
+            aleatorio.choice(CANALES),
+            float(aleatorio.choice((0, 5e6, 1e7, 5e7, 1e8)))
+        ))
+    return _guardar(libro), nombres
+
+
+def generar_cartera(nombres, facturas_por_cliente=10, tasa_fallos=0.1, dispersion_dias=90,
+                    semilla=0, hoy=None):
+    """Bytes del .xlsx "Cartera por edades" para los clientes `nombres`."""
+    facturas_por_cliente = max(1, int(facturas_por_cliente))
+    aleatorio = random.Random(semilla + 1)
+    hoy = hoy or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Cartera por edades")
+
+    # Preámbulo del reporte (11 filas antes del encabezado)
+    preambulo = [
+        ("EMPRESA DE PRUEBA S.A.S.",),
+        ("NIT 900.000.000-1",),
+        ("CARTERA POR EDADES",),
+        (f"Fecha de corte: {hoy:%d/%m/%Y}",),
+        ("Moneda: COP",),
+        ("Vendedor: Todos",),
+        ("Local: Todos",),
+        (),
+        ("Generado por: benchmark",),
+        (f"Fecha de impresión: {datetime.now():%d/%m/%Y %H:%M}",),
+        ()
+    ]
+    for fila in preambulo:
+        hoja.append(fila)
+    hoja.append(ENCABEZADO_CARTERA)
+
+    numero = 0
+    for i, nombre in enumerate(nombres):
+        for _ in range(aleatorio.randint(1, 2 * facturas_por_cliente - 1)):
+            numero += 1
+            tercero = nombre
+            if aleatorio.random() < tasa_fallos:
+                if aleatorio.random() < 0.5:
+                    tercero = _variante(nombre, aleatorio)
+                else:
+                    tercero = f"TERCERO NO REGISTRADO {aleatorio.randrange(len(nombres) * 2)}"
+
+            dias = aleatorio.randint(-dispersion_dias, dispersion_dias)
+            vencimiento = hoy + timedelta(days=dias)
+            emision = vencimiento - timedelta(days=aleatorio.choice((0, 15, 30, 60)))
+            saldo = round(aleatorio.uniform(1000, 5e6), 2)
+            vencido = -dias
+            edades = [
+                saldo if vencido <= 0 else 0,
+                saldo if 0 < vencido <= 30 else 0,
+                saldo if 30 < vencido <= 60 else 0,
+                saldo if 60 < vencido <= 90 else 0,
+                saldo if vencido > 90 else 0
+            ]
+            hoja.append((
+                float(900000000 + i), tercero, f"FE{numero:07d}", emision, vencimiento, dias, saldo,
+                *edades, aleatorio.choice(VENDEDORES), aleatorio.choice(LOCALES)
+            ))
+
+    return _guardar(libro)
+
+
+def main():
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    facturas = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    carpeta = sys.argv[3] if len(sys.argv) > 3 else "."
+
+    contenido_clientes, nombres = generar_clientes(clientes)
+    contenido_cartera = generar_cartera(nombres, facturas)
+
+    os.makedirs(carpeta, exist_ok=True)
+    for nombre, contenido in (("clientes_sinteticos.xlsx", contenido_clientes),
+                              ("cartera_sintetica.xlsx", contenido_cartera)):
+        ruta = os.path.join(carpeta, nombre)
+        with open(ruta, "wb") as archivo:
+            archivo.write(contenido)
+        print(f"{ruta}: {len(contenido) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
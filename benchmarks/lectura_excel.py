@@ -0,0 +1,103 @@
+"""
+Tiempo y memoria pico de la lectura de la cartera con cada motor (lectura_excel.py).
+
+Cada motor se mide en un proceso aparte (la memoria pico de un proceso no
+baja), leyendo la hoja como lo hace cargar_excel: solo las columnas que
+usa la app. "pandas_completo" es pd.read_excel de toda la hoja, como se
+leía antes. La memoria es el pico del proceso (ru_maxrss) menos la del
+proceso con el libro ya cargado en memoria y los módulos importados.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/lectura_excel.py [--clientes N] [--facturas N] [--archivo cartera.xlsx]
+                                       [--repeticiones N]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _pico_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_motor(archivo, motor, repeticiones):
+    """Corre en el proceso hijo: lee `archivo` con `motor` y retorna tiempos y memoria."""
+    os.environ.setdefault("LOG_NIVEL", "WARNING")
+    from io import BytesIO
+
+    import pandas as pd
+
+    import procesamiento
+    import lectura_excel
+
+    with open(archivo, "rb") as f:
+        contenido = f.read()
+    sondeo = procesamiento.sondear_excel(contenido)
+    base = _pico_mb()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        if motor == "pandas_completo":
+            df = pd.read_excel(BytesIO(contenido), sheet_name=sondeo["hoja"],
+                               header=sondeo["fila_encabezado"])
+        else:
+            df = lectura_excel.leer_hoja(contenido, sondeo["hoja"], sondeo["fila_encabezado"],
+                                         seleccionar=procesamiento.columnas_a_leer("cartera"), motor=motor)
+        tiempos.append(time.perf_counter() - inicio)
+        del df
+
+    return {
+        "motor": motor,
+        "mejor_s": round(min(tiempos), 2),
+        "pico_mb": round(_pico_mb() - base, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo y memoria de la lectura de la cartera por motor")
+    parser.add_argument("--clientes", type=int, default=20000)
+    parser.add_argument("--facturas", type=int, default=10, help="facturas por cliente (promedio)")
+    parser.add_argument("--archivo", help="cartera .xlsx ya generada (si no, se genera una)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--motor", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.motor:
+        print(json.dumps(medir_motor(args.archivo, args.motor, args.repeticiones)))
+        return
+
+    import lectura_excel
+    from excel_sintetico import generar_cartera, generar_clientes
+
+    archivo = args.archivo
+    if not archivo:
+        _, nombres = generar_clientes(args.clientes)
+        archivo = os.path.join(RAIZ, "benchmark_cartera.xlsx")
+        with open(archivo, "wb") as f:
+            f.write(generar_cartera(nombres, args.facturas))
+    print(f"{archivo}: {os.path.getsize(archivo) / 1024 / 1024:.1f} MB")
+
+    print(f"{'motor':<16} {'mejor (s)':>10} {'pico (MB)':>10}")
+    for motor in ("pandas_completo",) + lectura_excel.disponibles():
+        salida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--archivo", archivo, "--motor", motor,
+             "--repeticiones", str(args.repeticiones)],
+            cwd=RAIZ, capture_output=True, text=True, check=True
+        )
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{motor:<16} {resultado['mejor_s']:>10.2f} {resultado['pico_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
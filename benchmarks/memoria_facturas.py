@@ -0,0 +1,91 @@
+"""
+Memoria de las facturas de una corrida: Factura (facturas.py) contra dicts.
+
+Genera una cartera sintética de ~100.000 facturas, la lee una vez y mide
+con tracemalloc la memoria que retiene la lista de recordatorios:
+
+- "factura": la lista de Factura que retorna leer_excel_cartera (textos
+  internados, fechas compartidas, formatos calculados al leer).
+- "dict": la misma lista como el dict de 14 claves por factura que se
+  guardaba antes (como_dicts: saldo y fechas ya formateados).
+
+"retenido" es lo que sigue ocupado con solo la lista viva; "pico" es el
+máximo durante la construcción (para Factura incluye los temporales de
+leer_excel_cartera; para dict, la lista de Factura de la que se arma).
+Los dos parten de los mismos DataFrames y listado de clientes, que ya
+están en memoria y no se cuentan.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/memoria_facturas.py [--clientes N] [--facturas N]
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("LOG_NIVEL", "WARNING")
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import procesamiento
+    from emparejamiento import IndiceClientes
+    from excel_sintetico import generar_cartera, generar_clientes
+    from facturas import como_dicts
+
+
+def _memoria():
+    """(actual, pico) de tracemalloc en bytes, después de recolectar la basura."""
+    gc.collect()
+    return tracemalloc.get_traced_memory()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria de las facturas como Factura y como dict")
+    parser.add_argument("--clientes", type=int, default=10000)
+    parser.add_argument("--facturas", type=int, default=10, help="facturas por cliente (promedio)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    contenido_clientes, nombres = generar_clientes(args.clientes)
+    contenido_cartera = generar_cartera(nombres, args.facturas)
+    _, df_clientes = procesamiento.cargar_excel(contenido_clientes, procesamiento.sondear_excel(contenido_clientes))
+    _, df_cartera = procesamiento.cargar_excel(contenido_cartera, procesamiento.sondear_excel(contenido_cartera))
+    dict_clientes, dict_vendedores = procesamiento.leer_excel_clientes(None, df=df_clientes)
+    indice = IndiceClientes(dict_clientes)
+    print(f"Libros generados y leídos en {time.perf_counter() - inicio:.1f} s")
+
+    tracemalloc.start()
+    base, _ = _memoria()
+    tracemalloc.reset_peak()
+
+    recordatorios = procesamiento.leer_excel_cartera(None, dict_clientes, dict_vendedores, df=df_cartera,
+                                                     indice=indice)
+    actual, pico = _memoria()
+    medidas = {"factura": (actual - base, pico - base)}
+    cantidad = len(recordatorios)
+
+    tracemalloc.reset_peak()
+    dicts = como_dicts(recordatorios)
+    del recordatorios
+    actual, pico = _memoria()
+    medidas["dict"] = (actual - base, pico - base)
+    del dicts
+    tracemalloc.stop()
+
+    print(f"{cantidad} facturas de {len(dict_clientes)} clientes")
+    print(f"{'registro':<9} {'retenido (MB)':>14} {'bytes/factura':>14} {'pico (MB)':>10}")
+    for registro, (retenido, pico) in medidas.items():
+        print(f"{registro:<9} {retenido / 2 ** 20:>14.1f} {retenido / max(1, cantidad):>14.0f} "
+              f"{pico / 2 ** 20:>10.1f}")
+    print(f"dict / factura: {medidas['dict'][0] / max(1, medidas['factura'][0]):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
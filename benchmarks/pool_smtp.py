@@ -0,0 +1,90 @@
+"""
+Benchmark del pool SMTP: correos por segundo con una conexión por correo
+(EHLO + LOGIN + sendmail + QUIT en cada envío, como antes del pool) y con
+PoolSMTP, contra un servidor SMTP local (aiosmtpd).
+
+Los dos modos envían el mismo mensaje desde el mismo número de hilos. El
+servidor puede responder el EHLO y el DATA con latencia (--latencias, en
+ms), como un proveedor remoto: sin pool cada correo paga además la conexión
+y el saludo.
+
+Uso (desde la raíz del proyecto; requiere aiosmtpd):
+    python benchmarks/pool_smtp.py [--correos N] [--hilos N] [--latencias 0,20,100]
+"""
+
+import argparse
+import os
+import smtplib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sumidero_smtp
+from smtp_pool import PoolSMTP
+
+PUERTO = 8126
+USUARIO = "benchmark@ejemplo.com"
+PASSWORD = "benchmark"
+
+# Correo de ~20 KB, el tamaño típico de un recordatorio con unas 40 facturas
+MENSAJE = (
+    "Subject: Recordatorio de pago\r\nContent-Type: text/html; charset=utf-8\r\n\r\n"
+    + "<tr><td>FE000123</td><td>01/01/2025</td><td>$1,234,567</td></tr>\r\n" * 300
+).encode()
+
+
+def enviar_sin_pool(destinatario):
+    """Una conexión autenticada por correo."""
+    smtp = smtplib.SMTP("127.0.0.1", PUERTO, timeout=30)
+    try:
+        smtp.ehlo()
+        smtp.login(USUARIO, PASSWORD)
+        smtp.sendmail(USUARIO, [destinatario], MENSAJE)
+    finally:
+        smtp.quit()
+
+
+def medir(enviar, correos, hilos):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        for _ in executor.map(enviar, (f"cliente{i}@ejemplo.com" for i in range(correos))):
+            pass
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--correos", type=int, default=1000)
+    parser.add_argument("--hilos", type=int, default=5)
+    parser.add_argument("--latencias", default="0,20,100", help="latencias del EHLO y del DATA en ms, separadas por coma")
+    opciones = parser.parse_args()
+
+    print(f"{opciones.correos} correos de {len(MENSAJE) // 1024} KB, {opciones.hilos} hilos, "
+          f"{os.cpu_count()} núcleos")
+    print(f"{'latencia (ms)':>13} {'modo':>14} {'correos/s':>10} {'segundos':>9} {'conexiones':>11}")
+
+    for latencia_ms in (float(x) for x in opciones.latencias.split(",")):
+        for modo in ("sin pool", "PoolSMTP"):
+            sumidero, controlador = sumidero_smtp.iniciar(PUERTO, latencia_ms / 1000)
+            try:
+                if modo == "sin pool":
+                    duracion = medir(enviar_sin_pool, opciones.correos, opciones.hilos)
+                else:
+                    pool = PoolSMTP("127.0.0.1", PUERTO, USUARIO, PASSWORD, usar_tls=False,
+                                    max_conexiones=opciones.hilos)
+                    duracion = medir(lambda d: pool.enviar(USUARIO, [d], MENSAJE), opciones.correos, opciones.hilos)
+                    pool.cerrar()
+            finally:
+                controlador.stop()
+
+            if sumidero.recibidos != opciones.correos:
+                print(f"[WARNING] El servidor recibió {sumidero.recibidos} de {opciones.correos} correos")
+            print(f"{latencia_ms:>13g} {modo:>14} {opciones.correos / duracion:>10.0f} {duracion:>9.2f} "
+                  f"{sumidero.conexiones:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark del HTML del correo unificado.
+
+Mide generar_html_recordatorio_agrupado (render completo) y
+preparar_correo_agrupado con la caché de HTML caliente (lo que pagan los
+reintentos y reenvíos) para clientes con 1, 50 y 2.000 facturas.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/render_correo.py
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import procesamiento
+
+
+TAMANOS = (1, 50, 2000)
+ESTADOS = ("vencido", "proximo", "no_vencido")
+
+
+def cliente_sintetico(cantidad_facturas, semilla=0):
+    """Cliente agrupado con `cantidad_facturas` facturas de estados aleatorios."""
+    aleatorio = random.Random(semilla)
+    recordatorios = []
+    for i in range(cantidad_facturas):
+        saldo = round(aleatorio.uniform(1000, 5e6), 2)
+        recordatorios.append({
+            "cliente": "CLIENTE DE PRUEBA SAS",
+            "correo_cliente": "cliente@ejemplo.com",
+            "vendedor": "VENDEDOR",
+            "correo_vendedor": "vendedor@ejemplo.com",
+            "local": "Bogotá",
+            "cupo": 50000000,
+            "numero_factura": f"FAC{i}",
+            "fecha_emision": "01/01/2026",
+            "fecha_vencimiento": "31/01/2026",
+            "dias": aleatorio.randint(-60, 60),
+            "saldo": f"${saldo:,.0f}",
+            "saldo_numerico": saldo,
+            "estado": aleatorio.choice(ESTADOS)
+        })
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return procesamiento.agrupar_recordatorios_por_cliente(recordatorios)[0]
+
+
+def medir(funcion, repeticiones):
+    """Mejor tiempo por llamada (µs) de 5 rondas."""
+    return min(timeit.repeat(funcion, number=repeticiones, repeat=5)) / repeticiones * 1e6
+
+
+def main():
+    print(f"{'facturas':>9} {'render (µs)':>13} {'caché (µs)':>12} {'KB HTML':>9}")
+    for cantidad in TAMANOS:
+        cliente = cliente_sintetico(cantidad)
+        repeticiones = max(5, 20000 // cantidad)
+
+        render = medir(lambda: procesamiento.generar_html_recordatorio_agrupado(cliente), repeticiones)
+        procesamiento.preparar_correo_agrupado(cliente)
+        cacheado = medir(lambda: procesamiento.preparar_correo_agrupado(cliente), repeticiones)
+        tamano = len(procesamiento.generar_html_recordatorio_agrupado(cliente).encode("utf-8")) / 1024
+
+        print(f"{cantidad:>9} {render:>13.1f} {cacheado:>12.1f} {tamano:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Suite de benchmarks del procesamiento de los Excel y del envío.
+
+Genera un listado de clientes y una "Cartera por edades" sintéticos
+(excel_sintetico.py) y mide:
+
+- cargar_excel (parseo con openpyxl) de cada libro,
+- leer_excel_clientes, IndiceClientes y leer_excel_cartera,
+- agrupar_recordatorios_por_cliente,
+- generar_html_recordatorio_agrupado (por correo),
+- /procesar-excel de punta a punta, con la caché de clientes fría y caliente,
+- /enviar-correos de punta a punta contra un servidor SMTP local (aiosmtpd).
+
+Los resultados (mejor tiempo y mediana de cada medición, parámetros,
+commit y máquina) se guardan en JSON. Con --comparar se muestran contra
+los de otra corrida y el proceso termina con código 1 si alguna medición
+empeoró más que --tolerancia.
+
+Uso (desde la raíz del proyecto; requiere aiosmtpd):
+    python benchmarks/suite.py [--clientes N] [--facturas N] [--fallos F] [--dispersion DIAS]
+                               [--repeticiones N] [--correos N] [--salida archivo.json]
+                               [--comparar anterior.json] [--tolerancia 0.1]
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import sumidero_smtp
+from excel_sintetico import generar_cartera, generar_clientes
+
+
+def _importar_app(puerto):
+    """Importa app.py apuntando el SMTP al sumidero local y sin bitácora ni cuota."""
+    os.environ.update(
+        EMAIL_HOST="127.0.0.1",
+        EMAIL_PORT=str(puerto),
+        EMAIL_USE_TLS="false",
+        EMAIL_USER="benchmark@ejemplo.com",
+        EMAIL_PASSWORD="benchmark",
+        CUOTA_DIARIA="0",
+        CUOTA_POR_SEGUNDO="0",
+        BITACORA_ENVIOS="",
+        CACHE_CLIENTES_DIR=""
+    )
+    os.environ.setdefault("LOG_NIVEL", "WARNING")
+    return importlib.import_module("app")
+
+
+def medir(funcion, repeticiones, preparar=None):
+    """
+    Llama `funcion()` `repeticiones` veces (antes de cada una, `preparar()`
+    si se pasa, fuera de la medición) y retorna los tiempos en ms.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "mejor_ms": round(min(tiempos), 3),
+        "mediana_ms": round(statistics.median(tiempos), 3),
+        "repeticiones": repeticiones
+    }
+
+
+def _commit():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                capture_output=True, text=True, timeout=10)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _maquina():
+    import openpyxl
+    import pandas as pd
+
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "nucleos": os.cpu_count(),
+        "pandas": pd.__version__,
+        "openpyxl": openpyxl.__version__
+    }
+
+
+def _archivos(contenido_clientes, contenido_cartera):
+    return {
+        "file1": (BytesIO(contenido_clientes), "clientes.xlsx"),
+        "file2": (BytesIO(contenido_cartera), "cartera.xlsx")
+    }
+
+
+def ejecutar(args):
+    """Corre todas las mediciones y retorna el documento de resultados."""
+    app = _importar_app(args.puerto)
+    import procesamiento
+    from emparejamiento import IndiceClientes
+
+    inicio = time.perf_counter()
+    contenido_clientes, nombres = generar_clientes(args.clientes, semilla=args.semilla)
+    contenido_cartera = generar_cartera(nombres, args.facturas, tasa_fallos=args.fallos,
+                                        dispersion_dias=args.dispersion, semilla=args.semilla)
+    print(f"Libros generados en {time.perf_counter() - inicio:.1f} s "
+          f"(clientes {len(contenido_clientes) / 1024:.0f} KB, cartera {len(contenido_cartera) / 1024:.0f} KB)")
+
+    resultados = {}
+    n = args.repeticiones
+
+    def registrar(nombre, medicion, **extra):
+        medicion.update(extra)
+        resultados[nombre] = medicion
+        detalle = " ".join(f"{clave}={valor}" for clave, valor in extra.items())
+        print(f"{nombre:<36} {medicion['mejor_ms']:>11.1f} {medicion['mediana_ms']:>11.1f}  {detalle}")
+
+    print(f"{'medición':<36} {'mejor (ms)':>11} {'mediana':>11}")
+
+    sondeo_clientes = procesamiento.sondear_excel(contenido_clientes)
+    sondeo_cartera = procesamiento.sondear_excel(contenido_cartera)
+    registrar("cargar_excel_clientes",
+              medir(lambda: procesamiento.cargar_excel(contenido_clientes, sondeo_clientes), n))
+    registrar("cargar_excel_cartera",
+              medir(lambda: procesamiento.cargar_excel(contenido_cartera, sondeo_cartera), n))
+
+    _, df_clientes = procesamiento.cargar_excel(contenido_clientes, sondeo_clientes)
+    _, df_cartera = procesamiento.cargar_excel(contenido_cartera, sondeo_cartera)
+
+    registrar("leer_excel_clientes",
+              medir(lambda: procesamiento.leer_excel_clientes(None, df=df_clientes.copy()), n))
+    dict_clientes, dict_vendedores = procesamiento.leer_excel_clientes(None, df=df_clientes.copy())
+
+    registrar("indice_clientes", medir(lambda: IndiceClientes(dict_clientes), n), clientes=len(dict_clientes))
+    indice = IndiceClientes(dict_clientes)
+
+    reporte = {}
+    registrar("leer_excel_cartera", medir(
+        lambda: procesamiento.leer_excel_cartera(None, dict_clientes, dict_vendedores, df=df_cartera.copy(),
+                                                 indice=indice), n
+    ), facturas=len(df_cartera))
+    recordatorios = procesamiento.leer_excel_cartera(None, dict_clientes, dict_vendedores, df=df_cartera.copy(),
+                                                     indice=indice, reporte=reporte)
+
+    registrar("agrupar_recordatorios_por_cliente",
+              medir(lambda: procesamiento.agrupar_recordatorios_por_cliente(recordatorios), n),
+              recordatorios=len(recordatorios))
+    agrupados = procesamiento.agrupar_recordatorios_por_cliente(recordatorios)
+
+    muestra = agrupados[:args.correos]
+    medicion = medir(lambda: [procesamiento.generar_html_recordatorio_agrupado(c) for c in muestra], n)
+    registrar("generar_html_recordatorio_agrupado", medicion, correos=len(muestra),
+              por_correo_us=round(medicion["mejor_ms"] * 1000 / max(1, len(muestra)), 1))
+
+    cliente = app.app.test_client()
+
+    def procesar():
+        respuesta = cliente.post("/procesar-excel", data=_archivos(contenido_clientes, contenido_cartera),
+                                 content_type="multipart/form-data")
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"/procesar-excel respondió {respuesta.status_code}")
+        return respuesta
+
+    registrar("procesar_excel_cache_fria", medir(procesar, n, preparar=procesamiento.cache_clientes.limpiar))
+    registrar("procesar_excel_cache_caliente", medir(procesar, n))
+
+    corrida_id = procesar().get_json()["corrida_id"]
+    grupos = list(range(min(args.correos, len(app.corridas.obtener(corrida_id).agrupacion()))))
+
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+    sumidero, controlador = sumidero_smtp.iniciar(args.puerto)
+    try:
+        def enviar():
+            respuesta = cliente.post("/enviar-correos", json={"corrida_id": corrida_id, "grupos": grupos})
+            trabajo_id = respuesta.get_json()["trabajo_id"]
+            # El stream de progreso termina cuando el trabajo termina
+            cliente.get(f"/enviar-correos/{trabajo_id}/progreso").get_data()
+            estado = cliente.get(f"/enviar-correos/{trabajo_id}").get_json()
+            if estado["exitosos"] != len(grupos):
+                raise RuntimeError(f"Solo {estado['exitosos']} de {len(grupos)} correos se enviaron")
+
+        medicion = medir(enviar, max(1, min(n, 3)))
+        registrar("enviar_correos", medicion, correos=len(grupos),
+                  correos_por_segundo=round(len(grupos) / (medicion["mejor_ms"] / 1000), 1))
+    finally:
+        controlador.stop()
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "maquina": _maquina(),
+        "parametros": {
+            "clientes": args.clientes,
+            "facturas_por_cliente": args.facturas,
+            "tasa_fallos": args.fallos,
+            "dispersion_dias": args.dispersion,
+            "semilla": args.semilla,
+            "repeticiones": n,
+            "correos": args.correos
+        },
+        "datos": {
+            "facturas_cartera": len(df_cartera),
+            "recordatorios": len(recordatorios),
+            "clientes_agrupados": len(agrupados),
+            "emparejamiento": reporte.get("facturas")
+        },
+        "resultados": resultados
+    }
+
+
+def comparar(actual, anterior, tolerancia):
+    """Imprime la razón actual/anterior de cada medición; retorna las que empeoraron más que `tolerancia`."""
+    if actual["parametros"] != anterior.get("parametros"):
+        print("[WARNING] Los parámetros de las dos corridas no son iguales")
+
+    print(f"\nContra {anterior.get('commit')} ({anterior.get('fecha')}):")
+    print(f"{'medición':<36} {'antes (ms)':>11} {'ahora (ms)':>11} {'razón':>7}")
+    regresiones = []
+    for nombre, medicion in actual["resultados"].items():
+        previa = anterior.get("resultados", {}).get(nombre)
+        if not previa:
+            continue
+        razon = medicion["mejor_ms"] / previa["mejor_ms"] if previa["mejor_ms"] else float("inf")
+        marca = ""
+        if razon > 1 + tolerancia:
+            regresiones.append(nombre)
+            marca = "  REGRESIÓN"
+        print(f"{nombre:<36} {previa['mejor_ms']:>11.1f} {medicion['mejor_ms']:>11.1f} {razon:>7.2f}{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del procesamiento y del envío con libros sintéticos")
+    parser.add_argument("--clientes", type=int, default=2000, help="clientes del listado")
+    parser.add_argument("--facturas", type=int, default=10, help="facturas por cliente (promedio)")
+    parser.add_argument("--fallos", type=float, default=0.1, help="fracción de facturas sin match exacto")
+    parser.add_argument("--dispersion", type=int, default=90, help="días alrededor de hoy de los vencimientos")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--correos", type=int, default=300, help="correos del HTML y del envío de punta a punta")
+    parser.add_argument("--puerto", type=int, default=8126, help="puerto del servidor SMTP local")
+    parser.add_argument("--salida", default="benchmark.json", help="archivo JSON de resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.1, help="empeoramiento admitido al comparar")
+    args = parser.parse_args()
+
+    resultado = ejecutar(args)
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+        if comparar(resultado, anterior, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Servidor SMTP local (aiosmtpd) para los benchmarks de envío.
+
+Acepta cualquier LOGIN sin TLS y descarta los mensajes. Con `latencia`
+(segundos) cada EHLO y cada DATA esperan ese tiempo antes de responder,
+como la ida y vuelta a un proveedor real: la espera es por conexión, así
+que el servidor atiende varias conexiones a la vez.
+"""
+
+import asyncio
+import logging
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+# aiosmtpd avisa en cada LOGIN que Session.login_data está obsoleto
+logging.getLogger("mail.log").setLevel(logging.ERROR)
+
+
+class Sumidero:
+    """Servidor SMTP que acepta y descarta todo (EHLO y DATA tras `latencia` segundos)."""
+
+    def __init__(self, latencia=0):
+        self.latencia = latencia
+        self.recibidos = 0
+        self.conexiones = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        # Una sesión nueva por conexión (el EHLO después de STARTTLS no aplica: sin TLS)
+        if session.host_name is None:
+            self.conexiones += 1
+        session.host_name = hostname
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        self.recibidos += 1
+        return "250 OK"
+
+
+def _autenticar(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+def iniciar(puerto, latencia=0):
+    """Arranca el sumidero en 127.0.0.1:`puerto`; retorna (sumidero, controlador)."""
+    sumidero = Sumidero(latencia)
+    controlador = Controller(sumidero, hostname="127.0.0.1", port=puerto,
+                             authenticator=_autenticar, auth_require_tls=False)
+    controlador.start()
+    return sumidero, controlador
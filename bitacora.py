@@ -0,0 +1,294 @@
+"""
+Bitácora durable de envíos (SQLite en modo WAL).
+
+Cada trabajo de envío abre un lote con UNA fila por cliente, escrita antes
+de enviar nada. Cada fila guarda el destinatario, la huella del contenido
+del mensaje, el estado (pendiente / enviado / fallido), la respuesta SMTP y
+los datos del cliente agrupado, así que un lote interrumpido (caída del
+proceso, reinicio) se puede reanudar enviando solo lo que no salió.
+
+Los clientes que la cuota diaria deja en cola van en lotes de filas
+'diferido': no se reanudan como pendientes, sino que vuelven a la cola del
+planificador al reiniciar y pasan a 'pendiente' cuando salen de ella.
+
+Los resultados se escriben en lotes desde un hilo aparte (cada `max_lote`
+resultados o cada `intervalo` segundos) para no frenar el envío. Si el
+proceso muere, lo perdido es a lo sumo ese último intervalo.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import registro
+
+log = registro.obtener(__name__)
+
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS lotes (
+    lote TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    creado_en TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS envios (
+    lote TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    cliente TEXT,
+    destinatario TEXT,
+    cc TEXT,
+    huella TEXT,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    respuesta TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    datos TEXT NOT NULL,
+    actualizado_en TEXT NOT NULL,
+    PRIMARY KEY (lote, posicion)
+);
+
+CREATE INDEX IF NOT EXISTS envios_estado ON envios (lote, estado);
+"""
+
+_CERRAR = object()
+
+
+def _ahora():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class LoteBitacora:
+    """Filas de un lote que se van a enviar; `indice` es la posición en la lista enviada."""
+
+    def __init__(self, bitacora, lote_id, posiciones):
+        self.bitacora = bitacora
+        self.id = lote_id
+        self.posiciones = posiciones
+
+    def sublote(self, indices):
+        """Mismo lote restringido a `indices` (p. ej. para reenviar solo los fallidos)."""
+        return LoteBitacora(self.bitacora, self.id, [self.posiciones[i] for i in indices])
+
+    def registrar(self, indice, exitoso, huella, respuesta, intentos=1):
+        self.bitacora._encolar((
+            "enviado" if exitoso else "fallido",
+            huella,
+            respuesta,
+            intentos,
+            _ahora(),
+            self.id,
+            self.posiciones[indice]
+        ))
+
+
+class BitacoraEnvios:
+    """Bitácora de envíos compartida entre hilos."""
+
+    def __init__(self, ruta, max_lote=200, intervalo=0.25):
+        self.ruta = ruta
+        self.max_lote = max(1, int(max_lote))
+        self.intervalo = intervalo
+
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(ESQUEMA)
+        self._lock = threading.Lock()
+
+        self._cola = queue.Queue()
+        self._escritor = threading.Thread(target=self._escribir_continuamente, name="bitacora", daemon=True)
+        self._escritor.start()
+
+    # ---- escritura ----
+
+    def _encolar(self, fila):
+        self._cola.put(fila)
+
+    def _escribir_continuamente(self):
+        """Hilo escritor: agrupa actualizaciones y las aplica en una transacción."""
+        while True:
+            filas = []
+            avisos = []
+            cerrar = False
+
+            item = self._cola.get()
+            limite = time.monotonic() + self.intervalo
+            while True:
+                if item is _CERRAR:
+                    cerrar = True
+                    break
+                if isinstance(item, threading.Event):
+                    avisos.append(item)
+                    break
+                filas.append(item)
+                if len(filas) >= self.max_lote:
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+
+            if filas:
+                try:
+                    with self._lock, self._conexion:
+                        self._conexion.execute("BEGIN")
+                        self._conexion.executemany(
+                            "UPDATE envios SET estado = ?, huella = ?, respuesta = ?, intentos = intentos + ?, "
+                            "actualizado_en = ? WHERE lote = ? AND posicion = ?",
+                            filas
+                        )
+                except sqlite3.Error as e:
+                    log.error("No se pudo escribir en la bitácora de envíos", error=str(e), filas=len(filas))
+
+            for aviso in avisos:
+                aviso.set()
+            if cerrar:
+                return
+
+    def vaciar(self, timeout=None):
+        """Espera a que todo lo registrado hasta ahora quede escrito en disco."""
+        aviso = threading.Event()
+        self._cola.put(aviso)
+        return aviso.wait(timeout)
+
+    def cerrar(self):
+        self._cola.put(_CERRAR)
+        self._escritor.join(timeout=5)
+        with self._lock:
+            self._conexion.close()
+
+    # ---- lotes ----
+
+    def abrir_lote(self, lote_id, clientes, preparar, serializar=None, estado="pendiente"):
+        """
+        Registra un lote nuevo con una fila `estado` ('pendiente' o
+        'diferido') por cliente.
+
+        `preparar(cliente)` retorna (destinatario, cc) y `serializar(cliente)`
+        lo que se guarda como JSON (por defecto el cliente tal cual). Escribe
+        de inmediato (antes de enviar) y retorna el LoteBitacora.
+        """
+        ahora = _ahora()
+        filas = []
+        for posicion, cliente in enumerate(clientes):
+            destinatario, cc = preparar(cliente)
+            filas.append((
+                lote_id, posicion, cliente.get("cliente"), destinatario, cc, estado,
+                json.dumps(serializar(cliente) if serializar else cliente, ensure_ascii=False), ahora
+            ))
+
+        with self._lock, self._conexion:
+            self._conexion.execute("BEGIN")
+            self._conexion.execute(
+                "INSERT INTO lotes (lote, total, creado_en) VALUES (?, ?, ?)",
+                (lote_id, len(filas), ahora)
+            )
+            self._conexion.executemany(
+                "INSERT INTO envios (lote, posicion, cliente, destinatario, cc, estado, datos, actualizado_en) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                filas
+            )
+
+        return LoteBitacora(self, lote_id, list(range(len(filas))))
+
+    def lote_pendiente(self, lote_id, limite=None):
+        """
+        Entradas sin enviar (pendientes o fallidas, no las diferidas) de un lote, en su orden.
+
+        Retorna (LoteBitacora, clientes) o (None, None) si el lote no existe.
+        """
+        self.vaciar()
+        with self._lock:
+            if self._conexion.execute("SELECT 1 FROM lotes WHERE lote = ?", (lote_id,)).fetchone() is None:
+                return None, None
+            consulta = ("SELECT posicion, datos FROM envios WHERE lote = ? AND estado IN ('pendiente', 'fallido') "
+                        "ORDER BY posicion")
+            parametros = (lote_id,)
+            if limite is not None:
+                consulta += " LIMIT ?"
+                parametros += (limite,)
+            filas = self._conexion.execute(consulta, parametros).fetchall()
+
+        lote = LoteBitacora(self, lote_id, [posicion for posicion, _ in filas])
+        return lote, [json.loads(datos) for _, datos in filas]
+
+    def diferidos(self):
+        """
+        Entradas en cola por la cuota diaria, de todos los lotes, en el orden
+        en que se difirieron: lista de (lote, posición, cliente).
+        """
+        self.vaciar()
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT e.lote, e.posicion, e.datos FROM envios e JOIN lotes l ON l.lote = e.lote "
+                "WHERE e.estado = 'diferido' ORDER BY l.creado_en, e.lote, e.posicion"
+            ).fetchall()
+        return [(lote_id, posicion, json.loads(datos)) for lote_id, posicion, datos in filas]
+
+    def sacar_de_cola(self, lote_id, posiciones):
+        """Pasa entradas 'diferido' a 'pendiente' (salen de la cola para enviarse)."""
+        with self._lock, self._conexion:
+            self._conexion.execute("BEGIN")
+            self._conexion.executemany(
+                "UPDATE envios SET estado = 'pendiente', actualizado_en = ? "
+                "WHERE lote = ? AND posicion = ? AND estado = 'diferido'",
+                [(_ahora(), lote_id, posicion) for posicion in posiciones]
+            )
+
+    def resumen_lote(self, lote_id):
+        """Totales por estado de un lote (None si no existe)."""
+        with self._lock:
+            lote = self._conexion.execute(
+                "SELECT total, creado_en FROM lotes WHERE lote = ?", (lote_id,)
+            ).fetchone()
+            if lote is None:
+                return None
+            conteos = dict(self._conexion.execute(
+                "SELECT estado, COUNT(*) FROM envios WHERE lote = ? GROUP BY estado", (lote_id,)
+            ).fetchall())
+
+        return {
+            "lote": lote_id,
+            "total": lote[0],
+            "creado_en": lote[1],
+            "enviados": conteos.get("enviado", 0),
+            "fallidos": conteos.get("fallido", 0),
+            "pendientes": conteos.get("pendiente", 0),
+            "diferidos": conteos.get("diferido", 0)
+        }
+
+    def enviados_del_dia(self, dia):
+        """Correos registrados como enviados el día `dia` (en cualquier lote)."""
+        self.vaciar()
+        with self._lock:
+            (enviados,) = self._conexion.execute(
+                "SELECT COUNT(*) FROM envios WHERE estado = 'enviado' AND substr(actualizado_en, 1, 10) = ?",
+                (dia.isoformat(),)
+            ).fetchone()
+        return enviados
+
+    def entradas_lote(self, lote_id):
+        """Filas de un lote sin los datos del cliente."""
+        with self._lock:
+            cursor = self._conexion.execute(
+                "SELECT posicion, cliente, destinatario, cc, huella, estado, respuesta, intentos, actualizado_en "
+                "FROM envios WHERE lote = ? ORDER BY posicion", (lote_id,)
+            )
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    def lotes_incompletos(self):
+        """Lotes con entradas sin enviar (pendientes o fallidas), del más reciente al más antiguo."""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT l.lote FROM lotes l WHERE EXISTS "
+                "(SELECT 1 FROM envios e WHERE e.lote = l.lote AND e.estado IN ('pendiente', 'fallido')) "
+                "ORDER BY l.creado_en DESC"
+            ).fetchall()
+        return [self.resumen_lote(lote_id) for (lote_id,) in filas]
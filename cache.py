@@ -0,0 +1,135 @@
+"""
+Caché por huella de contenido (SHA-256 de los bytes subidos).
+
+Dos capas:
+- Memoria: LRU acotada por número de entradas.
+- Disco (opcional): un archivo por huella, pickle comprimido con zlib,
+  para que la caché sobreviva a reinicios del servidor.
+
+Cada entrada guarda el valor y la fecha/hora en que se parseó.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import registro
+
+log = registro.obtener(__name__)
+
+
+def huella_contenido(contenido):
+    """Retorna la huella SHA-256 (hex) de un contenido en bytes."""
+    return hashlib.sha256(contenido).hexdigest()
+
+
+class CacheHuella:
+    """Caché LRU en memoria con respaldo opcional en disco, segura entre hilos."""
+
+    def __init__(self, max_entradas=8, directorio=None):
+        self.max_entradas = max(1, int(max_entradas))
+        self.directorio = directorio or None
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_memoria = 0
+        self._hits_disco = 0
+        self._misses = 0
+
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, f"{clave}.bin")
+
+    def _leer_disco(self, clave):
+        if not self.directorio:
+            return None
+        try:
+            with open(self._ruta(clave), "rb") as f:
+                return pickle.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning("Entrada de caché ilegible", clave=clave, error=str(e))
+            return None
+
+    def _escribir_disco(self, clave, entrada):
+        if not self.directorio:
+            return
+        ruta = self._ruta(clave)
+        temporal = f"{ruta}.tmp"
+        try:
+            with open(temporal, "wb") as f:
+                f.write(zlib.compress(pickle.dumps(entrada, protocol=pickle.HIGHEST_PROTOCOL)))
+            os.replace(temporal, ruta)
+        except OSError as e:
+            log.warning("No se pudo guardar la caché en disco", error=str(e))
+
+    def _recordar(self, clave, entrada):
+        """Inserta en memoria como la más reciente y descarta la más antigua si sobra."""
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def buscar(self, *claves):
+        """
+        Busca la primera clave presente (memoria y luego disco).
+
+        Cuenta UN hit o UN miss por llamada, aunque se pasen varias claves.
+        Retorna (clave, entrada) o (None, None).
+        """
+        with self._lock:
+            for clave in claves:
+                if clave in self._entradas:
+                    self._entradas.move_to_end(clave)
+                    self._hits_memoria += 1
+                    return clave, self._entradas[clave]
+
+            for clave in claves:
+                entrada = self._leer_disco(clave)
+                if entrada is not None:
+                    self._recordar(clave, entrada)
+                    self._hits_disco += 1
+                    return clave, entrada
+
+            self._misses += 1
+            return None, None
+
+    def obtener(self, clave):
+        """Retorna la entrada {'valor', 'parseado_en'} de una clave o None."""
+        return self.buscar(clave)[1]
+
+    def guardar(self, clave, valor):
+        """Guarda un valor recién parseado y retorna su entrada."""
+        entrada = {
+            "valor": valor,
+            "parseado_en": datetime.now().isoformat(timespec="seconds")
+        }
+        with self._lock:
+            self._recordar(clave, entrada)
+        self._escribir_disco(clave, entrada)
+        return entrada
+
+    def limpiar(self):
+        """Vacía la capa en memoria (el disco se conserva)."""
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        """Contadores de aciertos/fallos y ocupación."""
+        with self._lock:
+            consultas = self._hits_memoria + self._hits_disco + self._misses
+            return {
+                "hits_memoria": self._hits_memoria,
+                "hits_disco": self._hits_disco,
+                "misses": self._misses,
+                "tasa_aciertos": round((self._hits_memoria + self._hits_disco) / consultas, 3) if consultas else 0.0,
+                "entradas_memoria": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "disco": self.directorio
+            }
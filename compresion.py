@@ -0,0 +1,41 @@
+"""
+Compresión de respuestas JSON grandes (brotli o gzip).
+
+comprimir_respuesta() se registra como after_request de Flask: si el
+navegador acepta br o gzip y la respuesta es JSON de al menos `minimo`
+bytes, la comprime. brotli es opcional (pip install brotli); si no está
+instalado solo se usa gzip. Las respuestas en streaming (progreso SSE) no
+se tocan.
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+
+def comprimir_respuesta(respuesta, codificaciones_aceptadas, minimo=1024, nivel_gzip=5, calidad_brotli=4):
+    """
+    Comprime `respuesta` según `codificaciones_aceptadas`
+    (request.accept_encodings) y la retorna.
+    """
+    if (respuesta.is_streamed or respuesta.direct_passthrough
+            or respuesta.mimetype != "application/json"
+            or "Content-Encoding" in respuesta.headers):
+        return respuesta
+
+    respuesta.vary.add("Accept-Encoding")
+    datos = respuesta.get_data()
+    if len(datos) < minimo:
+        return respuesta
+
+    if brotli is not None and codificaciones_aceptadas["br"]:
+        respuesta.set_data(brotli.compress(datos, quality=calidad_brotli))
+        respuesta.headers["Content-Encoding"] = "br"
+    elif codificaciones_aceptadas["gzip"]:
+        respuesta.set_data(gzip.compress(datos, compresslevel=nivel_gzip))
+        respuesta.headers["Content-Encoding"] = "gzip"
+
+    return respuesta
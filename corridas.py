@@ -0,0 +1,215 @@
+"""
+Almacén de corridas de procesamiento.
+
+/procesar-excel guarda aquí los recordatorios que produjo y retorna el id de
+la corrida; /enviar-correos recibe solo ese id y la selección de clientes en
+lugar de volver a subir todos los recordatorios.
+
+- Cada corrida vence `ttl` segundos después de su último uso.
+- Se retienen como máximo `max_corridas` corridas y `max_facturas`
+  recordatorios en total (aprox. la memoria ocupada); al pasarse se
+  descartan las menos usadas recientemente.
+- La agrupación por cliente (agrupacion.AgrupacionClientes) se calcula una
+  sola vez por corrida; el navegador la recibe en las páginas y elige los
+  clientes a enviar por id de grupo.
+- El formato columnar (paginado): los datos del cliente van una vez por
+  cliente (la tabla de clientes se calcula una sola vez por corrida), los
+  de la factura en columnas que se arman al pedir cada página, y los
+  textos solo de presentación (saldo formateado, clase del badge) se dejan
+  al navegador.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from agrupacion import AgrupacionClientes
+from facturas import ESTADOS, codigo_estado
+
+
+# Campos que se repiten en todas las facturas de un mismo cliente
+CAMPOS_CLIENTE = ("cliente", "correo_cliente", "vendedor", "correo_vendedor", "local", "cupo")
+CAMPOS_FACTURA = ("numero_factura", "fecha_emision", "fecha_vencimiento", "dias", "saldo_numerico")
+
+
+def clientes_recordatorios(recordatorios):
+    """
+    Clientes de los recordatorios en formato columnar: (ids, columnas).
+
+    `columnas` tiene una columna por campo de CAMPOS_CLIENTE, con una fila
+    por cada combinación distinta de esos campos, e `ids` (arreglo de
+    numpy) la fila de cada recordatorio.
+    """
+    ids_clientes = {}
+    filas_clientes = []
+    ids = np.empty(len(recordatorios), dtype=np.int64)
+
+    for posicion, recordatorio in enumerate(recordatorios):
+        clave = tuple(recordatorio.get(campo) for campo in CAMPOS_CLIENTE)
+        id_cliente = ids_clientes.get(clave)
+        if id_cliente is None:
+            id_cliente = ids_clientes[clave] = len(filas_clientes)
+            filas_clientes.append(clave)
+        ids[posicion] = id_cliente
+
+    columnas_clientes = list(zip(*filas_clientes)) or [()] * len(CAMPOS_CLIENTE)
+    return ids, {campo: list(valores) for campo, valores in zip(CAMPOS_CLIENTE, columnas_clientes)}
+
+
+def columnas_facturas(recordatorios):
+    """Una columna por campo de CAMPOS_FACTURA, más "estado" (posición en ESTADOS)."""
+    facturas = {campo: [r.get(campo) for r in recordatorios] for campo in CAMPOS_FACTURA}
+    facturas["estado"] = [codigo_estado(r) for r in recordatorios]
+    return facturas
+
+
+def normalizar_clave_cliente(cliente, email):
+    """Clave (cliente, email) con la misma normalización que normalizarTexto() en app.js."""
+    return (
+        str(cliente).strip().lower() if cliente else "",
+        str(email).strip().lower() if email else ""
+    )
+
+
+class Corrida:
+    """Resultado de un /procesar-excel retenido en el servidor."""
+
+    __slots__ = ("id", "recordatorios", "creada_en", "ultimo_uso", "_agrupacion", "_clientes", "_lock")
+
+    def __init__(self, recordatorios):
+        self.id = uuid.uuid4().hex
+        self.recordatorios = recordatorios
+        self.creada_en = datetime.now()
+        self.ultimo_uso = time.monotonic()
+        self._agrupacion = None
+        self._clientes = None
+        self._lock = threading.Lock()
+
+    def agrupacion(self):
+        """AgrupacionClientes de los recordatorios, calculada una sola vez."""
+        with self._lock:
+            if self._agrupacion is None:
+                self._agrupacion = AgrupacionClientes(self.recordatorios)
+            return self._agrupacion
+
+    def pagina(self, numero, por_pagina):
+        """
+        Página `numero` (desde 1) del formato columnar, con `por_pagina`
+        facturas. "clientes" trae solo los clientes de esas facturas, con su
+        "id" (la referencia de facturas["cliente"]), y "grupos" el resumen
+        de sus clientes agrupados, con su "id" (facturas["grupo"]), así las
+        páginas se pueden unir en el navegador.
+        """
+        agrupacion = self.agrupacion()
+        with self._lock:
+            if self._clientes is None:
+                self._clientes = clientes_recordatorios(self.recordatorios)
+            ids_clientes, columnas_clientes = self._clientes
+
+        total = len(self.recordatorios)
+        total_paginas = max(1, -(-total // por_pagina))
+        inicio = (numero - 1) * por_pagina
+        fin = min(total, inicio + por_pagina)
+
+        # Las columnas de las facturas (con sus textos) se arman solo para esta página
+        facturas = columnas_facturas(self.recordatorios[inicio:fin])
+        facturas["cliente"] = ids_clientes[inicio:fin].tolist()
+        facturas["grupo"] = agrupacion.ids[inicio:fin].tolist()
+        ids = sorted(set(facturas["cliente"]))
+        clientes = {"id": ids}
+        for campo, valores in columnas_clientes.items():
+            clientes[campo] = [valores[i] for i in ids]
+
+        return {
+            "estados": list(ESTADOS),
+            "clientes": clientes,
+            "grupos": agrupacion.columnas(sorted(set(facturas["grupo"]))),
+            "facturas": facturas,
+            "pagina": {
+                "numero": numero,
+                "por_pagina": por_pagina,
+                "total_paginas": total_paginas,
+                "total_facturas": total
+            }
+        }
+
+    def seleccionar_grupos(self, grupos):
+        """
+        Clientes agrupados con id en `grupos` (ids de facturas["grupo"]), en
+        el orden de la corrida. Ids repetidos o fuera de rango se ignoran.
+        """
+        return self.agrupacion().clientes(grupos)
+
+    def seleccionar(self, seleccion):
+        """
+        Clientes agrupados cuya clave normalizada (cliente, email) está en
+        `seleccion` (iterable de dicts {"cliente", "email"}), en el orden de
+        la corrida.
+        """
+        claves = {normalizar_clave_cliente(s.get("cliente"), s.get("email")) for s in seleccion}
+        agrupacion = self.agrupacion()
+        resumen = agrupacion.resumen
+        return agrupacion.clientes([
+            grupo for grupo in range(len(agrupacion))
+            if normalizar_clave_cliente(resumen["cliente"][grupo], resumen["correo_cliente"][grupo]) in claves
+        ])
+
+
+class AlmacenCorridas:
+    """Corridas por id con TTL y tope de memoria, seguro entre hilos."""
+
+    def __init__(self, ttl=3600, max_corridas=8, max_facturas=500000):
+        self.ttl = ttl
+        self.max_corridas = max(1, int(max_corridas))
+        self.max_facturas = max(1, int(max_facturas))
+        self._corridas = OrderedDict()
+        self._facturas = 0
+        self._lock = threading.Lock()
+
+    def _quitar(self, corrida_id):
+        corrida = self._corridas.pop(corrida_id)
+        self._facturas -= len(corrida.recordatorios)
+
+    def _purgar(self):
+        """Descarta vencidas y, si sobra, las menos usadas (requiere self._lock)."""
+        limite = time.monotonic() - self.ttl
+        for corrida_id in [c.id for c in self._corridas.values() if c.ultimo_uso < limite]:
+            self._quitar(corrida_id)
+
+        # La más reciente se conserva siempre, aunque sola exceda el tope
+        while len(self._corridas) > 1 and (len(self._corridas) > self.max_corridas or self._facturas > self.max_facturas):
+            self._quitar(next(iter(self._corridas)))
+
+    def guardar(self, recordatorios):
+        """Retiene los recordatorios de una corrida y la retorna."""
+        corrida = Corrida(recordatorios)
+        with self._lock:
+            self._corridas[corrida.id] = corrida
+            self._facturas += len(recordatorios)
+            self._purgar()
+        return corrida
+
+    def obtener(self, corrida_id):
+        """Retorna la corrida (renovando su TTL) o None si no existe o venció."""
+        with self._lock:
+            self._purgar()
+            corrida = self._corridas.get(corrida_id)
+            if corrida is not None:
+                corrida.ultimo_uso = time.monotonic()
+                self._corridas.move_to_end(corrida_id)
+            return corrida
+
+    def estadisticas(self):
+        with self._lock:
+            self._purgar()
+            return {
+                "corridas": len(self._corridas),
+                "facturas": self._facturas,
+                "max_corridas": self.max_corridas,
+                "max_facturas": self.max_facturas,
+                "ttl_segundos": self.ttl
+            }
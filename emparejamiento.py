@@ -0,0 +1,234 @@
+"""
+Emparejamiento de "Nombre tercero" (cartera) con los clientes del Excel 1.
+
+Tres pasos, del más seguro al menos seguro:
+
+1. Exacto: el nombre normalizado (trim + minúsculas) es una clave del
+   diccionario de clientes.
+2. Canónico: sin tildes, sin puntuación y sin sufijos societarios
+   ("S.A.S", "Ltda", ...), el nombre coincide con el de un solo cliente.
+3. Aproximado: similitud de Dice entre los trigramas del nombre canónico y
+   los de cada cliente. El mejor cliente es candidato si llega a `umbral` y
+   le saca al menos `margen` al segundo (si no, es ambiguo). Se descarta si
+   sus números o sus palabras de sede ("sede", "sucursal", "norte", ...) no
+   son los mismos del nombre: "Ferretería 3" y "Ferretería 2" o "Sede Sur"
+   y "Sede Norte" se parecen mucho pero son otra empresa u otra sede.
+   Por defecto el candidato aproximado solo se reporta (no se le asignan
+   las facturas); `asignar_aproximadas` lo asigna.
+
+   Nunca se recorre todo el listado: con un índice invertido trigrama ->
+   clientes, los candidatos salen solo de los trigramas más raros del
+   nombre (filtro de prefijo: un cliente con similitud >= umbral - margen
+   comparte por fuerza alguno de ellos) y de un tamaño compatible. Con esos
+   candidatos el mejor y el segundo son exactos, no aproximados.
+
+IndiceClientes se construye una vez por listado de clientes y se guarda en
+la caché junto a él (es serializable con pickle; `version` distingue los
+índices guardados por versiones anteriores); el umbral y el margen se pasan
+en cada emparejamiento. Los empates se resuelven siempre a favor del nombre
+que va primero en orden alfabético.
+"""
+
+import math
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+SUFIJOS_SOCIETARIOS = re.compile(
+    r"(\s+(sas|s a s|sa|s a|ltda|limitada|sca|scs|eu|bic|s en c|en c|y cia|cia|"
+    r"sociedad por acciones simplificada|sociedad anonima))+$"
+)
+
+
+# Palabras que distinguen una sede o sucursal de otra del mismo cliente
+PALABRAS_SEDE = frozenset((
+    "sede", "sucursal", "agencia", "punto", "local", "bodega", "planta", "almacen", "tienda",
+    "norte", "sur", "oriente", "occidente", "este", "oeste", "centro", "central"
+))
+
+VERSION_INDICE = 2
+
+_SIN_IDS = np.array([], dtype=np.int32)
+
+
+def canonizar(nombre):
+    """Nombre sin tildes, puntuación, espacios repetidos ni sufijos societarios."""
+    texto = unicodedata.normalize("NFKD", str(nombre or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = texto.replace(".", "").replace("&", " y ")
+    texto = " ".join(re.sub(r"[^0-9a-zñ]+", " ", texto).split())
+    sin_sufijo = SUFIJOS_SOCIETARIOS.sub("", texto)
+    return sin_sufijo or texto
+
+
+def distintivos(canonico):
+    """Palabras de un nombre canónico que no pueden cambiar en un match aproximado (números y sedes)."""
+    return frozenset(
+        palabra for palabra in canonico.split()
+        if palabra in PALABRAS_SEDE or any(c.isdigit() for c in palabra)
+    )
+
+
+def trigramas(texto):
+    """Trigramas distintos de `texto` con un espacio de relleno a cada lado."""
+    relleno = f" {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceClientes:
+    """Índice de nombres de clientes para el emparejamiento en tres pasos."""
+
+    def __init__(self, claves):
+        self.claves = frozenset(claves)
+        self.version = VERSION_INDICE
+
+        # Nombre canónico -> claves del diccionario (más de una: ambiguo), en
+        # orden alfabético: los ids y los desempates no dependen del hash
+        self._canonicas = {}
+        for clave in sorted(self.claves):
+            self._canonicas.setdefault(canonizar(clave), []).append(clave)
+        self._nombres = list(self._canonicas)
+
+        # Listas de ids ordenadas (se llenan en orden de id)
+        postings = {}
+        tamanos = []
+        for id_nombre, nombre in enumerate(self._nombres):
+            grams = trigramas(nombre)
+            tamanos.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(id_nombre)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._tamanos = np.array(tamanos, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.claves)
+
+    def buscar(self, nombre, umbral=0.85, margen=0.05):
+        """
+        Empareja un nombre normalizado que no tuvo match exacto.
+
+        Retorna (clave o None, método, confianza, candidato) con método
+        "canonica", "aproximada", "ambigua", "descartada" (aproximada con
+        otros números o palabras de sede) o "sin_coincidencia".
+        `candidato` es el mejor cliente aunque no se haya aceptado.
+        """
+        canonico = canonizar(nombre)
+        claves = self._canonicas.get(canonico)
+        if claves is not None:
+            if len(claves) == 1:
+                return claves[0], "canonica", 1.0, claves[0]
+            return None, "ambigua", 1.0, sorted(claves)[0]
+
+        grams = trigramas(canonico)
+        n = len(grams)
+        if not n:
+            return None, "sin_coincidencia", 0.0, None
+        corte = min(max(umbral - margen, 0.01), 1.0)
+
+        # Dice >= corte exige compartir `minimo` trigramas y un tamaño entre
+        # `menor` y `mayor`; esos clientes están en las listas de los
+        # n - minimo + 1 trigramas más raros (los que no están en el índice,
+        # con lista vacía, cuentan como los más raros).
+        minimo = max(1, math.ceil(corte * n / (2 - corte)))
+        menor, mayor = corte * n / (2 - corte), (2 - corte) * n / corte
+        listas = sorted((self._postings.get(gram, _SIN_IDS) for gram in grams), key=len)
+        prefijo, resto = listas[:n - minimo + 1], listas[n - minimo + 1:]
+
+        ids_prefijo, comunes_prefijo = np.unique(np.concatenate(prefijo), return_counts=True)
+        tamanos = self._tamanos[ids_prefijo]
+        posibles = (tamanos >= menor) & (tamanos <= mayor)
+        ids, comunes, tamanos = ids_prefijo[posibles], comunes_prefijo[posibles], tamanos[posibles]
+
+        # Trigramas compartidos que necesita cada candidato para llegar al
+        # corte; se descarta apenas ni compartiendo todos los que faltan llega
+        necesarios = np.ceil(corte * (n + tamanos) / 2 - 1e-9)
+        for faltan, lista in zip(range(len(resto), 0, -1), resto):
+            vivos = comunes + faltan >= necesarios
+            if not vivos.all():
+                ids, comunes, tamanos, necesarios = ids[vivos], comunes[vivos], tamanos[vivos], necesarios[vivos]
+            if not len(ids):
+                break
+            posiciones = np.minimum(np.searchsorted(lista, ids), len(lista) - 1)
+            comunes += lista[posiciones] == ids
+
+        vivos = comunes >= necesarios
+        if not vivos.any():
+            return (None, "sin_coincidencia") + self._mas_parecido(grams, ids_prefijo, comunes_prefijo)
+        ids, comunes, tamanos = ids[vivos], comunes[vivos], tamanos[vivos]
+
+        puntajes = 2.0 * comunes / (n + tamanos)
+        orden = np.argsort(-puntajes, kind="stable")[:2]
+        mejor = float(puntajes[orden[0]])
+        segundo = float(puntajes[orden[1]]) if len(orden) > 1 else 0.0
+        claves = self._canonicas[self._nombres[ids[orden[0]]]]
+        candidato = sorted(claves)[0]
+
+        if mejor < umbral:
+            return None, "sin_coincidencia", round(mejor, 3), candidato
+        if len(claves) > 1 or mejor - segundo < margen:
+            return None, "ambigua", round(mejor, 3), candidato
+        if distintivos(canonico) != distintivos(self._nombres[ids[orden[0]]]):
+            return None, "descartada", round(mejor, 3), candidato
+        return candidato, "aproximada", round(mejor, 3), candidato
+
+    def _mas_parecido(self, grams, ids, comunes):
+        """(confianza, cliente) del que más trigramas raros comparte, solo para el reporte."""
+        if not len(ids):
+            return 0.0, None
+        nombre = self._nombres[ids[np.argmax(comunes)]]
+        otros = trigramas(nombre)
+        return round(2.0 * len(grams & otros) / (len(grams) + len(otros)), 3), sorted(self._canonicas[nombre])[0]
+
+    def emparejar(self, nombres, originales=None, umbral=0.85, margen=0.05, asignar_aproximadas=False):
+        """
+        Empareja una columna de nombres normalizados.
+
+        Retorna (claves, reporte): `claves` es una Series alineada con
+        `nombres` con la clave del cliente o None, y `reporte` cuenta las
+        facturas por método y detalla cada nombre distinto que no tuvo
+        match exacto (con el texto original si se pasa `originales`).
+        Los matches aproximados quedan en el reporte con su candidato pero
+        sin cliente, salvo con `asignar_aproximadas`.
+        """
+        exactos = nombres.isin(self.claves)
+        pendientes = nombres[~exactos]
+        veces = pendientes.value_counts(sort=False)
+
+        if originales is not None:
+            primer_original = originales[~exactos].groupby(pendientes, sort=False).first()
+        else:
+            primer_original = pd.Series(veces.index, index=veces.index)
+
+        asignadas = {}
+        detalle = []
+        facturas_por_metodo = {"exacta": int(exactos.sum()), "canonica": 0, "aproximada": 0,
+                               "ambigua": 0, "descartada": 0, "sin_coincidencia": 0}
+        for nombre, cantidad in veces.items():
+            clave, metodo, confianza, candidato = self.buscar(nombre, umbral, margen)
+            if metodo == "aproximada" and not asignar_aproximadas:
+                clave = None
+            if clave is not None:
+                asignadas[nombre] = clave
+            facturas_por_metodo[metodo] += int(cantidad)
+            detalle.append({
+                "nombre": str(primer_original[nombre]),
+                "cliente": clave,
+                "candidato": candidato,
+                "metodo": metodo,
+                "confianza": confianza,
+                "facturas": int(cantidad)
+            })
+
+        claves = nombres.where(exactos, nombres.map(asignadas))
+        claves = claves.astype(object).where(claves.notna(), None)
+
+        reporte = {
+            "facturas": facturas_por_metodo,
+            "umbral": umbral,
+            "aproximadas_asignadas": asignar_aproximadas,
+            "detalle": sorted(detalle, key=lambda d: (d["cliente"] is not None, -d["facturas"]))
+        }
+        return claves, reporte
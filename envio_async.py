@@ -0,0 +1,178 @@
+"""
+Motor de envío asíncrono (asyncio + aiosmtplib) como alternativa al
+ThreadPoolExecutor de _enviar_lote_agrupado.
+
+SMTP no multiplexa: cada conexión lleva una conversación a la vez. El motor
+mantiene un conjunto acotado de conexiones al servidor (`max_conexiones`,
+límite por host SMTP) que consumen una cola de mensajes. El productor se
+bloquea cuando hay `max_pendientes` mensajes esperando (backpressure), así
+que los mensajes pueden generarse de forma perezosa sin acumularse en memoria.
+
+aiosmtplib es opcional: si no está instalado, `disponible()` retorna False y
+la aplicación sigue usando el envío con hilos.
+"""
+
+import asyncio
+import time
+
+from smtp_pool import SEGUNDOS_SMTP
+
+try:
+    import aiosmtplib
+except ImportError:  # pragma: no cover - depende del entorno
+    aiosmtplib = None
+
+
+# Excepciones de aiosmtplib equivalentes a las de smtplib (vacías si no está instalado)
+if aiosmtplib is not None:
+    ERRORES_AUTENTICACION = (aiosmtplib.SMTPAuthenticationError,)
+    ERRORES_SMTP = (aiosmtplib.SMTPException,)
+else:  # pragma: no cover - depende del entorno
+    ERRORES_AUTENTICACION = ()
+    ERRORES_SMTP = ()
+
+
+_FIN = object()
+
+
+def disponible():
+    """True si aiosmtplib está instalado."""
+    return aiosmtplib is not None
+
+
+def es_error_reconectable(error):
+    """True si el error indica una sesión caída (conviene reconectar y reintentar)."""
+    if isinstance(error, (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) == 421
+
+
+async def _conectar(config):
+    inicio = time.perf_counter()
+    smtp = aiosmtplib.SMTP(
+        hostname=config["host"],
+        port=config["port"],
+        start_tls=config["usar_tls"],
+        timeout=config["timeout"]
+    )
+    await smtp.connect()
+    try:
+        if config["usuario"] and config["password"]:
+            await smtp.login(config["usuario"], config["password"])
+    except Exception:
+        await _cerrar(smtp)
+        raise
+    SEGUNDOS_SMTP.observar(time.perf_counter() - inicio, fase="conexion", motor="async")
+    return smtp
+
+
+async def _cerrar(smtp):
+    if smtp is None:
+        return
+    try:
+        await smtp.quit()
+    except Exception:
+        smtp.close()
+
+
+async def _trabajador(cola, config, al_terminar):
+    """Una conexión SMTP que atiende mensajes de la cola hasta recibir None."""
+    smtp = None
+    enviados = 0
+
+    while True:
+        item = await cola.get()
+        if item is None:
+            cola.task_done()
+            break
+
+        clave, remitente, destinatarios, mensaje = item
+        error = None
+
+        for intento in (1, 2):
+            try:
+                if smtp is None:
+                    smtp = await _conectar(config)
+                    enviados = 0
+                if config["reservar"]:
+                    espera = config["reservar"]()
+                    if espera > 0:
+                        await asyncio.sleep(espera)
+                inicio = time.perf_counter()
+                await smtp.sendmail(remitente, destinatarios, mensaje)
+                SEGUNDOS_SMTP.observar(time.perf_counter() - inicio, fase="envio", motor="async")
+                enviados += 1
+                error = None
+                break
+            except Exception as e:
+                error = e
+                reconectable = es_error_reconectable(e)
+                if reconectable or not isinstance(e, aiosmtplib.SMTPResponseException):
+                    await _cerrar(smtp)
+                    smtp = None
+                if not (intento == 1 and reconectable):
+                    break
+
+        if smtp is not None and enviados >= config["max_mensajes"]:
+            await _cerrar(smtp)
+            smtp = None
+
+        al_terminar(clave, error)
+        cola.task_done()
+
+    await _cerrar(smtp)
+
+
+async def enviar_mensajes(mensajes, host, port, usuario=None, password=None, usar_tls=True,
+                          max_conexiones=20, max_pendientes=200, max_mensajes=100, timeout=30,
+                          reservar=None, al_terminar=None):
+    """
+    Envía `mensajes`, un iterable de (clave, remitente, destinatarios, mensaje_str).
+
+    `reservar()` (opcional) retorna los segundos a esperar antes de cada envío
+    (ritmo por segundo de la cuenta). `al_terminar(clave, error)` se llama al
+    terminar cada mensaje (error None si se envió). Retorna la lista
+    [(clave, error)] en orden de finalización.
+    """
+    config = {
+        "host": host,
+        "port": port,
+        "usuario": usuario,
+        "password": password,
+        "usar_tls": usar_tls,
+        "max_mensajes": max(1, int(max_mensajes)),
+        "timeout": timeout,
+        "reservar": reservar
+    }
+
+    resultados = []
+
+    def _registrar(clave, error):
+        resultados.append((clave, error))
+        if al_terminar:
+            al_terminar(clave, error)
+
+    cola = asyncio.Queue(maxsize=max(1, int(max_pendientes)))
+    trabajadores = [
+        asyncio.create_task(_trabajador(cola, config, _registrar))
+        for _ in range(max(1, int(max_conexiones)))
+    ]
+
+    # El iterable se consume en un hilo: generar un mensaje (o esperar una
+    # pausa del trabajo) no bloquea las conexiones que ya están enviando.
+    iterador = iter(mensajes)
+    while True:
+        item = await asyncio.to_thread(next, iterador, _FIN)
+        if item is _FIN:
+            break
+        await cola.put(item)
+    for _ in trabajadores:
+        await cola.put(None)
+
+    await asyncio.gather(*trabajadores)
+    return resultados
+
+
+def enviar_mensajes_sync(mensajes, **kwargs):
+    """Versión bloqueante de enviar_mensajes (crea su propio event loop)."""
+    return asyncio.run(enviar_mensajes(mensajes, **kwargs))
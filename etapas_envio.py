@@ -0,0 +1,164 @@
+"""
+Envío por etapas: preparación en procesos, E/S de red en hilos.
+
+Generar el HTML y serializar el mensaje MIME es trabajo de CPU; hecho dentro
+de los hilos de envío compite por el GIL con la E/S de red. Aquí se separan
+las dos etapas:
+
+- PreparadorProcesos reparte los elementos en lotes a un pool de procesos y
+  entrega los resultados en orden. Como mucho `max_lotes` lotes están en
+  preparación o esperando a ser consumidos, así que la preparación nunca se
+  adelanta más que eso al envío.
+- consumir_en_hilos() pasa los mensajes ya listos a `hilos` hilos de envío
+  a través de una cola acotada (`max_pendientes`).
+
+Con lotes chicos o `procesos=0` la preparación corre en el mismo proceso
+(mismo orden y resultados, sin el costo de arrancar el pool). Lo que la
+preparación mide en el pool (metricas.py) se suma a las métricas del
+proceso principal con cada lote.
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metricas
+import registro
+
+log = registro.obtener(__name__)
+
+
+_FIN = object()
+
+
+def _preparar_lote(funcion_lote, lote):
+    """Corre en el pool: el lote preparado y las métricas que se tomaron al prepararlo."""
+    return funcion_lote(lote), metricas.vaciar()
+
+
+class PreparadorProcesos:
+    """Pool de procesos perezoso que prepara elementos por lotes."""
+
+    def __init__(self, procesos, tamano_lote=25, max_lotes=4):
+        self.procesos = max(0, int(procesos))
+        self.tamano_lote = max(1, int(tamano_lote))
+        self.max_lotes = max(1, int(max_lotes))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.procesos)
+            return self._executor
+
+    def _descartar_pool(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _lotes(self, elementos):
+        for inicio in range(0, len(elementos), self.tamano_lote):
+            yield elementos[inicio:inicio + self.tamano_lote]
+
+    def preparar(self, funcion_lote, elementos):
+        """
+        Genera `funcion_lote(lote)` para cada lote de `elementos`, aplanado y
+        en orden (un resultado por elemento).
+
+        `funcion_lote` debe poder serializarse con pickle (función de nivel
+        de módulo). Si el pool se rompe (un proceso murió), el lote se
+        prepara en este proceso y el pool se vuelve a crear en el próximo uso.
+        """
+        if self.procesos == 0 or len(elementos) <= self.tamano_lote:
+            for lote in self._lotes(elementos):
+                yield from funcion_lote(lote)
+            return
+
+        executor = self._pool()
+        lotes = self._lotes(elementos)
+        en_vuelo = deque()
+
+        def enviar_siguiente():
+            lote = next(lotes, None)
+            if lote is not None:
+                en_vuelo.append((lote, executor.submit(_preparar_lote, funcion_lote, lote)))
+
+        try:
+            for _ in range(self.max_lotes):
+                enviar_siguiente()
+
+            while en_vuelo:
+                lote, futuro = en_vuelo.popleft()
+                try:
+                    preparados, medidas = futuro.result()
+                    metricas.sumar(medidas)
+                except BrokenProcessPool:
+                    log.warning("El pool de preparación se rompió; el lote se prepara en este proceso")
+                    self._descartar_pool(executor)
+                    preparados = funcion_lote(lote)
+                    # El resto de los lotes en vuelo se perdió con el pool
+                    pendientes = [lote for lote, _ in en_vuelo] + list(lotes)
+                    en_vuelo.clear()
+                    yield from preparados
+                    for lote in pendientes:
+                        yield from funcion_lote(lote)
+                    return
+
+                enviar_siguiente()
+                yield from preparados
+        finally:
+            # Generador abandonado (p. ej. trabajo cancelado): no seguir preparando
+            for _, futuro in en_vuelo:
+                futuro.cancel()
+
+    def cerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def consumir_en_hilos(elementos, funcion, hilos, max_pendientes):
+    """
+    Llama `funcion(elemento)` en `hilos` hilos para cada elemento del iterable.
+
+    El iterable se consume en el hilo que llama y se bloquea cuando hay
+    `max_pendientes` elementos esperando un hilo libre. Retorna cuando todos
+    terminaron. Las excepciones de `funcion` se propagan al final (la
+    primera), después de procesar el resto.
+    """
+    cola = queue.Queue(maxsize=max(1, int(max_pendientes)))
+    errores = []
+
+    def trabajador():
+        while True:
+            elemento = cola.get()
+            if elemento is _FIN:
+                return
+            try:
+                funcion(elemento)
+            except Exception as e:
+                errores.append(e)
+
+    trabajadores = [
+        threading.Thread(target=trabajador, name=f"envio-{i}", daemon=True)
+        for i in range(max(1, int(hilos)))
+    ]
+    for hilo in trabajadores:
+        hilo.start()
+
+    try:
+        for elemento in elementos:
+            cola.put(elemento)
+    finally:
+        for _ in trabajadores:
+            cola.put(_FIN)
+        for hilo in trabajadores:
+            hilo.join()
+
+    if errores:
+        raise errores[0]
@@ -0,0 +1,175 @@
+"""
+Representación compacta de las facturas (recordatorios) de una corrida.
+
+Cada factura es un Factura con __slots__ en lugar de un dict de 14 claves:
+los textos que se repiten (cliente, vendedor, correos, local) son la misma
+instancia en todas las facturas, las fechas son objetos date compartidos
+entre las facturas de la misma fecha y el estado es un código entero
+(posición en ESTADOS).
+
+Lo que es solo de presentación (saldo "$1,234", fechas "dd/mm/yyyy",
+estado en texto, clase del badge) se calcula al leer el campo, es decir al
+renderizar el correo o al serializar la respuesta. Una Factura se lee
+como el dict de antes (factura["saldo"], factura.get("estado")) y
+como_dict() da ese dict completo.
+"""
+
+import sys
+from datetime import date
+from functools import lru_cache
+
+import pandas as pd
+
+
+ESTADOS = ("vencido", "proximo", "no_vencido")
+VENCIDO, PROXIMO, NO_VENCIDO = range(len(ESTADOS))
+
+BADGE_POR_ESTADO = {
+    "vencido": "badge-danger",
+    "proximo": "badge-warning",
+    "no_vencido": "badge-success"
+}
+
+# Claves del recordatorio (el dict que se serializa), en orden
+CAMPOS = (
+    "cliente", "correo_cliente", "vendedor", "correo_vendedor", "local", "numero_factura",
+    "fecha_emision", "fecha_vencimiento", "dias", "saldo", "saldo_numerico", "estado",
+    "badge_class", "cupo"
+)
+_CAMPOS = frozenset(CAMPOS)
+
+
+def formatear_fecha(valor):
+    """dd/mm/yyyy; 'N/A' si está vacío; el texto original si no es una fecha."""
+    try:
+        return pd.to_datetime(valor).strftime("%d/%m/%Y") if pd.notna(valor) else "N/A"
+    except Exception:
+        return str(valor) if valor else "N/A"
+
+
+@lru_cache(maxsize=4096)
+def _texto_fecha(fecha):
+    return fecha.strftime("%d/%m/%Y")
+
+
+def texto_fecha(valor):
+    """formatear_fecha() de una fecha guardada en una Factura (cada date distinto se formatea una vez)."""
+    if type(valor) is date:
+        return _texto_fecha(valor)
+    if valor is None:
+        return "N/A"
+    return formatear_fecha(valor)
+
+
+def internar(valores):
+    """Los textos iguales de `valores` como una sola instancia (sys.intern)."""
+    return [sys.intern(valor) if type(valor) is str else valor for valor in valores]
+
+
+def fechas_compartidas(serie):
+    """
+    date de cada valor de una columna datetime64 (None si está vacío).
+    Cada fecha distinta es un solo objeto date, compartido.
+    """
+    codigos, unicas = pd.factorize(serie)
+    fechas = [fecha.date() for fecha in unicas] + [None]
+    return [fechas[codigo] for codigo in codigos.tolist()]
+
+
+class Factura:
+    """Una factura de la cartera con su cliente, vendedor y estado."""
+
+    __slots__ = (
+        "cliente", "correo_cliente", "vendedor", "correo_vendedor", "local", "numero_factura",
+        "emision", "vencimiento", "dias", "saldo_numerico", "codigo_estado", "cupo"
+    )
+
+    def __init__(self, cliente, correo_cliente, vendedor, correo_vendedor, local, numero_factura,
+                 emision, vencimiento, dias, saldo_numerico, codigo_estado, cupo):
+        self.cliente = cliente
+        self.correo_cliente = correo_cliente
+        self.vendedor = vendedor
+        self.correo_vendedor = correo_vendedor
+        self.local = local
+        self.numero_factura = numero_factura
+        # date compartido, None (vacío) o el valor original si no era una fecha
+        self.emision = emision
+        self.vencimiento = vencimiento
+        self.dias = dias
+        self.saldo_numerico = saldo_numerico
+        self.codigo_estado = codigo_estado
+        self.cupo = cupo
+
+    # Campos de presentación
+
+    @property
+    def fecha_emision(self):
+        return texto_fecha(self.emision)
+
+    @property
+    def fecha_vencimiento(self):
+        return texto_fecha(self.vencimiento)
+
+    @property
+    def saldo(self):
+        return f"${self.saldo_numerico:,.0f}"
+
+    @property
+    def estado(self):
+        return ESTADOS[self.codigo_estado]
+
+    @property
+    def badge_class(self):
+        return BADGE_POR_ESTADO[ESTADOS[self.codigo_estado]]
+
+    # Lectura como el dict del recordatorio
+
+    def __getitem__(self, campo):
+        if campo not in _CAMPOS:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def get(self, campo, defecto=None):
+        return getattr(self, campo) if campo in _CAMPOS else defecto
+
+    def como_dict(self):
+        """El recordatorio como dict (para JSON), con los campos de presentación (en el orden de CAMPOS)."""
+        estado = ESTADOS[self.codigo_estado]
+        return {
+            "cliente": self.cliente,
+            "correo_cliente": self.correo_cliente,
+            "vendedor": self.vendedor,
+            "correo_vendedor": self.correo_vendedor,
+            "local": self.local,
+            "numero_factura": self.numero_factura,
+            "fecha_emision": texto_fecha(self.emision),
+            "fecha_vencimiento": texto_fecha(self.vencimiento),
+            "dias": self.dias,
+            "saldo": f"${self.saldo_numerico:,.0f}",
+            "saldo_numerico": self.saldo_numerico,
+            "estado": estado,
+            "badge_class": BADGE_POR_ESTADO[estado],
+            "cupo": self.cupo
+        }
+
+    def __reduce__(self):
+        # Al pool de preparación viaja como tupla de valores, no como dict de slots
+        return Factura, tuple(getattr(self, campo) for campo in Factura.__slots__)
+
+    def __repr__(self):
+        return f"Factura({self.numero_factura!r}, {self.cliente!r}, {self.estado})"
+
+
+_CODIGOS_ESTADO = {estado: codigo for codigo, estado in enumerate(ESTADOS)}
+
+
+def codigo_estado(recordatorio):
+    """Posición del estado en ESTADOS de una Factura o un dict (None si no es un estado conocido)."""
+    if type(recordatorio) is Factura:
+        return recordatorio.codigo_estado
+    return _CODIGOS_ESTADO.get(recordatorio.get("estado"))
+
+
+def como_dicts(recordatorios):
+    """Recordatorios (Factura o dict) como dicts para serializar."""
+    return [r.como_dict() if isinstance(r, Factura) else r for r in recordatorios]
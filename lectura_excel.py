@@ -0,0 +1,254 @@
+"""
+Lectura de una hoja de Excel a DataFrame con motores intercambiables.
+
+pd.read_excel arma primero una lista con TODAS las celdas de la hoja (un
+objeto de Python por celda, de todas las columnas) y recién después el
+DataFrame; con la cartera completa eso es la mayor parte de la memoria de
+una petición. Aquí las filas se leen de a una y solo se guardan las
+columnas que `seleccionar` elige a partir del encabezado:
+
+- "calamine": python-calamine (opcional, pip install python-calamine),
+  lector nativo en Rust; el más rápido.
+- "openpyxl": openpyxl en modo solo lectura (siempre disponible).
+- "pandas": pd.read_excel tal cual (el comportamiento anterior). Es el
+  respaldo para lo que los otros no leen (.xls) y si fallan.
+
+"auto" usa calamine si está instalado y si no openpyxl. Las celdas se
+convierten igual que en pd.read_excel y el DataFrame sale del mismo
+TextParser de pandas, así que tipos, nombres de columna y valores vacíos
+son los mismos con cualquier motor.
+
+El contenido puede ser bytes o cualquier objeto con el protocolo de buffer
+(p. ej. el mmap de una subida, ver subidas.py): abrir() lo lee sin copiarlo.
+"""
+
+import io
+import zipfile
+from datetime import date, datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+import registro
+
+try:
+    import python_calamine
+except ImportError:  # pragma: no cover - depende del entorno
+    python_calamine = None
+
+try:
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+except ImportError:  # pragma: no cover - depende del entorno
+    load_workbook = None
+    ERROR_CODES = ()
+
+log = registro.obtener(__name__)
+
+
+MOTORES = ("calamine", "openpyxl", "pandas")
+
+
+def disponibles():
+    """Motores que se pueden usar en este entorno, del más rápido al más lento."""
+    return tuple(
+        motor for motor, modulo in zip(MOTORES, (python_calamine, load_workbook, pd))
+        if modulo is not None
+    )
+
+
+def motor_efectivo(motor="auto"):
+    """Motor que se usará para `motor` ("auto" = el más rápido disponible)."""
+    if motor in (None, "", "auto"):
+        return disponibles()[0]
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de lectura desconocido: {motor}. Opciones: auto, {', '.join(MOTORES)}")
+    if motor not in disponibles():
+        log.warning("Motor de lectura no instalado; se usa el automático", motor=motor)
+        return disponibles()[0]
+    return motor
+
+
+class _VistaBuffer(io.RawIOBase):
+    """Archivo de solo lectura sobre un buffer (bytes, mmap), con posición propia."""
+
+    def __init__(self, contenido):
+        self._vista = memoryview(contenido).cast("B")
+        self._posicion = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, destino):
+        fin = min(self._posicion + len(destino), len(self._vista))
+        leidos = max(0, fin - self._posicion)
+        destino[:leidos] = self._vista[self._posicion:fin]
+        self._posicion += leidos
+        return leidos
+
+    def seek(self, desplazamiento, desde=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._posicion, io.SEEK_END: len(self._vista)}[desde]
+        self._posicion = max(0, base + desplazamiento)
+        return self._posicion
+
+    def tell(self):
+        return self._posicion
+
+    def close(self):
+        # Sin vistas abiertas, el mmap de la subida se puede cerrar
+        if not self.closed:
+            self._vista.release()
+        super().close()
+
+
+def abrir(contenido):
+    """Archivo binario de solo lectura sobre `contenido` (bytes o buffer), sin copiarlo."""
+    if isinstance(contenido, bytes):
+        return BytesIO(contenido)
+    return io.BufferedReader(_VistaBuffer(contenido))
+
+
+def _filas_calamine(archivo_bytes, hoja):
+    with abrir(archivo_bytes) as archivo:
+        libro = python_calamine.CalamineWorkbook.from_filelike(archivo)
+        nombre = libro.sheet_names[hoja] if isinstance(hoja, int) else hoja
+        yield from libro.get_sheet_by_name(nombre).iter_rows()
+
+
+def _filas_openpyxl(archivo_bytes, hoja):
+    with abrir(archivo_bytes) as archivo:
+        libro = load_workbook(archivo, read_only=True, data_only=True, keep_links=False)
+        try:
+            hoja = libro.worksheets[hoja] if isinstance(hoja, int) else libro[hoja]
+            # La dimensión guardada en el archivo puede estar mal (igual que en pandas)
+            hoja.reset_dimensions()
+            yield from hoja.iter_rows(values_only=True)
+        finally:
+            libro.close()
+
+
+_FILAS = {"calamine": _filas_calamine, "openpyxl": _filas_openpyxl}
+
+
+def _celda(valor):
+    """Valor de una celda convertido como lo hace pd.read_excel."""
+    if valor is None:
+        return ""
+    tipo = type(valor)
+    if tipo is float:
+        return int(valor) if valor.is_integer() else valor
+    if tipo is str:
+        return np.nan if valor in ERROR_CODES else valor
+    if tipo is date:
+        return datetime(valor.year, valor.month, valor.day)
+    return valor
+
+
+def _nombres_columnas(encabezado):
+    """Nombres de columna como los deja pd.read_excel (vacías "Unnamed: i", repetidas "X.1")."""
+    nombres = []
+    vistos = {}
+    for i, valor in enumerate(encabezado):
+        nombre = f"Unnamed: {i}" if valor == "" or valor is None else valor
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        nombres.append(nombre)
+    return nombres
+
+
+def _leer_por_filas(filas, fila_encabezado, seleccionar):
+    """DataFrame con las columnas elegidas por `seleccionar` a partir de las filas crudas."""
+    for _ in range(fila_encabezado):
+        if next(filas, None) is None:
+            return pd.DataFrame()
+
+    encabezado = next(filas, None)
+    if encabezado is None:
+        return pd.DataFrame()
+    encabezado = [_celda(valor) for valor in encabezado]
+    while encabezado and encabezado[-1] == "":
+        encabezado.pop()
+
+    if seleccionar is None:
+        return _leer_todo(filas, encabezado)
+
+    nombres = _nombres_columnas(encabezado)
+    elegidas = set(seleccionar(nombres))
+    posiciones = [i for i, nombre in enumerate(nombres) if nombre in elegidas]
+
+    datos = [[nombres[i] for i in posiciones]]
+    ultima_con_datos = 0
+    vacia = [""] * len(posiciones)
+    for fila in filas:
+        largo = len(fila)
+        valores = [_celda(fila[i]) if i < largo else "" for i in posiciones]
+        if valores != vacia:
+            ultima_con_datos = len(datos)
+        datos.append(valores)
+
+    # Sin las filas vacías del final (como pd.read_excel)
+    del datos[ultima_con_datos + 1:]
+    return _parsear(datos)
+
+
+def _leer_todo(filas, encabezado):
+    """Todas las columnas, incluidas las que tienen datos más allá del encabezado."""
+    datos = [encabezado]
+    ultima_con_datos = 0
+    ancho = len(encabezado)
+    for fila in filas:
+        valores = [_celda(valor) for valor in fila]
+        while valores and valores[-1] == "":
+            valores.pop()
+        if valores:
+            ultima_con_datos = len(datos)
+            ancho = max(ancho, len(valores))
+        datos.append(valores)
+
+    del datos[ultima_con_datos + 1:]
+    datos = [valores + [""] * (ancho - len(valores)) for valores in datos]
+    datos[0] = _nombres_columnas(datos[0])
+    return _parsear(datos)
+
+
+def _parsear(datos):
+    """DataFrame de las filas ya convertidas (la primera es el encabezado), con el parser de pd.read_excel."""
+    try:
+        return TextParser(datos, header=0, skip_blank_lines=False).read()
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+
+
+def leer_hoja(archivo_bytes, hoja=0, fila_encabezado=0, seleccionar=None, motor="auto"):
+    """
+    Lee la hoja `hoja` (nombre o posición) con el encabezado en la fila
+    `fila_encabezado` (desde 0).
+
+    `seleccionar(nombres)` recibe los nombres de todas las columnas y
+    retorna los de las que se conservan (None = todas). Los archivos que no
+    son .xlsx (p. ej. .xls) y los errores del motor elegido se leen con
+    pd.read_excel.
+    """
+    motor = motor_efectivo(motor)
+    with abrir(archivo_bytes) as archivo:
+        es_zip = zipfile.is_zipfile(archivo)
+    if motor != "pandas" and es_zip:
+        try:
+            return _leer_por_filas(_FILAS[motor](archivo_bytes, hoja), fila_encabezado, seleccionar)
+        except Exception:
+            log.warning("El motor de lectura falló; se lee con pandas", motor=motor, exc_info=True)
+
+    with abrir(archivo_bytes) as archivo:
+        df = pd.read_excel(archivo, sheet_name=hoja, header=fila_encabezado)
+    if seleccionar is not None:
+        elegidas = set(seleccionar(list(df.columns)))
+        df = df[[columna for columna in df.columns if columna in elegidas]]
+    return df
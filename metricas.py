@@ -0,0 +1,229 @@
+"""
+Métricas del procesamiento y del envío en formato de texto de Prometheus.
+
+Cada módulo declara sus métricas al importarse y las actualiza:
+
+    SEGUNDOS = metricas.histograma("cartera_etapa_segundos", "Duración por etapa", ("etapa",))
+
+    with SEGUNDOS.cronometrar(etapa="leer_excel_cartera"):
+        ...
+
+    @SEGUNDOS.cronometrar(etapa="generar_html")
+    def generar_html(...):
+        ...
+
+exponer() arma el texto para /metrics. Declarar dos veces el mismo nombre
+retorna la misma métrica.
+
+Con fork los procesos de preparación (etapas_envio.py) empiezan con las
+métricas en cero y un lock nuevo; lo que miden vuelve al proceso principal
+con vaciar() + sumar().
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+
+
+# Límites de las cubetas de duración (segundos)
+LIMITES_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_metricas = {}
+
+
+def _clave(nombres, etiquetas):
+    if set(etiquetas) != set(nombres):
+        raise ValueError(f"Se esperaban las etiquetas {nombres}, no {tuple(etiquetas)}")
+    return tuple(str(etiquetas[nombre]) for nombre in nombres)
+
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas_texto(nombres, valores, extra=None):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador que solo crece (p. ej. correos enviados)."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = _clave(self.etiquetas, etiquetas)
+        with _lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas):
+        with _lock:
+            return self._valores.get(_clave(self.etiquetas, etiquetas), 0)
+
+    def _muestras(self):
+        for clave, valor in sorted(self._valores.items()):
+            yield f"{self.nombre}{_etiquetas_texto(self.etiquetas, clave)} {_numero(valor)}"
+
+    def _vaciar(self):
+        valores, self._valores = self._valores, {}
+        return valores
+
+    def _sumar(self, valores):
+        for clave, valor in valores.items():
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+
+class _Cronometro(ContextDecorator):
+    """Mide la duración de un bloque (o de cada llamada a una función) en un histograma."""
+
+    def __init__(self, histograma, etiquetas):
+        self._histograma = histograma
+        self._etiquetas = etiquetas
+        self._inicios = threading.local()
+
+    def __enter__(self):
+        # Una pila por hilo: la misma función puede correr en varios hilos a la vez
+        pila = getattr(self._inicios, "pila", None)
+        if pila is None:
+            pila = self._inicios.pila = []
+        pila.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        inicio = self._inicios.pila.pop()
+        self._histograma.observar(time.perf_counter() - inicio, **self._etiquetas)
+        return False
+
+
+class Histograma:
+    """Distribución de valores (duraciones) en cubetas acumuladas, con suma y cantidad."""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.limites = tuple(sorted(limites))
+        # clave -> [conteo por cubeta (la última es +Inf), suma]
+        self._series = {}
+
+    def observar(self, valor, **etiquetas):
+        clave = _clave(self.etiquetas, etiquetas)
+        cubeta = bisect.bisect_left(self.limites, valor)
+        with _lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][cubeta] += 1
+            serie[1] += valor
+
+    def cronometrar(self, **etiquetas):
+        """Context manager (o decorador) que observa la duración en segundos."""
+        _clave(self.etiquetas, etiquetas)
+        return _Cronometro(self, etiquetas)
+
+    def resumen(self, **etiquetas):
+        """(cantidad, suma) de la serie con `etiquetas`."""
+        with _lock:
+            serie = self._series.get(_clave(self.etiquetas, etiquetas))
+            return (sum(serie[0]), serie[1]) if serie else (0, 0.0)
+
+    def _muestras(self):
+        for clave, (conteos, suma) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.limites + (float("inf"),), conteos):
+                acumulado += conteo
+                etiquetas = _etiquetas_texto(self.etiquetas, clave, f'le="{_numero(limite)}"')
+                yield f"{self.nombre}_bucket{etiquetas} {acumulado}"
+            etiquetas = _etiquetas_texto(self.etiquetas, clave)
+            yield f"{self.nombre}_sum{etiquetas} {_numero(suma)}"
+            yield f"{self.nombre}_count{etiquetas} {acumulado}"
+
+    def _vaciar(self):
+        series, self._series = self._series, {}
+        return series
+
+    def _sumar(self, series):
+        for clave, (conteos, suma) in series.items():
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0] = [a + b for a, b in zip(serie[0], conteos)]
+            serie[1] += suma
+
+
+def _registrar(clase, nombre, *args, **kwargs):
+    with _lock:
+        metrica = _metricas.get(nombre)
+        if metrica is None:
+            metrica = _metricas[nombre] = clase(nombre, *args, **kwargs)
+        elif not isinstance(metrica, clase):
+            raise ValueError(f"La métrica {nombre} ya existe con otro tipo")
+        return metrica
+
+
+def contador(nombre, ayuda, etiquetas=()):
+    """Contador `nombre` (se crea la primera vez)."""
+    return _registrar(Contador, nombre, ayuda, etiquetas)
+
+
+def histograma(nombre, ayuda, etiquetas=(), limites=LIMITES_SEGUNDOS):
+    """Histograma `nombre` (se crea la primera vez)."""
+    return _registrar(Histograma, nombre, ayuda, etiquetas, limites)
+
+
+def exponer():
+    """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+    lineas = []
+    with _lock:
+        for nombre, metrica in sorted(_metricas.items()):
+            lineas.append(f"# HELP {nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {nombre} {metrica.tipo}")
+            lineas.extend(metrica._muestras())
+    return "\n".join(lineas) + "\n"
+
+
+def vaciar():
+    """Retorna lo medido hasta ahora y deja las métricas en cero (para sumar() en otro proceso)."""
+    with _lock:
+        return {nombre: metrica._vaciar() for nombre, metrica in _metricas.items()}
+
+
+def sumar(medidas):
+    """Suma lo que retornó vaciar() (en otro proceso) a las métricas de este."""
+    with _lock:
+        for nombre, valores in medidas.items():
+            metrica = _metricas.get(nombre)
+            if metrica is not None:
+                metrica._sumar(valores)
+
+
+def _reiniciar_en_hijo():
+    # El lock pudo quedar tomado por otro hilo en el momento del fork, y los
+    # valores heredados ya están contados en el proceso principal
+    global _lock
+    _lock = threading.Lock()
+    for metrica in _metricas.values():
+        metrica._vaciar()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_en_hijo)
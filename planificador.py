@@ -0,0 +1,256 @@
+"""
+Planificador de envíos con cuotas por cuenta remitente.
+
+- LimitadorTokens: cubo de tokens para el ritmo por segundo.
+- CuotaCuenta: ritmo por segundo + tope diario de una cuenta de correo.
+- PlanificadorEnvios: admite lo que cabe en la cuota del día (por prioridad)
+  y deja el resto en cola para la siguiente ventana, en lugar de dejar que
+  el proveedor rechace los correos al pasar el límite diario. La cola vive
+  en memoria; con `diferir` cada cliente en cola se guarda afuera (la
+  bitácora) y restaurar() la reconstruye al reiniciar.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import registro
+
+log = registro.obtener(__name__)
+
+
+class LimitadorTokens:
+    """Cubo de tokens: `tasa` tokens por segundo con ráfagas de hasta `capacidad`."""
+
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad if capacidad else max(1.0, self.tasa))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        """
+        Reserva un token y retorna cuántos segundos hay que esperar antes de usarlo.
+
+        Con tasa <= 0 no hay límite (siempre 0).
+        """
+        if self.tasa <= 0:
+            return 0.0
+
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.tasa
+
+    def esperar(self):
+        """Versión bloqueante de reservar()."""
+        espera = self.reservar()
+        if espera > 0:
+            time.sleep(espera)
+
+
+class CuotaCuenta:
+    """Ritmo por segundo y tope diario de una cuenta remitente (0 = sin límite)."""
+
+    def __init__(self, cuenta, por_segundo=0, por_dia=0):
+        self.cuenta = cuenta
+        self.por_segundo = float(por_segundo)
+        self.por_dia = int(por_dia)
+        self.limitador = LimitadorTokens(self.por_segundo)
+        self._dia = date.today()
+        self._usados_hoy = 0
+        self._lock = threading.Lock()
+
+    def _renovar(self):
+        hoy = date.today()
+        if hoy != self._dia:
+            self._dia = hoy
+            self._usados_hoy = 0
+
+    def disponibles_hoy(self):
+        """Correos que aún caben en la cuota de hoy (None si no hay tope diario)."""
+        if self.por_dia <= 0:
+            return None
+        with self._lock:
+            self._renovar()
+            return max(0, self.por_dia - self._usados_hoy)
+
+    def consumir(self, cantidad):
+        with self._lock:
+            self._renovar()
+            self._usados_hoy += cantidad
+
+    def usados_hoy(self):
+        with self._lock:
+            self._renovar()
+            return self._usados_hoy
+
+    @staticmethod
+    def inicio_siguiente_ventana():
+        """Medianoche siguiente (la cuota diaria se renueva por día calendario)."""
+        return datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+
+    def segundos_para(self, cantidad):
+        """Tiempo que toma enviar `cantidad` correos al ritmo por segundo."""
+        if self.por_segundo <= 0:
+            return 0.0
+        return cantidad / self.por_segundo
+
+
+def prioridad_cliente(cliente_agrupado):
+    """Clientes con facturas vencidas primero; entre ellos, los de más vencidas."""
+    total_vencidas = cliente_agrupado.get("total_vencidas", 0)
+    return (0 if total_vencidas > 0 else 1, -total_vencidas)
+
+
+class PlanificadorEnvios:
+    """
+    Cola por prioridad con cuota por cuenta.
+
+    `despachar(cuenta, clientes, referencias)` envía clientes que estaban en
+    cola: se llama en un hilo aparte cuando se abre la siguiente ventana, y
+    también al planificar o restaurar si lo que ya estaba en cola cabe hoy.
+    `diferir(cuenta, clientes)` se llama con los clientes que quedan en cola
+    y retorna una referencia por cliente (p. ej. su fila en la bitácora),
+    que vuelve en `referencias` al despacharlos. Sin `diferir` las
+    referencias son None.
+    """
+
+    def __init__(self, despachar=None, diferir=None):
+        self.despachar = despachar
+        self.diferir = diferir
+        self._cuotas = {}
+        self._colas = {}
+        self._timers = {}
+        self._secuencia = itertools.count()
+        self._lock = threading.Lock()
+
+    def registrar_cuenta(self, cuota):
+        with self._lock:
+            self._cuotas[cuota.cuenta] = cuota
+            self._colas.setdefault(cuota.cuenta, [])
+        return cuota
+
+    def cuota(self, cuenta):
+        return self._cuotas[cuenta]
+
+    def planificar(self, clientes, cuenta):
+        """
+        Ordena por prioridad y admite lo que cabe hoy en la cuota de `cuenta`.
+
+        Retorna (admitidos, diferidos): los admitidos ya consumieron cuota y
+        deben enviarse ahora; los diferidos quedan en cola para la siguiente
+        ventana. Si entran clientes que ya estaban en cola (con más
+        prioridad), esos salen por `despachar` y no en `admitidos`.
+        """
+        with self._lock:
+            cola = self._colas[cuenta]
+            nuevas = [[prioridad_cliente(cliente), next(self._secuencia), cliente, None] for cliente in clientes]
+            for entrada in nuevas:
+                heapq.heappush(cola, entrada)
+            entradas = self._admitir(cuenta)
+            diferidos = len(cola)
+
+            salen = {id(entrada) for entrada in entradas}
+            en_cola = [entrada for entrada in nuevas if id(entrada) not in salen]
+            if en_cola and self.diferir:
+                referencias = self.diferir(cuenta, [entrada[2] for entrada in en_cola])
+                for entrada, referencia in zip(en_cola, referencias):
+                    entrada[3] = referencia
+
+        admitidos = [cliente for _, _, cliente, referencia in entradas if referencia is None]
+        self._despachar([entrada for entrada in entradas if entrada[3] is not None], cuenta)
+        if diferidos:
+            self._programar(cuenta)
+        return admitidos, diferidos
+
+    def restaurar(self, cuenta, clientes, referencias):
+        """
+        Vuelve a poner en cola clientes diferidos guardados por `diferir`
+        (al reiniciar) y despacha de inmediato lo que ya cabe hoy.
+        """
+        with self._lock:
+            cola = self._colas[cuenta]
+            for cliente, referencia in zip(clientes, referencias):
+                heapq.heappush(cola, [prioridad_cliente(cliente), next(self._secuencia), cliente, referencia])
+        log.info("Cola de envíos restaurada", cuenta=cuenta, correos=len(clientes))
+        self._procesar_diferidos(cuenta)
+
+    def _admitir(self, cuenta):
+        """Saca de la cola las entradas que caben hoy (requiere self._lock)."""
+        cuota = self._cuotas[cuenta]
+        cola = self._colas[cuenta]
+        disponibles = cuota.disponibles_hoy()
+        cantidad = len(cola) if disponibles is None else min(disponibles, len(cola))
+
+        admitidas = [heapq.heappop(cola) for _ in range(cantidad)]
+        cuota.consumir(len(admitidas))
+        return admitidas
+
+    def _despachar(self, entradas, cuenta):
+        if entradas and self.despachar:
+            self.despachar(cuenta, [entrada[2] for entrada in entradas], [entrada[3] for entrada in entradas])
+
+    def _programar(self, cuenta):
+        """Agenda el despacho de la cola para cuando abra la siguiente ventana."""
+        with self._lock:
+            if cuenta in self._timers:
+                return
+            espera = (self._cuotas[cuenta].inicio_siguiente_ventana() - datetime.now()).total_seconds()
+            timer = threading.Timer(max(1.0, espera), self._procesar_diferidos, args=(cuenta,))
+            timer.daemon = True
+            self._timers[cuenta] = timer
+        timer.start()
+        log.info("Envío en cola diferido", cuenta=cuenta, horas=round(espera / 3600, 1))
+
+    def _procesar_diferidos(self, cuenta):
+        with self._lock:
+            self._timers.pop(cuenta, None)
+            admitidas = self._admitir(cuenta)
+            quedan = len(self._colas[cuenta])
+
+        if admitidas:
+            log.info("Enviando correos en cola", cuenta=cuenta, correos=len(admitidas))
+            self._despachar(admitidas, cuenta)
+        if quedan:
+            self._programar(cuenta)
+
+    def estimacion(self, cuenta):
+        """Pendientes en cola y hora estimada en que se termina de enviar todo."""
+        with self._lock:
+            pendientes = len(self._colas[cuenta])
+        cuota = self._cuotas[cuenta]
+        disponibles = cuota.disponibles_hoy()
+
+        if pendientes == 0:
+            fin = datetime.now()
+        elif disponibles is None:
+            fin = datetime.now() + timedelta(seconds=cuota.segundos_para(pendientes))
+        else:
+            hoy = min(disponibles, pendientes)
+            restantes = pendientes - hoy
+            if restantes == 0:
+                fin = datetime.now() + timedelta(seconds=cuota.segundos_para(hoy))
+            else:
+                dias = math.ceil(restantes / cuota.por_dia)
+                ultimo_dia = restantes - (dias - 1) * cuota.por_dia
+                fin = (cuota.inicio_siguiente_ventana() + timedelta(days=dias - 1)
+                       + timedelta(seconds=cuota.segundos_para(ultimo_dia)))
+
+        return {
+            "cuenta": cuenta,
+            "pendientes": pendientes,
+            "usados_hoy": cuota.usados_hoy(),
+            "disponibles_hoy": disponibles,
+            "por_segundo": cuota.por_segundo,
+            "por_dia": cuota.por_dia,
+            "fin_estimado": fin.isoformat(timespec="seconds")
+        }
@@ -0,0 +1,167 @@
+"""
+Plantilla HTML del correo unificado por cliente.
+
+Cada plantilla se compila una sola vez al importar el módulo a una función
+equivalente al f-string original (las partes literales quedan como
+constantes y solo se evalúan los campos), y las filas de facturas se unen
+con una sola join en lugar de concatenarse una a una. La salida es idéntica
+byte a byte a la del f-string que reemplaza.
+"""
+
+import string
+
+
+class PlantillaCompilada:
+    """Plantilla con sintaxis de str.format (solo campos simples: {nombre})."""
+
+    __slots__ = ("render",)
+
+    def __init__(self, texto):
+        constantes = {}
+        codigo = []
+        for i, (literal, campo, especificacion, conversion) in enumerate(string.Formatter().parse(texto)):
+            if literal:
+                constantes[f"_l{i}"] = literal
+                codigo.append(f"{{_l{i}}}")
+            if campo is None:
+                continue
+            if especificacion or conversion or not campo.isidentifier():
+                raise ValueError(f"Campo no soportado en la plantilla: {campo!r}")
+            codigo.append(f"{{v[{campo!r}]}}")
+
+        # render(valores) -> str
+        self.render = eval(f'lambda v: f"{"".join(codigo)}"', constantes)
+
+    def render_varios(self, lista_valores):
+        """Renderiza la plantilla para cada elemento y une todo en una sola join."""
+        render = self.render
+        return "".join([render(valores) for valores in lista_valores])
+
+
+FILA_FACTURA = PlantillaCompilada("""
+            <tr style="border-bottom: 1px solid #e0e0e0;">
+                <td style="padding: 10px; font-weight: bold;">{numero_factura}</td>
+                <td style="padding: 10px; text-align: center;">{fecha_emision}</td>
+                <td style="padding: 10px; text-align: center;">{fecha_vencimiento}</td>
+                <td style="padding: 10px; text-align: center;">{dias} días</td>
+                <td style="padding: 10px; text-align: right; font-weight: bold;">{saldo}</td>
+            </tr>
+            """)
+
+TABLA_FACTURAS = PlantillaCompilada("""
+        <div style="margin: 30px 0;">
+            <h3 style="color: {color_bg}; border-bottom: 3px solid {color_bg}; padding-bottom: 10px; margin-bottom: 15px;">
+                {emoji} {titulo} ({cantidad})
+            </h3>
+            <table style="width: 100%; border-collapse: collapse; margin: 15px 0;">
+                <thead>
+                    <tr style="background-color: {color_bg}; color: white;">
+                        <th style="padding: 12px; text-align: left;">Factura</th>
+                        <th style="padding: 12px; text-align: center;">Emisión</th>
+                        <th style="padding: 12px; text-align: center;">Vencimiento</th>
+                        <th style="padding: 12px; text-align: center;">Días</th>
+                        <th style="padding: 12px; text-align: right;">Saldo</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {filas}
+                    <tr style="background-color: #f8f9fa; font-weight: bold; border-top: 2px solid {color_bg};">
+                        <td colspan="4" style="text-align: right; padding: 12px;">SUBTOTAL:</td>
+                        <td style="text-align: right; padding: 12px;">{subtotal_formateado}</td>
+                    </tr>
+                </tbody>
+            </table>
+        </div>
+        """)
+
+DOCUMENTO = PlantillaCompilada("""
+    <!DOCTYPE html>
+    <html lang="es">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <style>
+            body {{font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 900px; margin: 0 auto; padding: 20px;}}
+            .container {{background-color: white; border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);}}
+            .logo {{text-align: center; padding: 25px;}}
+            .logo img {{max-width: 250px;}}
+            .header {{background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;}}
+            .header h1 {{margin: 0; font-size: 26px;}}
+            .content {{padding: 30px;}}
+            .resumen {{display: flex; justify-content: space-around; margin: 20px 0; background-color: #f8f9fa; padding: 20px; border-radius: 8px; flex-wrap: wrap;}}
+            .resumen-item {{text-align: center; margin: 10px;}}
+            .resumen-numero {{font-size: 32px; font-weight: bold; color: #667eea;}}
+            .info-vendedor {{background-color: #e3f2fd; padding: 15px; margin: 20px 0; border-left: 4px solid #2196F3; border-radius: 4px;}}
+            .footer {{background-color: #0f172a; color: #94a3b8; padding: 25px; text-align: center; border-radius: 0 0 10px 10px;}}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="logo">
+                <img src="{logo_url}" alt="Lomarosa">
+            </div>
+
+            <div class="header">
+                <h1>📧 Recordatorio de Estado de Facturas</h1>
+                <p>Cliente: <strong>{cliente}</strong></p>
+            </div>
+
+            <div class="content">
+                <p>Estimado Cliente <strong>{cliente}</strong>,</p>
+                <p>A continuación presentamos el estado completo de sus facturas pendientes:</p>
+
+                <div class="resumen">
+                    <div class="resumen-item">
+                        <div class="resumen-numero">{total_facturas}</div>
+                        <div>Total Facturas</div>
+                    </div>
+                    <div class="resumen-item">
+                        <div class="resumen-numero" style="color: #dc2626;">{total_vencidas}</div>
+                        <div>🔴 Vencidas</div>
+                    </div>
+                    <div class="resumen-item">
+                        <div class="resumen-numero" style="color: #f59e0b;">{total_proximas}</div>
+                        <div>🟡 Próximas</div>
+                    </div>
+                    <div class="resumen-item">
+                        <div class="resumen-numero" style="color: #10b981;">{total_no_vencidas}</div>
+                        <div>🟢 No Vencidas</div>
+                    </div>
+                    <div class="resumen-item">
+                        <div class="resumen-numero" style="color: #dc2626;">{total_saldo_formateado}</div>
+                        <div>💰 Total Cartera</div>
+                    </div>
+                    <div class="resumen-item">
+                        <div class="resumen-numero" style="color: {cupo_disponible_color};">{cupo_disponible_emoji} {cupo_disponible_formateado}</div>
+                        <div>Cupo Disponible</div>
+                    </div>
+                </div>
+
+                {seccion_vencidas}
+                {seccion_proximas}
+                {seccion_no_vencidas}
+
+                <div style="background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%); padding: 20px; margin: 30px 0; border-radius: 8px; border-top: 4px solid #667eea;">
+                    <h3 style="margin: 0 0 10px 0; text-align: center;">TOTAL GENERAL</h3>
+                    <p style="font-size: 32px; font-weight: bold; text-align: center; margin: 0; color: #667eea;">{total_saldo_formateado}</p>
+                    <p style="text-align: center; margin: 10px 0 0 0; font-size: 14px; color: #666;">Total de {total_facturas} facturas pendientes</p>
+                </div>
+
+                <div class="info-vendedor">
+                    <strong>👤 Vendedor asignado:</strong> {vendedor}<br>
+                    <strong>📧 Contacto:</strong> {contacto_vendedor}<br>
+                    <strong>📞 Para consultas:</strong> Comuníquese con su vendedor<br>
+                    <strong>⚠️ Dudas o solicitudes:</strong> Si cree que hay algo equivocado o quiere la cartera completa comuníquese con <a href="mailto:tesoreria@grupolom.com" style="color: #2196F3; text-decoration: none;">tesoreria@grupolom.com</a>
+                </div>
+            </div>
+
+            <div class="footer">
+                <p><strong>Lomarosa</strong><br>
+                <em>Campo bien hecho, cerdos bien criados</em></p>
+                <hr style="border: 1px solid #475569; margin: 15px 0;">
+                <p style="font-size: 11px;">Este es un mensaje automático. No responder directamente a este correo.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """)
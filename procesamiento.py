@@ -0,0 +1,1593 @@
+"""
+Procesamiento de los Excel y envío de los recordatorios, sin Flask.
+
+Aquí vive todo lo que no es HTTP: la configuración (.env), la lectura y el
+emparejamiento de los dos Excel, la agrupación por cliente, la preparación
+y el envío de los correos (pool SMTP, reintentos, cuota, bitácora) y los
+trabajos de envío. app.py (el servidor web) y procesar_lote.py (la línea
+de comandos) usan estas mismas funciones.
+
+Importar el módulo solo lee la configuración: el pool SMTP, el preparador
+de correos, la cola de reintentos, la bitácora y el planificador los crea
+inicializar() (app.py al arrancar, procesar_lote.py antes de enviar, o la
+primera función de envío que se llame).
+"""
+
+import os
+import hashlib
+import marshal
+import math
+import atexit
+import multiprocessing
+import time
+import smtplib
+import uuid
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from dotenv import load_dotenv
+from datetime import date
+from threading import RLock
+import numpy as np
+import pandas as pd
+
+from cache import CacheHuella, huella_contenido
+from smtp_pool import PoolSMTP
+import envio_async
+import plantilla_correo
+import lectura_excel
+import metricas
+import registro
+from etapas_envio import PreparadorProcesos, consumir_en_hilos
+from planificador import CuotaCuenta, PlanificadorEnvios
+from trabajos import RegistroTrabajos
+from agrupacion import AgrupacionClientes, cliente_plano
+from emparejamiento import VERSION_INDICE, IndiceClientes
+from facturas import NO_VENCIDO, PROXIMO, VENCIDO, Factura, fechas_compartidas, internar
+from bitacora import BitacoraEnvios, LoteBitacora
+from reintentos import ColaReintentos, PoliticaReintentos, ReintentosCorrida, es_error_transitorio
+
+
+# Cargar variables de entorno desde .env
+load_dotenv()
+
+
+# ==========================================
+# REGISTRO (LOGGING)
+# ==========================================
+# Eventos estructurados (líneas JSON, o texto con LOG_FORMATO=texto) que se
+# escriben desde un hilo aparte. En INFO van los contadores agregados; con
+# LOG_NIVEL=DEBUG también el detalle por fila, hasta LOG_MUESTRA filas por evento.
+# Lo configura quien arranca el proceso (app.py, procesar_lote.py) con
+# registro.configurar(); importar este módulo no lo toca.
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO")
+LOG_FORMATO = os.getenv("LOG_FORMATO", "json")
+LOG_MUESTRA = int(os.getenv("LOG_MUESTRA", "20"))
+
+log = registro.obtener(__name__)
+
+
+# ==========================================
+# CONFIGURACIÓN DE CORREO ELECTRÓNICO
+# ==========================================
+EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+EMAIL_USER = os.getenv("EMAIL_USER", "")  
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")  
+EMAIL_FROM_NAME = os.getenv("EMAIL_FROM_NAME", "Cartera Lomarosa")
+EMAIL_FROM_ADDRESS = os.getenv("EMAIL_FROM_ADDRESS", EMAIL_USER)
+
+
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "3"))
+
+# Pool de conexiones SMTP compartido por los hilos de envío (inicializar())
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() in ("1", "true", "si", "sí", "yes")
+SMTP_POOL_CONEXIONES = int(os.getenv("SMTP_POOL_CONEXIONES", str(MAX_WORKERS)))
+SMTP_MENSAJES_POR_CONEXION = int(os.getenv("SMTP_MENSAJES_POR_CONEXION", "100"))
+SMTP_MAX_INACTIVIDAD = int(os.getenv("SMTP_MAX_INACTIVIDAD", "60"))
+
+pool_smtp = None
+
+# Motor de envío asyncio (requiere aiosmtplib). ENVIO_ASYNC_CONEXIONES es el
+# máximo de conexiones simultáneas al servidor SMTP; ENVIO_ASYNC_PENDIENTES
+# cuántos mensajes ya generados pueden esperar turno (backpressure).
+ENVIO_ASYNC = os.getenv("ENVIO_ASYNC", "false").lower() in ("1", "true", "si", "sí", "yes")
+ENVIO_ASYNC_CONEXIONES = int(os.getenv("ENVIO_ASYNC_CONEXIONES", "20"))
+ENVIO_ASYNC_PENDIENTES = int(os.getenv("ENVIO_ASYNC_PENDIENTES", "200"))
+
+# Preparación de los correos (HTML + MIME) en procesos aparte, por lotes
+# (inicializar()). PREPARACION_PROCESOS=0 la hace en el mismo proceso que envía.
+PREPARACION_PROCESOS = int(os.getenv("PREPARACION_PROCESOS", str(min(4, (os.cpu_count() or 1) - 1))))
+PREPARACION_LOTE = int(os.getenv("PREPARACION_LOTE", "25"))
+PREPARACION_LOTES_PENDIENTES = int(os.getenv("PREPARACION_LOTES_PENDIENTES", "4"))
+
+preparador_correos = None
+
+# Cuota de la cuenta remitente (0 = sin límite). Lo que excede la cuota
+# diaria se envía automáticamente al día siguiente. El contador del día
+# arranca con lo que la bitácora ya tiene enviado hoy (ver cuota_envio).
+CUOTA_POR_SEGUNDO = float(os.getenv("CUOTA_POR_SEGUNDO", "0"))
+CUOTA_DIARIA = int(os.getenv("CUOTA_DIARIA", "450"))
+
+# Reintentos de errores transitorios (4xx, conexión caída, timeout) con
+# backoff exponencial. REINTENTOS_PRESUPUESTO es la fracción del lote que
+# se puede reintentar en total, para no martillar un servidor caído. Los
+# reintentos corren en los hilos de cola_reintentos (inicializar()).
+REINTENTOS_MAX = int(os.getenv("REINTENTOS_MAX", "3"))
+REINTENTOS_BASE = float(os.getenv("REINTENTOS_BASE", "2"))
+REINTENTOS_ESPERA_MAX = float(os.getenv("REINTENTOS_ESPERA_MAX", "60"))
+REINTENTOS_PRESUPUESTO = float(os.getenv("REINTENTOS_PRESUPUESTO", "0.2"))
+REINTENTOS_HILOS = int(os.getenv("REINTENTOS_HILOS", "2"))
+
+politica_reintentos = PoliticaReintentos(REINTENTOS_MAX, base=REINTENTOS_BASE, maximo=REINTENTOS_ESPERA_MAX)
+cola_reintentos = None
+
+# Bitácora de envíos (SQLite) para reanudar lotes interrumpidos. Vacío = desactivada.
+# La abre inicializar(); hasta entonces (o si está desactivada) es None.
+# Las rutas relativas se toman desde la carpeta del proyecto, no desde donde
+# se lanzó el proceso: el servidor y procesar_lote.py comparten la bitácora.
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+BITACORA_ENVIOS = os.getenv("BITACORA_ENVIOS", os.path.join(DIRECTORIO_PROYECTO, "bitacora_envios.db"))
+if BITACORA_ENVIOS:
+    BITACORA_ENVIOS = os.path.join(DIRECTORIO_PROYECTO, BITACORA_ENVIOS)
+
+bitacora = None
+
+
+# ==========================================
+# CACHÉ DEL LISTADO DE CLIENTES
+# ==========================================
+# El listado de clientes cambia poco; se guarda ya parseado por huella del
+# archivo. CACHE_CLIENTES_DIR vacío = solo memoria.
+CACHE_CLIENTES_MAX = int(os.getenv("CACHE_CLIENTES_MAX", "8"))
+CACHE_CLIENTES_DIR = os.getenv("CACHE_CLIENTES_DIR", "")
+
+cache_clientes = CacheHuella(max_entradas=CACHE_CLIENTES_MAX, directorio=CACHE_CLIENTES_DIR)
+
+# Emparejamiento de "Nombre tercero" sin match exacto (emparejamiento.py):
+# similitud mínima para aceptar el cliente más parecido y ventaja mínima
+# sobre el segundo. UMBRAL_COINCIDENCIA > 1 desactiva el paso aproximado.
+# Los matches aproximados solo se reportan, salvo con
+# ASIGNAR_COINCIDENCIAS_APROXIMADAS (un nombre parecido puede ser otra empresa).
+UMBRAL_COINCIDENCIA = float(os.getenv("UMBRAL_COINCIDENCIA", "0.85"))
+MARGEN_COINCIDENCIA = float(os.getenv("MARGEN_COINCIDENCIA", "0.05"))
+ASIGNAR_COINCIDENCIAS_APROXIMADAS = os.getenv(
+    "ASIGNAR_COINCIDENCIAS_APROXIMADAS", "false"
+).lower() in ("1", "true", "si", "sí", "yes")
+
+# HTML ya renderizado por huella del cliente (reintentos y reenvíos no lo regeneran)
+CACHE_CORREOS_MAX = int(os.getenv("CACHE_CORREOS_MAX", "256"))
+
+cache_correos = CacheHuella(max_entradas=CACHE_CORREOS_MAX)
+
+
+# ==========================================
+# MÉTRICAS
+# ==========================================
+# Duración de cada etapa y contadores de envío (por intento: los reintentos
+# cuentan aparte). El servidor web los expone en /metrics.
+SEGUNDOS_ETAPA = metricas.histograma(
+    "cartera_etapa_segundos",
+    "Duración de las etapas del procesamiento de los Excel y del envío",
+    ("etapa",)
+)
+CORREOS_ENVIADOS = metricas.contador("cartera_correos_enviados_total", "Correos aceptados por el servidor SMTP")
+CORREOS_FALLIDOS = metricas.contador(
+    "cartera_correos_fallidos_total",
+    "Intentos de envío fallidos (validacion, transitorio o permanente)",
+    ("tipo",)
+)
+BYTES_ENVIADOS = metricas.contador("cartera_bytes_enviados_total", "Bytes de los correos aceptados por el servidor SMTP")
+
+
+# ==========================================
+# FUNCIONES DE NORMALIZACIÓN
+# ==========================================
+
+
+def normalizar_nombre(nombre):
+    """Normaliza un nombre para hacer matching: trim + lowercase"""
+    if not nombre:
+        return ""
+    return str(nombre).strip().lower()
+
+
+def normalizar_serie(serie):
+    """Versión vectorial de normalizar_nombre para una columna completa."""
+    return serie.astype(str).str.strip().str.lower()
+
+
+def normalizar_columna(col):
+    """Normaliza nombre de columna para búsqueda flexible"""
+    return str(col).strip().lower().replace('  ', ' ')
+
+
+# ==========================================
+# FUNCIONES DE AGRUPACIÓN
+# ==========================================
+
+
+@SEGUNDOS_ETAPA.cronometrar(etapa="agrupar_recordatorios_por_cliente")
+def agrupar_recordatorios_por_cliente(recordatorios):
+    """
+    Agrupa recordatorios por cliente+email (sin separar por estado).
+
+    Retorna una estructura unificada con:
+    - facturas_vencidas[]
+    - facturas_proximas[]
+    - facturas_no_vencidas[]
+    - métricas agregadas
+
+    La agrupación la hace agrupacion.AgrupacionClientes (la misma que usan
+    las corridas y, a través de ellas, el navegador).
+    """
+    agrupacion = AgrupacionClientes(recordatorios)
+    resultado = agrupacion.clientes()
+    registrar_resumen_agrupacion(agrupacion)
+    return resultado
+
+
+def registrar_resumen_agrupacion(agrupacion):
+    # Cada cliente recibirá UN SOLO correo con todas sus facturas
+    log.info(
+        "Agrupación unificada por cliente + email",
+        facturas=len(agrupacion.recordatorios),
+        clientes=len(agrupacion),
+        vencidas=sum(agrupacion.resumen["total_vencidas"]),
+        proximas=sum(agrupacion.resumen["total_proximas"]),
+        no_vencidas=sum(agrupacion.resumen["total_no_vencidas"])
+    )
+
+
+# ==========================================
+# FUNCIONES DE LECTURA DE EXCEL
+# ==========================================
+
+
+HOJA_CARTERA = "Cartera por edades"
+FILA_ENCABEZADO_CARTERA = 11
+
+# Filas que se revisan por hoja para encontrar el encabezado real
+FILAS_SONDEO = int(os.getenv("FILAS_SONDEO", "30"))
+
+# Motor de lectura de los Excel (lectura_excel.py): auto, calamine, openpyxl o pandas
+LECTOR_EXCEL = lectura_excel.motor_efectivo(os.getenv("LECTOR_EXCEL", "auto"))
+
+# Columnas que se buscan en cada Excel (candidatos para buscar_columna_exacta).
+# Al leer el archivo solo se conservan estas.
+COLUMNAS_CLIENTES = {
+    "nit": ["Nit", "NIT"],
+    "cliente": ["Cliente", "cliente"],
+    "nombre_comercial": ["Nombre comercial", "Nombrecomercial"],
+    "correo_cliente": ["Correo cliente", "Correocliente", "Email cliente"],
+    "vendedor": ["Vendedor", "vendedor"],
+    "correo_vendedor": ["Correo vendedor", "Correovendedor", "Email vendedor"],
+    "canal": ["Canal", "canal"],
+    "cupo": ["Cupo", "cupo", "Cupo de crédito", "Cupo de credito", "Cupo credito"]
+}
+COLUMNAS_CARTERA = {
+    "nombre_tercero": ["Nombre tercero", "Nombretercero", "Cliente"],
+    "numero_fac": ["Numero FAC", "NumeroFAC", "Factura", "Numero Factura"],
+    "emision": ["Emision", "Emisión", "Fecha Emision", "FechaEmision"],
+    "vencimiento": ["Vencimiento", "Fecha Vencimiento", "FechaVencimiento"],
+    "saldo": ["Saldo", "saldo"],
+    "vendedor": ["Vendedor", "vendedor"],
+    "local": ["Local", "local", "Sucursal", "sucursal"]
+}
+COLUMNAS_POR_TIPO = {
+    "clientes": (COLUMNAS_CLIENTES, ("cliente", "correo_cliente")),
+    "cartera": (COLUMNAS_CARTERA, ("nombre_tercero", "numero_fac", "vencimiento", "saldo"))
+}
+
+
+def verificar_columnas(columnas):
+    """Revisa qué columnas clave están presentes (base de la detección de tipo)."""
+    columnas_str = " ".join(normalizar_columna(col) for col in columnas)
+    columnas_sin_espacios = columnas_str.replace(' ', '')
+
+    return {
+        # Excel 1 (Clientes)
+        "tiene_nit": "nit" in columnas_str,
+        "tiene_cliente": "cliente" in columnas_str,
+        "tiene_correo_cliente": "correo cliente" in columnas_str or "correocliente" in columnas_sin_espacios,
+        # Excel 2 (Cartera)
+        "tiene_nombre_tercero": "nombre tercero" in columnas_str or "nombretercero" in columnas_sin_espacios,
+        "tiene_numero_fac": "numero fac" in columnas_str or "numerofac" in columnas_sin_espacios or " fac " in columnas_str,
+        "tiene_vencimiento": "vencimiento" in columnas_str,
+        "tiene_dias": "dias" in columnas_str or "días" in columnas_str,
+        "tiene_saldo": "saldo" in columnas_str,
+    }
+
+
+def tipo_segun_verificacion(verificacion):
+    """Retorna 'clientes', 'cartera' o None a partir de verificar_columnas()."""
+    v = verificacion
+    if v["tiene_nit"] and v["tiene_cliente"] and v["tiene_correo_cliente"]:
+        return "clientes"
+    if v["tiene_nombre_tercero"] and v["tiene_numero_fac"] and v["tiene_vencimiento"] and v["tiene_dias"] and v["tiene_saldo"]:
+        return "cartera"
+    return None
+
+
+def sondear_excel(archivo_bytes, max_filas=FILAS_SONDEO):
+    """
+    Detecta tipo, hoja y fila de encabezado leyendo SOLO las primeras filas.
+
+    Revisa primero la hoja 'Cartera por edades' (si existe) y luego las demás,
+    buscando la primera fila cuyas celdas clasifiquen como clientes o cartera.
+    Así se rechazan archivos equivocados antes del parseo completo.
+
+    Retorna {"tipo", "hoja", "fila_encabezado"} (tipo None si no se detectó).
+    """
+    with lectura_excel.abrir(archivo_bytes) as archivo:
+        hojas = pd.read_excel(archivo, sheet_name=None, header=None, nrows=max_filas)
+    orden = sorted(hojas, key=lambda nombre: nombre != HOJA_CARTERA)
+
+    for nombre_hoja in orden:
+        for idx, fila in enumerate(hojas[nombre_hoja].itertuples(index=False)):
+            celdas = [celda for celda in fila if pd.notna(celda)]
+            if not celdas:
+                continue
+            tipo = tipo_segun_verificacion(verificar_columnas(celdas))
+            if tipo:
+                return {"tipo": tipo, "hoja": nombre_hoja, "fila_encabezado": idx}
+
+    return {"tipo": None, "hoja": None, "fila_encabezado": None}
+
+
+@SEGUNDOS_ETAPA.cronometrar(etapa="cargar_excel")
+def cargar_excel(archivo_bytes, sondeo=None):
+    """
+    Parsea un archivo Excel UNA sola vez usando la hoja y el encabezado del sondeo.
+
+    El DataFrame resultante se reutiliza en leer_excel_clientes /
+    leer_excel_cartera para no volver a parsear, y trae solo las columnas
+    que esas funciones usan. Si el sondeo no detectó el tipo, no se hace el
+    parseo completo.
+
+    Retorna (tipo, df).
+    """
+    if sondeo is None:
+        sondeo = sondear_excel(archivo_bytes)
+
+    if sondeo["tipo"] is None:
+        return None, None
+
+    df = lectura_excel.leer_hoja(
+        archivo_bytes, sondeo["hoja"], sondeo["fila_encabezado"],
+        seleccionar=columnas_a_leer(sondeo["tipo"]), motor=LECTOR_EXCEL
+    )
+    return sondeo["tipo"], df
+
+
+def columnas_a_leer(tipo):
+    """
+    `seleccionar` de lectura_excel para un Excel de `tipo`: las columnas que
+    se usan. Si falta una obligatoria se leen todas, para que el error
+    muestre las columnas del archivo.
+    """
+    especificacion, obligatorias = COLUMNAS_POR_TIPO[tipo]
+
+    def seleccionar(columnas):
+        encontradas = {clave: buscar_columna(columnas, nombres) for clave, nombres in especificacion.items()}
+        if any(encontradas[clave] is None for clave in obligatorias):
+            return columnas
+        return [columna for columna in encontradas.values() if columna is not None]
+
+    return seleccionar
+
+
+def detectar_tipo_excel(df):
+    """Detecta si el Excel es Excel 1 (Clientes) o Excel 2 (Cartera) según sus columnas."""
+    verificacion = verificar_columnas(df.columns)
+    tipo = tipo_segun_verificacion(verificacion)
+
+    log.debug(
+        "Tipo de Excel detectado" if tipo else "Tipo de Excel NO detectado",
+        tipo=tipo,
+        total_columnas=len(df.columns),
+        columnas=[normalizar_columna(col) for col in df.columns[:15]],
+        **verificacion
+    )
+    return tipo
+
+
+def buscar_columna_exacta(df, nombres_esperados):
+    """Busca una columna en el DataFrame con nombres esperados (flexible con espacios)."""
+    return buscar_columna(df.columns, nombres_esperados)
+
+
+def buscar_columna(columnas, nombres_esperados):
+    """buscar_columna_exacta sobre una lista de nombres de columna."""
+    columnas_map = {normalizar_columna(col): col for col in columnas}
+    
+    for nombre_esperado in nombres_esperados:
+        nombre_norm = normalizar_columna(nombre_esperado)
+        
+        if nombre_norm in columnas_map:
+            return columnas_map[nombre_norm]
+        
+        nombre_sin_espacios = nombre_norm.replace(' ', '')
+        for col_norm, col_original in columnas_map.items():
+            if nombre_sin_espacios == col_norm.replace(' ', ''):
+                return col_original
+        
+        for col_norm, col_original in columnas_map.items():
+            if nombre_norm in col_norm or nombre_sin_espacios in col_norm.replace(' ', ''):
+                return col_original
+    
+    return None
+
+
+def _mascara_con_valor(serie):
+    """True donde el valor no es nulo y es verdadero (equivale a `if valor:` por fila)."""
+    mascara = serie.notna()
+    if mascara.any():
+        mascara.loc[mascara] = serie[mascara].map(bool).astype(bool)
+    return mascara
+
+
+def _valor_a_float(valor):
+    """float(valor) o None si no es convertible."""
+    try:
+        return float(valor)
+    except (ValueError, TypeError):
+        return None
+
+
+def _serie_a_float(serie):
+    """
+    Convierte una columna de saldos a float (vacíos -> 0).
+
+    Retorna (saldos, invalidos): los valores no numéricos quedan en 0 y se
+    marcan en `invalidos`.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float).fillna(0), pd.Series(False, index=serie.index)
+
+    convertidos = [_valor_a_float(valor) for valor in serie.where(serie.notna(), 0).tolist()]
+    invalidos = pd.Series([valor is None for valor in convertidos], index=serie.index)
+    saldos = pd.Series([0.0 if valor is None else valor for valor in convertidos], index=serie.index, dtype=float)
+    return saldos, invalidos
+
+
+def _serie_a_fechas(serie):
+    """
+    Convierte una columna de vencimientos a fechas sin hora.
+
+    Las columnas que ya vienen como fecha se convierten en bloque; las
+    columnas mixtas (texto, números) usan pd.to_datetime valor a valor,
+    igual que el parseo original, y reportan los valores no convertibles.
+
+    Retorna (fechas, errores) con errores = {índice: excepción}.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if serie.dt.tz is not None:
+            serie = serie.dt.tz_localize(None)
+        return serie.dt.normalize(), {}
+
+    errores = {}
+    fechas = []
+    for idx, valor in serie.items():
+        try:
+            fechas.append(pd.Timestamp(pd.to_datetime(valor).date()))
+        except Exception as e:
+            errores[idx] = e
+            fechas.append(pd.NaT)
+
+    return pd.Series(fechas, index=serie.index, dtype="datetime64[ns]"), errores
+
+
+def _indice_ultimo_por_clave(tabla):
+    """
+    Índice {clave: fila} donde gana la ÚLTIMA fila de cada clave.
+
+    Conserva el orden de la primera aparición, igual que sobrescribir un
+    dict fila por fila.
+    """
+    orden = tabla["clave"].drop_duplicates(keep="first")
+    ultimas = tabla.drop_duplicates("clave", keep="last").set_index("clave").reindex(orden)
+
+    columnas = list(ultimas.columns)
+    filas = zip(*(ultimas[col].tolist() for col in columnas))
+    return {clave: dict(zip(columnas, fila)) for clave, fila in zip(ultimas.index.tolist(), filas)}
+
+
+@SEGUNDOS_ETAPA.cronometrar(etapa="leer_excel_clientes")
+def leer_excel_clientes(archivo_bytes, df=None, reporte=None):
+    """
+    Lee Excel 1 (Clientes y Vendedores) y retorna dos diccionarios.
+
+    Si se pasa `df` (ya parseado por cargar_excel) no se vuelve a leer el archivo.
+    Si se pasa un dict en `reporte`, se llena con los cupos inválidos y los
+    clientes duplicados (mismo nombre normalizado).
+    """
+    if df is None:
+        df = lectura_excel.leer_hoja(archivo_bytes, seleccionar=columnas_a_leer("clientes"), motor=LECTOR_EXCEL)
+
+    log.debug("Columnas en Excel 1", columnas=list(df.columns))
+
+    col_nit = buscar_columna_exacta(df, COLUMNAS_CLIENTES["nit"])
+    col_cliente = buscar_columna_exacta(df, COLUMNAS_CLIENTES["cliente"])
+    col_nombre_comercial = buscar_columna_exacta(df, COLUMNAS_CLIENTES["nombre_comercial"])
+    col_correo_cliente = buscar_columna_exacta(df, COLUMNAS_CLIENTES["correo_cliente"])
+    col_vendedor = buscar_columna_exacta(df, COLUMNAS_CLIENTES["vendedor"])
+    col_correo_vendedor = buscar_columna_exacta(df, COLUMNAS_CLIENTES["correo_vendedor"])
+    col_canal = buscar_columna_exacta(df, COLUMNAS_CLIENTES["canal"])
+    col_cupo = buscar_columna_exacta(df, COLUMNAS_CLIENTES["cupo"])
+
+    if not col_cliente:
+        raise ValueError(f"No se encontró columna 'Cliente' en Excel 1. Columnas: {list(df.columns)}")
+    if not col_correo_cliente:
+        raise ValueError(f"No se encontró columna 'Correo cliente' en Excel 1. Columnas: {list(df.columns)}")
+
+    log.info(
+        "Columnas detectadas en Excel 1",
+        cliente=col_cliente,
+        correo_cliente=col_correo_cliente,
+        vendedor=col_vendedor,
+        correo_vendedor=col_correo_vendedor,
+        cupo=col_cupo
+    )
+    if not col_cupo:
+        log.warning("Excel 1 sin columna de cupo (se usará $0)")
+
+    # Construcción columnar: normalización y coerción en bloque, y un índice
+    # por nombre normalizado construido sobre el frame sin duplicados.
+    df = df.reset_index(drop=True)
+    clientes = df[col_cliente].astype(object)
+    correos_cliente = df[col_correo_cliente].astype(object)
+    validos = _mascara_con_valor(clientes) & _mascara_con_valor(correos_cliente)
+
+    tabla = pd.DataFrame({"clave": normalizar_serie(clientes[validos])})
+    tabla = tabla[tabla["clave"] != ""]
+    filas = tabla.index
+
+    def _texto_o_na(col):
+        if not col:
+            return pd.Series("N/A", index=filas, dtype=object)
+        valores = df.loc[filas, col].astype(object)
+        return valores.where(valores.isna(), valores.astype(str).str.strip()).fillna("N/A")
+
+    tabla["nit"] = _texto_o_na(col_nit)
+    tabla["cliente"] = clientes[filas].astype(str).str.strip()
+    tabla["nombre_comercial"] = _texto_o_na(col_nombre_comercial)
+    tabla["correo_cliente"] = correos_cliente[filas].astype(str).str.strip()
+    tabla["canal"] = _texto_o_na(col_canal)
+
+    # Cupo: vacío -> 0; no numérico -> 0 y se reporta la fila
+    cupos = pd.Series(0, index=filas, dtype=object)
+    cupos_invalidos = []
+    if col_cupo:
+        valores_cupo = df.loc[filas, col_cupo]
+        numericos, invalidos = _serie_a_float(valores_cupo)
+        con_cupo = valores_cupo.notna() & ~invalidos
+        cupos[con_cupo] = numericos[con_cupo].astype(object)
+
+        for cliente, valor in zip(clientes[filas][invalidos], valores_cupo[invalidos]):
+            cupos_invalidos.append({"cliente": str(cliente), "valor": str(valor)})
+    tabla["cupo"] = cupos
+
+    if cupos_invalidos:
+        log.warning("Cupos inválidos en Excel 1 (se usará $0)", clientes=len(cupos_invalidos))
+        for cupo_invalido in log.muestra(cupos_invalidos):
+            log.debug("Cupo inválido", **cupo_invalido)
+
+    # Duplicados: gana la última fila (como antes), pero ahora se reportan
+    repetidos = tabla.loc[tabla["clave"].duplicated(keep=False), "clave"]
+    clientes_duplicados = {clave: int(veces) for clave, veces in repetidos.value_counts(sort=False).items()}
+    if clientes_duplicados:
+        log.warning("Clientes repetidos en Excel 1 (se usa la última fila)", clientes=len(clientes_duplicados))
+        for clave, veces in log.muestra(clientes_duplicados.items()):
+            log.debug("Cliente repetido", cliente=clave, filas=veces)
+
+    dict_clientes = _indice_ultimo_por_clave(tabla)
+
+    dict_vendedores = {}
+    if col_vendedor and col_correo_vendedor:
+        vendedores = df[col_vendedor].astype(object)
+        correos_vendedor = df[col_correo_vendedor].astype(object)
+        con_vendedor = _mascara_con_valor(vendedores) & _mascara_con_valor(correos_vendedor)
+
+        tabla_vendedores = pd.DataFrame({
+            "clave": normalizar_serie(vendedores[con_vendedor]),
+            "correo": correos_vendedor[con_vendedor].astype(str).str.strip()
+        })
+        tabla_vendedores = tabla_vendedores[tabla_vendedores["clave"] != ""]
+        dict_vendedores = {clave: fila["correo"] for clave, fila in _indice_ultimo_por_clave(tabla_vendedores).items()}
+
+    if reporte is not None:
+        reporte["cupos_invalidos"] = cupos_invalidos
+        reporte["clientes_duplicados"] = clientes_duplicados
+
+    log.info("Excel 1 procesado", clientes=len(dict_clientes), vendedores=len(dict_vendedores))
+
+    return dict_clientes, dict_vendedores
+
+
+def _registrar_emparejamiento(reporte):
+    """Facturas por método a nivel INFO; un evento DEBUG por nombre distinto sin match exacto (muestreado)."""
+    log.info("Emparejamiento de clientes (facturas por método)", **reporte["facturas"])
+    for detalle in log.muestra(reporte["detalle"]):
+        log.debug("Nombre tercero sin match exacto", **detalle)
+
+
+@SEGUNDOS_ETAPA.cronometrar(etapa="leer_excel_cartera")
+def leer_excel_cartera(archivo_bytes, dict_clientes, dict_vendedores, df=None, indice=None, reporte=None,
+                       contadores=None):
+    """
+    Lee Excel 2 (Cartera) - Procesa TODAS las facturas (vencidas, próximas y no vencidas).
+
+    Si se pasa `df` (ya parseado por cargar_excel) no se vuelve a leer el archivo.
+    `indice` es el IndiceClientes de `dict_clientes` (se construye si falta).
+    Si se pasa un dict en `reporte`, se llena con el reporte de emparejamiento
+    de clientes (facturas por método y confianza de cada nombre sin match exacto).
+    Si se pasa un dict en `contadores`, se llena con los conteos del resumen
+    (facturas por estado y filas omitidas por motivo).
+
+    Retorna la lista de recordatorios como Factura (facturas.py).
+    """
+    if df is None:
+        df = lectura_excel.leer_hoja(
+            archivo_bytes, HOJA_CARTERA, FILA_ENCABEZADO_CARTERA,
+            seleccionar=columnas_a_leer("cartera"), motor=LECTOR_EXCEL
+        )
+
+    col_nombre_tercero = buscar_columna_exacta(df, COLUMNAS_CARTERA["nombre_tercero"])
+    col_numero_fac = buscar_columna_exacta(df, COLUMNAS_CARTERA["numero_fac"])
+    col_emision = buscar_columna_exacta(df, COLUMNAS_CARTERA["emision"])
+    col_vencimiento = buscar_columna_exacta(df, COLUMNAS_CARTERA["vencimiento"])
+    col_saldo = buscar_columna_exacta(df, COLUMNAS_CARTERA["saldo"])
+    col_vendedor = buscar_columna_exacta(df, COLUMNAS_CARTERA["vendedor"])
+    col_local = buscar_columna_exacta(df, COLUMNAS_CARTERA["local"])
+
+    columnas_faltantes = []
+    if not col_nombre_tercero: columnas_faltantes.append("Nombre tercero")
+    if not col_numero_fac: columnas_faltantes.append("Numero FAC")
+    if not col_vencimiento: columnas_faltantes.append("Vencimiento")
+    if not col_saldo: columnas_faltantes.append("Saldo")
+
+    if columnas_faltantes:
+        raise ValueError(f"Columnas faltantes: {', '.join(columnas_faltantes)}")
+
+    log.info(
+        "Columnas detectadas en Excel 2",
+        nombre_tercero=col_nombre_tercero,
+        numero_fac=col_numero_fac,
+        vencimiento=col_vencimiento,
+        saldo=col_saldo
+    )
+
+    hoy = date.today()
+
+    # Motor columnar: cada paso del antiguo ciclo por fila se aplica a la
+    # columna completa, en el mismo orden de filtros para conservar contadores.
+    df = df.reset_index(drop=True)
+
+    # 1. Filas sin nombre de tercero se ignoran (sin contar)
+    df = df[_mascara_con_valor(df[col_nombre_tercero])]
+    nombres_norm = normalizar_serie(df[col_nombre_tercero])
+
+    # 2. Match contra Excel 1: exacto, canónico y aproximado
+    if indice is None or getattr(indice, "version", None) != VERSION_INDICE:
+        indice = IndiceClientes(dict_clientes)
+    with SEGUNDOS_ETAPA.cronometrar(etapa="emparejamiento"):
+        claves_clientes, reporte_emparejamiento = indice.emparejar(
+            nombres_norm, df[col_nombre_tercero], umbral=UMBRAL_COINCIDENCIA, margen=MARGEN_COINCIDENCIA,
+            asignar_aproximadas=ASIGNAR_COINCIDENCIAS_APROXIMADAS
+        )
+    encontrado = claves_clientes.notna()
+    sin_cliente = int((~encontrado).sum())
+    _registrar_emparejamiento(reporte_emparejamiento)
+    if reporte is not None:
+        reporte.update(reporte_emparejamiento)
+
+    df = df[encontrado]
+    nombres_norm = claves_clientes[encontrado]
+
+    # 3. Vencimiento vacío
+    con_vencimiento = df[col_vencimiento].notna()
+    vencimiento_vacio = int((~con_vencimiento).sum())
+    df = df[con_vencimiento]
+    nombres_norm = nombres_norm[con_vencimiento]
+
+    # 4. Saldo en cero (los saldos no numéricos quedan en 0 pero NO se omiten)
+    saldos, saldo_invalido = _serie_a_float(df[col_saldo])
+    es_cero = (saldos == 0) & ~saldo_invalido
+    saldo_cero = int(es_cero.sum())
+    df = df[~es_cero]
+    nombres_norm = nombres_norm[~es_cero]
+    saldos = saldos[~es_cero]
+    saldo_invalido = saldo_invalido[~es_cero]
+
+    numeros_fac = df[col_numero_fac].astype(object)
+    numeros_fac = numeros_fac.where(numeros_fac.notna(), "N/A")
+
+    # 5. Fechas de vencimiento y días
+    fechas_vencimiento, errores_fecha = _serie_a_fechas(df[col_vencimiento])
+    if len(errores_fecha):
+        log.warning("Facturas con vencimiento inválido (omitidas)", facturas=len(errores_fecha))
+        for idx, error in log.muestra(errores_fecha.items()):
+            log.debug("Vencimiento inválido", factura=numeros_fac[idx], error=str(error))
+
+    fecha_valida = fechas_vencimiento.notna()
+    df = df[fecha_valida]
+    nombres_norm = nombres_norm[fecha_valida]
+    saldos = saldos[fecha_valida]
+    saldo_invalido = saldo_invalido[fecha_valida]
+    numeros_fac = numeros_fac[fecha_valida]
+    fechas_vencimiento = fechas_vencimiento[fecha_valida]
+
+    dias = (fechas_vencimiento - pd.Timestamp(hoy)).dt.days
+
+    # 6. Clasificación en 3 categorías (código: posición en facturas.ESTADOS)
+    codigos_estado = np.select([dias < 0, dias <= 5], [VENCIDO, PROXIMO], default=NO_VENCIDO)
+    vencidas = int((codigos_estado == VENCIDO).sum())
+    proximas = int((codigos_estado == PROXIMO).sum())
+    no_vencidas = int((codigos_estado == NO_VENCIDO).sum())
+
+    # 7. Join con clientes y vendedores
+    info_clientes = pd.DataFrame.from_dict(dict_clientes, orient="index", dtype=object)
+    info_clientes = info_clientes.reindex(nombres_norm.tolist())
+    cupos = info_clientes["cupo"] if "cupo" in info_clientes else pd.Series(0, index=info_clientes.index)
+
+    if col_vendedor:
+        vendedores = df[col_vendedor].astype(object)
+        con_vendedor = _mascara_con_valor(vendedores)
+        correos_vendedor = normalizar_serie(vendedores[con_vendedor]).map(dict_vendedores).reindex(df.index)
+        correos_vendedor = correos_vendedor.where(_mascara_con_valor(correos_vendedor), "N/A")
+        vendedores = vendedores.where(con_vendedor, "N/A")
+    else:
+        vendedores = pd.Series("N/A", index=df.index, dtype=object)
+        correos_vendedor = vendedores
+
+    if col_local:
+        locales = df[col_local].astype(object)
+        locales = locales.where(locales.notna(), "N/A").astype(str)
+    else:
+        locales = pd.Series("N/A", index=df.index, dtype=object)
+
+    # 8. Facturas compactas: textos repetidos compartidos, fechas como date y
+    # estado como código; el formato de presentación se hace al serializar
+    if col_emision and pd.api.types.is_datetime64_any_dtype(df[col_emision]):
+        emisiones = fechas_compartidas(df[col_emision])
+    elif col_emision:
+        emisiones = df[col_emision].tolist()
+    else:
+        emisiones = [None] * len(df)
+
+    saldos_numericos = saldos.astype(object)
+    saldos_numericos[saldo_invalido] = 0
+
+    recordatorios = list(map(
+        Factura,
+        info_clientes["cliente"].tolist(),
+        info_clientes["correo_cliente"].tolist(),
+        internar(vendedores.tolist()),
+        internar(correos_vendedor.tolist()),
+        internar(locales.tolist()),
+        numeros_fac.astype(str).tolist(),
+        emisiones,
+        fechas_compartidas(fechas_vencimiento),
+        dias.tolist(),
+        saldos_numericos.tolist(),
+        codigos_estado.tolist(),
+        cupos.tolist()
+    ))
+
+    # Vencidas: días < 0; próximas: 0 <= días <= 5; no vencidas: días > 5
+    conteos = {
+        "vencidas": vencidas,
+        "proximas": proximas,
+        "no_vencidas": no_vencidas,
+        "sin_cliente": sin_cliente,
+        "vencimiento_vacio": vencimiento_vacio,
+        "saldo_cero": saldo_cero
+    }
+    if contadores is not None:
+        contadores.update(conteos)
+    log.info("Excel 2 procesado", hoy=hoy.strftime("%d/%m/%Y"), recordatorios=len(recordatorios), **conteos)
+
+    return recordatorios
+
+
+# ==========================================
+# PROCESAMIENTO DE LOS DOS ARCHIVOS
+# ==========================================
+
+
+class TiposNoDetectados(ValueError):
+    """Los dos archivos no son un listado de clientes y una cartera."""
+
+
+def procesar_archivos(contenido1, contenido2):
+    """
+    Lee los dos Excel (en cualquier orden) y retorna los recordatorios.
+
+    Detecta cuál es el listado de clientes y cuál la cartera con un sondeo
+    de las primeras filas (TiposNoDetectados si no son uno de cada uno),
+    toma el listado de `cache_clientes` si ya se parseó, y empareja la
+    cartera con los clientes. Retorna un dict con "recordatorios" (lista de
+    Factura), "reporte_clientes", "reporte_emparejamiento", "contadores"
+    (de leer_excel_cartera), "cache_clientes" ({"hit", "parseado_en"}) y
+    "tiempos_ms" por etapa.
+    """
+    tiempos = {}
+    inicio = time.perf_counter()
+
+    huella1 = huella_contenido(contenido1)
+    huella2 = huella_contenido(contenido2)
+
+    # Si uno de los archivos es un listado de clientes ya parseado, se
+    # salta por completo su sondeo y su parseo
+    huella_cacheada, entrada_clientes = cache_clientes.buscar(huella1, huella2)
+
+    # Sondeo rápido (solo primeras filas) para rechazar archivos equivocados
+    # antes de gastar CPU en el parseo completo
+    t0 = time.perf_counter()
+    if entrada_clientes:
+        contenido_cartera = contenido2 if huella_cacheada == huella1 else contenido1
+        sondeo_cartera = sondear_excel(contenido_cartera)
+        log.info("Listado de clientes en caché", parseado_en=entrada_clientes["parseado_en"])
+
+        if sondeo_cartera["tipo"] != "cartera":
+            raise TiposNoDetectados(
+                f"No se pudieron detectar los tipos de archivo correctamente. Tipo1: clientes, Tipo2: {sondeo_cartera['tipo']}."
+            )
+    else:
+        sondeo1 = sondear_excel(contenido1)
+        sondeo2 = sondear_excel(contenido2)
+
+        tipo1 = sondeo1["tipo"]
+        tipo2 = sondeo2["tipo"]
+
+        log.info("Archivo 1 detectado", **sondeo1)
+        log.info("Archivo 2 detectado", **sondeo2)
+
+        if tipo1 == "clientes" and tipo2 == "cartera":
+            contenido_clientes, sondeo_clientes, huella_clientes = contenido1, sondeo1, huella1
+            contenido_cartera, sondeo_cartera = contenido2, sondeo2
+        elif tipo1 == "cartera" and tipo2 == "clientes":
+            contenido_clientes, sondeo_clientes, huella_clientes = contenido2, sondeo2, huella2
+            contenido_cartera, sondeo_cartera = contenido1, sondeo1
+        else:
+            raise TiposNoDetectados(
+                f"No se pudieron detectar los tipos de archivo correctamente. Tipo1: {tipo1}, Tipo2: {tipo2}."
+            )
+    tiempos["sondeo"] = time.perf_counter() - t0
+
+    # Cada archivo se parsea UNA sola vez; el DataFrame se reutiliza abajo
+    if not entrada_clientes:
+        t0 = time.perf_counter()
+        _, df_clientes = cargar_excel(contenido_clientes, sondeo_clientes)
+        tiempos["lectura_clientes"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reporte_clientes = {}
+        dict_clientes, dict_vendedores = leer_excel_clientes(None, df=df_clientes, reporte=reporte_clientes)
+        indice_clientes = IndiceClientes(dict_clientes)
+        tiempos["procesar_clientes"] = time.perf_counter() - t0
+
+        entrada_clientes = cache_clientes.guardar(huella_clientes, {
+            "dict_clientes": dict_clientes,
+            "dict_vendedores": dict_vendedores,
+            "indice": indice_clientes,
+            "reporte": reporte_clientes
+        })
+        cache_hit = False
+    else:
+        dict_clientes = entrada_clientes["valor"]["dict_clientes"]
+        dict_vendedores = entrada_clientes["valor"]["dict_vendedores"]
+        # Entradas en disco de versiones anteriores no traen el índice o lo
+        # traen desactualizado (leer_excel_cartera lo reconstruye)
+        indice_clientes = entrada_clientes["valor"].get("indice")
+        reporte_clientes = entrada_clientes["valor"]["reporte"]
+        cache_hit = True
+
+    t0 = time.perf_counter()
+    _, df_cartera = cargar_excel(contenido_cartera, sondeo_cartera)
+    tiempos["lectura_cartera"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    reporte_emparejamiento = {}
+    contadores = {}
+    recordatorios = leer_excel_cartera(
+        None, dict_clientes, dict_vendedores, df=df_cartera,
+        indice=indice_clientes, reporte=reporte_emparejamiento, contadores=contadores
+    )
+    tiempos["procesar_cartera"] = time.perf_counter() - t0
+
+    tiempos["total"] = time.perf_counter() - inicio
+    tiempos_ms = {etapa: round(segundos * 1000, 1) for etapa, segundos in tiempos.items()}
+    log.info("Tiempos por etapa (ms)", **tiempos_ms)
+
+    return {
+        "recordatorios": recordatorios,
+        "reporte_clientes": reporte_clientes,
+        "reporte_emparejamiento": reporte_emparejamiento,
+        "contadores": contadores,
+        "cache_clientes": {"hit": cache_hit, "parseado_en": entrada_clientes["parseado_en"]},
+        "tiempos_ms": tiempos_ms
+    }
+
+
+# ==========================================
+# FUNCIONES DE ENVÍO DE CORREO
+# ==========================================
+
+
+def crear_mensaje_email(destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto=None):
+    """Crea un mensaje de email en formato MIME con CC."""
+    mensaje = MIMEMultipart("alternative")
+    mensaje["Subject"] = asunto
+    mensaje["From"] = f"{EMAIL_FROM_NAME} <{EMAIL_FROM_ADDRESS}>"
+    mensaje["To"] = destinatario_principal
+    
+    if destinatario_cc:
+        mensaje["Cc"] = destinatario_cc
+    
+    if cuerpo_texto:
+        parte_texto = MIMEText(cuerpo_texto, "plain", "utf-8")
+        mensaje.attach(parte_texto)
+    
+    parte_html = MIMEText(cuerpo_html, "html", "utf-8")
+    mensaje.attach(parte_html)
+    
+    return mensaje
+
+
+ERRORES_AUTENTICACION = (smtplib.SMTPAuthenticationError,) + envio_async.ERRORES_AUTENTICACION
+ERRORES_SMTP = (smtplib.SMTPException,) + envio_async.ERRORES_SMTP
+
+
+def validar_envio(destinatario_principal):
+    """Retorna el texto de error si el correo no puede intentarse, o None."""
+    if not EMAIL_USER or not EMAIL_PASSWORD:
+        return "Credenciales de correo no configuradas. Revisa el archivo .env"
+
+    return validar_destinatario(destinatario_principal)
+
+
+def validar_destinatario(destinatario_principal):
+    """Retorna el texto de error si el destinatario principal no es un email, o None."""
+    if not destinatario_principal or "@" not in destinatario_principal:
+        return "Email de destinatario principal inválido"
+
+    return None
+
+
+def lista_destinatarios(destinatario_principal, destinatario_cc):
+    """Destinatarios SMTP: principal + CC si es un email."""
+    destinatarios = [destinatario_principal]
+    if destinatario_cc and "@" in destinatario_cc:
+        destinatarios.append(destinatario_cc)
+    return destinatarios
+
+
+def describir_error_envio(error):
+    """Texto de error de un envío fallido (excepción de smtplib o aiosmtplib)."""
+    if isinstance(error, ERRORES_AUTENTICACION):
+        return "Error de autenticación SMTP. Verifica tu correo y contraseña de aplicación."
+    if isinstance(error, ERRORES_SMTP):
+        return f"Error SMTP: {str(error)}"
+    return f"Error inesperado: {str(error)}"
+
+
+def respuesta_smtp(error=None):
+    """Respuesta del servidor para la bitácora: '250 OK' o el código y texto del rechazo."""
+    if error is None:
+        return "250 OK"
+    codigo = getattr(error, "smtp_code", None) or getattr(error, "code", None)
+    texto = getattr(error, "smtp_error", None) or getattr(error, "message", None) or str(error)
+    if isinstance(texto, bytes):
+        texto = texto.decode("utf-8", errors="replace")
+    return f"{codigo} {texto}" if codigo else str(texto)
+
+
+@SEGUNDOS_ETAPA.cronometrar(etapa="enviar_email_individual")
+def enviar_email_individual(destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto=None):
+    """Envía un correo electrónico individual con CC opcional."""
+    inicializar()
+    error = validar_envio(destinatario_principal)
+    if error:
+        _contar_envio(error=error)
+        return _resultado_envio(destinatario_principal, error=error)
+
+    try:
+        mensaje = crear_mensaje_email(destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto)
+    except Exception as e:
+        _contar_envio(error=e)
+        return _resultado_envio(destinatario_principal, error=e)
+
+    return enviar_mensaje_serializado(
+        destinatario_principal,
+        destinatario_cc,
+        lista_destinatarios(destinatario_principal, destinatario_cc),
+        mensaje.as_string()
+    )
+
+
+@SEGUNDOS_ETAPA.cronometrar(etapa="enviar_mensaje_serializado")
+def enviar_mensaje_serializado(destinatario_principal, destinatario_cc, destinatarios, mensaje):
+    """Envía un mensaje MIME ya serializado (etapa de E/S del envío)."""
+    try:
+        # Ritmo por segundo de la cuenta + conexión reutilizada del pool
+        cuota_envio.limitador.esperar()
+        pool_smtp.enviar(EMAIL_FROM_ADDRESS, destinatarios, mensaje)
+    except Exception as e:
+        _contar_envio(error=e)
+        return _resultado_envio(destinatario_principal, error=e)
+
+    _contar_envio(mensaje)
+    return _resultado_envio(destinatario_principal, destinatario_cc)
+
+
+def _contar_envio(mensaje=None, error=None):
+    """Contadores de /metrics para un intento de envío: aceptado (`mensaje`) o fallido (`error`)."""
+    if error is None:
+        CORREOS_ENVIADOS.inc()
+        BYTES_ENVIADOS.inc(len(mensaje))
+    elif isinstance(error, str):
+        CORREOS_FALLIDOS.inc(tipo="validacion")
+    else:
+        CORREOS_FALLIDOS.inc(tipo="transitorio" if es_error_transitorio(error) else "permanente")
+
+
+def _resultado_envio(destinatario_principal, destinatario_cc=None, error=None):
+    """Resultado de enviar_email_individual; `error` es un texto (validación) o la excepción."""
+    if error is None:
+        return {
+            "success": True,
+            "destinatario": destinatario_principal,
+            "destinatario_cc": destinatario_cc,
+            "error": None,
+            "respuesta": respuesta_smtp(),
+            "transitorio": False
+        }
+
+    if isinstance(error, str):
+        return {
+            "success": False,
+            "destinatario": destinatario_principal,
+            "error": error,
+            "respuesta": None,
+            "transitorio": False
+        }
+
+    return {
+        "success": False,
+        "destinatario": destinatario_principal,
+        "error": describir_error_envio(error),
+        "respuesta": respuesta_smtp(error),
+        "transitorio": es_error_transitorio(error)
+    }
+
+
+LOGO_URL = "https://images.jumpseller.com/store/lomarosa/store/logo/LR_LogotipoEslogan_CMYK.png?1662998750"
+
+# (lista de facturas, subtotal precalculado al agrupar, título, color, emoji)
+SECCIONES_FACTURAS = (
+    ("facturas_vencidas", "subtotal_vencidas", "FACTURAS VENCIDAS", "#dc2626", "🔴"),
+    ("facturas_proximas", "subtotal_proximas", "FACTURAS PRÓXIMAS A VENCER (≤ 5 días)", "#f59e0b", "🟡"),
+    ("facturas_no_vencidas", "subtotal_no_vencidas", "FACTURAS NO VENCIDAS (> 5 días)", "#10b981", "🟢")
+)
+
+
+def generar_tabla_facturas(facturas, subtotal, titulo, color_bg, emoji):
+    """Tabla HTML de facturas de una categoría ("" si no hay facturas)."""
+    if len(facturas) == 0:
+        return ""
+
+    if subtotal is None:
+        subtotal = sum(f["saldo_numerico"] for f in facturas)
+
+    return plantilla_correo.TABLA_FACTURAS.render({
+        "color_bg": color_bg,
+        "emoji": emoji,
+        "titulo": titulo,
+        "cantidad": len(facturas),
+        "filas": plantilla_correo.FILA_FACTURA.render_varios(facturas),
+        "subtotal_formateado": f"${subtotal:,.0f}"
+    })
+
+
+@SEGUNDOS_ETAPA.cronometrar(etapa="generar_html_recordatorio_agrupado")
+def generar_html_recordatorio_agrupado(cliente_agrupado):
+    """Genera HTML con TRES secciones: Vencidas, Próximas y No Vencidas."""
+    correo_vendedor = cliente_agrupado.get("correo_vendedor", "N/A")
+    total_saldo = cliente_agrupado.get("total_saldo", 0)
+    cupo_disponible = cliente_agrupado.get("cupo_disponible", 0)
+
+    valores = {
+        "logo_url": LOGO_URL,
+        "cliente": cliente_agrupado.get("cliente", "Cliente"),
+        "vendedor": cliente_agrupado.get("vendedor", "N/A"),
+        "contacto_vendedor": correo_vendedor if correo_vendedor != "N/A" else "No asignado",
+        "total_facturas": cliente_agrupado.get("total_facturas", 0),
+        "total_vencidas": cliente_agrupado.get("total_vencidas", 0),
+        "total_proximas": cliente_agrupado.get("total_proximas", 0),
+        "total_no_vencidas": cliente_agrupado.get("total_no_vencidas", 0),
+        "total_saldo_formateado": f"${total_saldo:,.0f}",
+        "cupo_disponible_formateado": f"${cupo_disponible:,.0f}",
+        # Rojo si el cupo disponible es negativo, verde si es positivo
+        "cupo_disponible_color": "#dc2626" if cupo_disponible < 0 else "#10b981",
+        "cupo_disponible_emoji": "⚠️" if cupo_disponible < 0 else "✅"
+    }
+
+    # Secciones solo si hay facturas
+    for clave_facturas, clave_subtotal, titulo, color_bg, emoji in SECCIONES_FACTURAS:
+        valores["seccion_" + clave_facturas[len("facturas_"):]] = generar_tabla_facturas(
+            cliente_agrupado.get(clave_facturas, []),
+            cliente_agrupado.get(clave_subtotal),
+            titulo,
+            color_bg,
+            emoji
+        )
+
+    return plantilla_correo.DOCUMENTO.render(valores)
+
+
+def huella_cliente(cliente_agrupado):
+    """
+    Huella del contenido de un cliente agrupado (None si tiene tipos que
+    marshal no serializa). Dos clientes con los mismos datos en el mismo
+    orden producen la misma huella.
+    """
+    try:
+        return hashlib.sha256(marshal.dumps(cliente_plano(cliente_agrupado))).hexdigest()
+    except ValueError:
+        return None
+
+
+def _html_cliente_cacheado(cliente_agrupado):
+    """HTML del correo de un cliente; reintentos y reenvíos lo toman de la caché."""
+    huella = huella_cliente(cliente_agrupado)
+    if huella is not None:
+        entrada = cache_correos.obtener(huella)
+        if entrada is not None:
+            return entrada["valor"]
+
+    cuerpo_html = generar_html_recordatorio_agrupado(cliente_agrupado)
+    if huella is not None:
+        cache_correos.guardar(huella, cuerpo_html)
+    return cuerpo_html
+
+
+def preparar_correo_agrupado(cliente_agrupado, usar_cache=True):
+    """Retorna (destinatario, cc, asunto, html, texto) del correo unificado de un cliente."""
+    destinatario_principal = cliente_agrupado.get("correo_cliente", "")
+    destinatario_cc = cliente_agrupado.get("correo_vendedor", None)
+
+    total_facturas = cliente_agrupado.get("total_facturas", 0)
+    total_vencidas = cliente_agrupado.get("total_vencidas", 0)
+    total_proximas = cliente_agrupado.get("total_proximas", 0)
+
+    # Generar asunto descriptivo
+    asunto = f"Estado de Facturas - {total_facturas} facturas - {cliente_agrupado.get('cliente', 'Cliente')}"
+    if usar_cache:
+        cuerpo_html = _html_cliente_cacheado(cliente_agrupado)
+    else:
+        cuerpo_html = generar_html_recordatorio_agrupado(cliente_agrupado)
+    cuerpo_texto = f"Tiene {total_facturas} facturas pendientes ({total_vencidas} vencidas, {total_proximas} próximas)"
+
+    return destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto
+
+
+def _serializar_correo(cliente_agrupado, usar_cache=True):
+    """
+    Correo de un cliente listo para la etapa de envío:
+    (destinatario, cc, destinatarios, mensaje_str, huella, error).
+
+    `error` es el texto de validación si el correo no puede intentarse (en
+    ese caso no hay mensaje).
+    """
+    destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto = preparar_correo_agrupado(
+        cliente_agrupado, usar_cache
+    )
+    huella = huella_mensaje(asunto, cuerpo_html, cuerpo_texto)
+
+    error = validar_envio(destinatario_principal)
+    if error:
+        return destinatario_principal, destinatario_cc, None, None, huella, error
+
+    mensaje = crear_mensaje_email(destinatario_principal, destinatario_cc, asunto, cuerpo_html, cuerpo_texto)
+    destinatarios = lista_destinatarios(destinatario_principal, destinatario_cc)
+    return destinatario_principal, destinatario_cc, destinatarios, mensaje.as_string(), huella, None
+
+
+def _serializar_correos(clientes_agrupados):
+    """
+    Etapa de preparación de un lote de clientes (ver etapas_envio.py).
+
+    Corre en los procesos de `preparador_correos`; ahí no se usa la caché de
+    HTML, que vive en el proceso principal. No debe imprimir ni tomar locks:
+    con fork el hijo hereda una copia de ellos que puede haber quedado tomada.
+    """
+    usar_cache = multiprocessing.parent_process() is None
+    return [_serializar_correo(cliente_agrupado, usar_cache) for cliente_agrupado in clientes_agrupados]
+
+
+def _enviar_serializado(correo):
+    """Envía un correo de _serializar_correo (o retorna su error de validación)."""
+    destinatario_principal, destinatario_cc, destinatarios, mensaje, _, error = correo
+    if error:
+        _contar_envio(error=error)
+        return _resultado_envio(destinatario_principal, error=error)
+    return enviar_mensaje_serializado(destinatario_principal, destinatario_cc, destinatarios, mensaje)
+
+
+def resultado_cliente(cliente_agrupado, destinatario, success, error, intentos=1):
+    """Entrada de `resultados` para un cliente (`intentos` cuenta los reintentos)."""
+    return {
+        "destinatario": destinatario,
+        "cliente": cliente_agrupado.get("cliente"),
+        "facturas": cliente_agrupado.get("total_facturas", 0),
+        "vencidas": cliente_agrupado.get("total_vencidas", 0),
+        "proximas": cliente_agrupado.get("total_proximas", 0),
+        "no_vencidas": cliente_agrupado.get("total_no_vencidas", 0),
+        "success": success,
+        "error": error,
+        "intentos": intentos
+    }
+
+
+def _resultado_cancelado(cliente_agrupado):
+    """Entrada de `resultados` para un cliente que no se envió porque se canceló el trabajo."""
+    return resultado_cliente(cliente_agrupado, cliente_agrupado.get("correo_cliente", ""), False, "Envío cancelado")
+
+
+def huella_mensaje(asunto, cuerpo_html, cuerpo_texto):
+    """SHA-256 del contenido de un correo (para la bitácora)."""
+    contenido = "\x00".join((asunto or "", cuerpo_html or "", cuerpo_texto or ""))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _nueva_corrida_reintentos(total):
+    """Reintentos de una corrida: presupuesto proporcional al tamaño del lote."""
+    presupuesto = max(REINTENTOS_MAX, math.ceil(total * REINTENTOS_PRESUPUESTO))
+    return ReintentosCorrida(cola_reintentos, politica_reintentos, presupuesto)
+
+
+def _reintentar_envio(corrida, intento, idx, cliente_agrupado, correo, registrar, trabajo=None):
+    """
+    Agenda el reintento número `intento` del cliente `idx` del lote.
+
+    `correo` es el mensaje ya serializado (_serializar_correo): el reintento
+    no vuelve a generarlo. `registrar(resultado, idx, huella, respuesta)`
+    recibe el resultado final (el mismo callback del envío original), también
+    cuando el reintento lanza una excepción. Si el reintento vuelve a fallar
+    de forma transitoria se agenda el siguiente.
+    Retorna False si no se agendó (máximo de reintentos o presupuesto agotado).
+    """
+    def ejecutar():
+        if trabajo is not None and not trabajo.esperar_si_pausado():
+            registrar(_resultado_cancelado(cliente_agrupado))
+            return
+
+        resultado = _enviar_serializado(correo)
+        if not resultado["success"] and resultado["transitorio"]:
+            if _reintentar_envio(corrida, intento + 1, idx, cliente_agrupado, correo, registrar, trabajo):
+                return
+
+        registrar(
+            resultado_cliente(cliente_agrupado, resultado["destinatario"], resultado["success"],
+                               resultado["error"], intentos=intento + 1),
+            idx,
+            correo[4],
+            resultado["respuesta"] or resultado["error"]
+        )
+
+    def fallar(error):
+        registrar(
+            resultado_cliente(cliente_agrupado, correo[0], False, str(error), intentos=intento + 1),
+            idx,
+            correo[4],
+            str(error)
+        )
+
+    return corrida.programar(intento, ejecutar, al_fallar=fallar)
+
+
+def _enviar_lote_agrupado(recordatorios_agrupados, trabajo=None, lote=None):
+    """
+    Envía lote de correos UNIFICADOS (vencidas + próximas + no vencidas).
+
+    Si se pasa un `trabajo` (trabajos.TrabajoEnvio), cada resultado se
+    registra en él apenas termina, y antes de cada envío se respeta su pausa
+    o cancelación. Si se pasa un `lote` (bitacora.LoteBitacora), cada
+    resultado queda anotado en la bitácora; los cancelados quedan pendientes.
+
+    Los mensajes se preparan en `preparador_correos` (procesos aparte) y los
+    hilos de envío solo mandan los bytes listos; entre ambas etapas hay una
+    cola acotada (etapas_envio.py). Los errores transitorios se reintentan en
+    segundo plano (reintentos.py) mientras siguen saliendo los correos
+    nuevos; la función retorna cuando todos tienen un resultado final.
+    """
+    inicializar()
+    if ENVIO_ASYNC:
+        if envio_async.disponible():
+            return _enviar_lote_agrupado_async(recordatorios_agrupados, trabajo, lote)
+        log.warning("ENVIO_ASYNC activo pero aiosmtplib no está instalado; se usa el envío con hilos")
+
+    resultados = []
+    corrida = _nueva_corrida_reintentos(len(recordatorios_agrupados))
+
+    def registrar(resultado, idx=None, huella=None, respuesta=None):
+        resultados.append(resultado)
+        if trabajo is not None:
+            trabajo.registrar(resultado, idx, None if idx is None else recordatorios_agrupados[idx])
+        if lote is not None and idx is not None:
+            lote.registrar(idx, resultado["success"], huella, respuesta, resultado["intentos"])
+
+    def enviar(tarea):
+        idx, correo = tarea
+        cliente_agrupado = recordatorios_agrupados[idx]
+        if trabajo is not None and not trabajo.esperar_si_pausado():
+            registrar(_resultado_cancelado(cliente_agrupado))
+            return
+
+        try:
+            resultado = _enviar_serializado(correo)
+        except Exception as e:
+            registrar(resultado_cliente(
+                cliente_agrupado, cliente_agrupado.get("correo_cliente"), False, str(e)
+            ), idx, correo[4], str(e))
+            return
+
+        if not resultado["success"] and resultado["transitorio"]:
+            if _reintentar_envio(corrida, 1, idx, cliente_agrupado, correo, registrar, trabajo):
+                return
+        registrar(resultado_cliente(
+            cliente_agrupado, resultado["destinatario"], resultado["success"], resultado["error"]
+        ), idx, correo[4], resultado["respuesta"] or resultado["error"])
+
+    def preparados():
+        correos = preparador_correos.preparar(_serializar_correos, recordatorios_agrupados)
+        for idx, correo in enumerate(correos):
+            if trabajo is not None and trabajo.cancelado:
+                correos.close()
+                for pendiente in recordatorios_agrupados[idx:]:
+                    registrar(_resultado_cancelado(pendiente))
+                return
+            yield idx, correo
+
+    consumir_en_hilos(preparados(), enviar, hilos=MAX_WORKERS, max_pendientes=MAX_WORKERS * 2)
+
+    corrida.esperar()
+    if corrida.usados:
+        log.info("Reintentos usados", usados=corrida.usados, presupuesto=corrida.presupuesto)
+    return resultados
+
+
+def _enviar_lote_agrupado_async(recordatorios_agrupados, trabajo=None, lote=None):
+    """
+    Igual que _enviar_lote_agrupado pero con el motor asyncio (envio_async).
+
+    El motor pide los mensajes a medida que tiene lugar en su cola, así que
+    la preparación (en `preparador_correos`) no se adelanta al envío y la
+    memoria no crece con el tamaño del lote. La pausa/cancelación del
+    `trabajo` se aplica antes de entregar cada mensaje. Los reintentos de
+    errores transitorios van por el pool SMTP con hilos. Retorna la misma
+    estructura.
+    """
+    resultados = []
+    en_envio = {}
+    corrida = _nueva_corrida_reintentos(len(recordatorios_agrupados))
+
+    def registrar(resultado, idx=None, huella=None, respuesta=None):
+        resultados.append(resultado)
+        if trabajo is not None:
+            trabajo.registrar(resultado, idx, None if idx is None else recordatorios_agrupados[idx])
+        if lote is not None and idx is not None:
+            lote.registrar(idx, resultado["success"], huella, respuesta, resultado["intentos"])
+
+    def mensajes():
+        correos = preparador_correos.preparar(_serializar_correos, recordatorios_agrupados)
+        for idx, correo in enumerate(correos):
+            cliente_agrupado = recordatorios_agrupados[idx]
+            if trabajo is not None and not trabajo.esperar_si_pausado():
+                correos.close()
+                for pendiente in recordatorios_agrupados[idx:]:
+                    registrar(_resultado_cancelado(pendiente))
+                return
+
+            destinatario_principal, _, destinatarios, mensaje, huella, error = correo
+            if error:
+                _contar_envio(error=error)
+                registrar(resultado_cliente(cliente_agrupado, destinatario_principal, False, error),
+                          idx, huella, error)
+                continue
+
+            en_envio[idx] = correo
+            yield idx, EMAIL_FROM_ADDRESS, destinatarios, mensaje
+
+    def al_terminar(idx, error):
+        cliente_agrupado = recordatorios_agrupados[idx]
+        correo = en_envio.pop(idx)
+        _contar_envio(correo[3], error)
+
+        if error is not None and es_error_transitorio(error):
+            if _reintentar_envio(corrida, 1, idx, cliente_agrupado, correo, registrar, trabajo):
+                return
+
+        registrar(resultado_cliente(
+            cliente_agrupado,
+            cliente_agrupado.get("correo_cliente", ""),
+            error is None,
+            None if error is None else describir_error_envio(error)
+        ), idx, correo[4], respuesta_smtp(error))
+
+    envio_async.enviar_mensajes_sync(
+        mensajes(),
+        host=EMAIL_HOST,
+        port=EMAIL_PORT,
+        usuario=EMAIL_USER,
+        password=EMAIL_PASSWORD,
+        usar_tls=EMAIL_USE_TLS,
+        max_conexiones=ENVIO_ASYNC_CONEXIONES,
+        max_pendientes=ENVIO_ASYNC_PENDIENTES,
+        max_mensajes=SMTP_MENSAJES_POR_CONEXION,
+        reservar=cuota_envio.limitador.reservar,
+        al_terminar=al_terminar
+    )
+
+    corrida.esperar()
+    if corrida.usados:
+        log.info("Reintentos usados", usados=corrida.usados, presupuesto=corrida.presupuesto)
+    return resultados
+
+
+# ==========================================
+# TRABAJOS DE ENVÍO
+# ==========================================
+
+
+def _ejecutar_trabajo_envio(trabajo, clientes, lote=None):
+    """
+    Cuerpo del hilo de un trabajo de envío.
+
+    Sin `lote` abre uno nuevo en la bitácora con el id del trabajo; con
+    `lote` (reanudación) anota los resultados en ese lote existente.
+    """
+    if lote is None and bitacora is not None:
+        lote = bitacora.abrir_lote(trabajo.id, clientes, _preparar_destinatarios, serializar=cliente_plano)
+    trabajo.lote = lote
+
+    resultados = _enviar_lote_agrupado(clientes, trabajo, lote)
+    if bitacora is not None:
+        bitacora.vaciar()
+
+    exitosos = sum(1 for r in resultados if r["success"])
+    log.info("Trabajo de envío terminado", trabajo=trabajo.id, exitosos=exitosos, fallidos=len(resultados) - exitosos)
+
+
+def _preparar_destinatarios(cliente_agrupado):
+    """(destinatario, cc) de un cliente agrupado, sin generar el HTML."""
+    return cliente_agrupado.get("correo_cliente", ""), cliente_agrupado.get("correo_vendedor", None)
+
+
+def iniciar_envio(clientes, lote=None):
+    """
+    Envía `clientes` (agrupados) en un trabajo en segundo plano y lo retorna.
+
+    No aplica la cuota diaria: quien llama ya decidió qué clientes caben.
+    Con `lote` (bitacora.LoteBitacora) los resultados se anotan en ese lote
+    en lugar de abrir uno nuevo.
+    """
+    inicializar()
+    return trabajos_envio.iniciar(len(clientes), lambda trabajo: _ejecutar_trabajo_envio(trabajo, clientes, lote))
+
+
+def _guardar_diferidos(cuenta, clientes):
+    """
+    Anota en la bitácora los clientes que la cuota deja en cola (un lote de
+    filas 'diferido') y retorna (lote, posición) de cada uno.
+    """
+    lote = bitacora.abrir_lote(f"diferido-{uuid.uuid4().hex[:12]}", clientes, _preparar_destinatarios,
+                               serializar=cliente_plano, estado="diferido")
+    log.info("Correos en cola guardados en la bitácora", cuenta=cuenta, lote=lote.id, correos=len(clientes))
+    return [(lote.id, posicion) for posicion in lote.posiciones]
+
+
+def _despachar_diferidos(cuenta, clientes, referencias):
+    """
+    Envía los clientes que salen de la cola (nueva ventana de cuota o
+    reinicio): un trabajo por lote de la bitácora, que anota los resultados
+    en las mismas filas.
+    """
+    grupos = {}
+    for cliente, referencia in zip(clientes, referencias):
+        lote_id, posicion = referencia if referencia is not None else (None, None)
+        posiciones, grupo = grupos.setdefault(lote_id, ([], []))
+        posiciones.append(posicion)
+        grupo.append(cliente)
+
+    for lote_id, (posiciones, grupo) in grupos.items():
+        lote = None
+        if lote_id is not None and bitacora is not None:
+            bitacora.sacar_de_cola(lote_id, posiciones)
+            lote = LoteBitacora(bitacora, lote_id, posiciones)
+        trabajo = iniciar_envio(grupo, lote)
+        log.info("Envío diferido", cuenta=cuenta, trabajo=trabajo.id, lote=lote_id, correos=len(grupo))
+
+
+# Envíos en segundo plano (/enviar-correos retorna el id del trabajo de inmediato)
+trabajos_envio = RegistroTrabajos()
+
+# Cuota de la cuenta remitente: lo que no cabe hoy queda en cola (por
+# prioridad), guardada en la bitácora si está activa (inicializar())
+planificador = None
+cuota_envio = None
+
+_inicializado = False
+_lock_inicializar = RLock()
+
+
+def inicializar():
+    """
+    Crea los recursos del envío: pool SMTP, preparador de correos, cola de
+    reintentos, bitácora y planificador con la cuota de la cuenta.
+
+    Con bitácora, la cuota del día arranca con lo que ya tiene enviado hoy
+    y la cola que quedó guardada vuelve al planificador. Solo la primera
+    llamada hace algo; las funciones de envío la llaman por si nadie lo
+    hizo. Quien reemplace alguno de estos recursos (pruebas, benchmarks)
+    debe llamarla antes.
+    """
+    global pool_smtp, preparador_correos, cola_reintentos, bitacora, planificador, cuota_envio, _inicializado
+    if _inicializado:
+        return
+    with _lock_inicializar:
+        if _inicializado:
+            return
+
+        pool_smtp = PoolSMTP(
+            EMAIL_HOST,
+            EMAIL_PORT,
+            usuario=EMAIL_USER,
+            password=EMAIL_PASSWORD,
+            usar_tls=EMAIL_USE_TLS,
+            max_conexiones=SMTP_POOL_CONEXIONES,
+            max_mensajes=SMTP_MENSAJES_POR_CONEXION,
+            max_inactividad=SMTP_MAX_INACTIVIDAD
+        )
+        atexit.register(pool_smtp.cerrar)
+
+        preparador_correos = PreparadorProcesos(
+            PREPARACION_PROCESOS,
+            tamano_lote=PREPARACION_LOTE,
+            max_lotes=PREPARACION_LOTES_PENDIENTES
+        )
+        atexit.register(preparador_correos.cerrar)
+
+        cola_reintentos = ColaReintentos(max_hilos=REINTENTOS_HILOS)
+        atexit.register(cola_reintentos.cerrar)
+
+        if BITACORA_ENVIOS:
+            bitacora = BitacoraEnvios(BITACORA_ENVIOS)
+            atexit.register(bitacora.cerrar)
+
+        planificador = PlanificadorEnvios(
+            despachar=_despachar_diferidos,
+            diferir=_guardar_diferidos if bitacora is not None else None
+        )
+        cuota_envio = planificador.registrar_cuenta(
+            CuotaCuenta(EMAIL_USER, por_segundo=CUOTA_POR_SEGUNDO, por_dia=CUOTA_DIARIA)
+        )
+        # Desde aquí los recursos existen: los envíos que despache la cola
+        # restaurada (que vuelven a llamar inicializar()) no esperan
+        _inicializado = True
+
+        if bitacora is not None:
+            # Lo que la bitácora ya registró como enviado hoy (una corrida
+            # anterior, o este servidor antes de reiniciarse) cuenta para la
+            # cuota del día
+            if CUOTA_DIARIA > 0:
+                cuota_envio.consumir(bitacora.enviados_del_dia(date.today()))
+            # Y la cola que quedó guardada vuelve al planificador
+            diferidos = bitacora.diferidos()
+            if diferidos:
+                planificador.restaurar(
+                    EMAIL_USER,
+                    [cliente for _, _, cliente in diferidos],
+                    [(lote_id, posicion) for lote_id, posicion, _ in diferidos]
+                )
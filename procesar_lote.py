@@ -0,0 +1,231 @@
+"""
+Procesamiento y envío de los recordatorios desde la línea de comandos.
+
+Hace lo mismo que "Analizar" + "Enviar" en el navegador, con las mismas
+funciones (procesamiento.py): detecta cuál Excel es el listado de clientes
+y cuál la cartera, empareja, agrupa por cliente y envía un correo por
+cliente con el pool SMTP, los reintentos, la cuota y la bitácora. No
+importa Flask ni abre el navegador, así que sirve para tareas programadas.
+
+Uso (desde la raíz del proyecto):
+    python procesar_lote.py clientes.xlsx cartera.xlsx [--simular] [--concurrencia N]
+                            [--por-segundo N] [--cuota-diaria N] [--reporte resultados.json]
+
+El resultado (resumen y un resultado por cliente) es un JSON en --reporte o
+en la salida estándar; el progreso y el registro van a stderr. Ctrl+C
+cancela el envío: los correos en vuelo terminan y el resto queda pendiente
+en la bitácora (POST /bitacora/<lote>/reanudar lo retoma).
+
+Código de salida:
+    0  todos los correos enviados (con --simular: todos se podrían enviar)
+    1  hubo correos fallidos o cancelados (con --simular: destinatarios inválidos)
+    2  error en los argumentos, los archivos o la configuración SMTP
+    3  sin fallos, pero quedaron clientes sin enviar por la cuota diaria
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import registro
+from planificador import prioridad_cliente
+
+log = registro.obtener(__name__)
+
+SALIDA_OK = 0
+SALIDA_FALLIDOS = 1
+SALIDA_ERROR = 2
+SALIDA_SIN_CUPO = 3
+
+
+def _argumentos(args=None):
+    parser = argparse.ArgumentParser(
+        description="Procesa los dos Excel y envía los recordatorios de pago sin el servidor web.",
+        epilog="Las opciones que no se pasan se toman del archivo .env (ver README)."
+    )
+    parser.add_argument("archivos", nargs=2, metavar="EXCEL",
+                        help="listado de clientes y cartera por edades (en cualquier orden)")
+    parser.add_argument("--simular", action="store_true",
+                        help="genera los correos y reporta a quién se enviarían, sin conectarse al SMTP")
+    parser.add_argument("--concurrencia", type=int, metavar="N",
+                        help="envíos simultáneos (MAX_WORKERS, o ENVIO_ASYNC_CONEXIONES con ENVIO_ASYNC)")
+    parser.add_argument("--por-segundo", type=float, metavar="N",
+                        help="correos por segundo como máximo (CUOTA_POR_SEGUNDO; 0 = sin límite)")
+    parser.add_argument("--cuota-diaria", type=int, metavar="N",
+                        help="correos por día como máximo, contando los que la bitácora ya tiene "
+                             "enviados hoy (CUOTA_DIARIA; 0 = sin límite)")
+    parser.add_argument("--reporte", metavar="ARCHIVO", default="-",
+                        help="archivo JSON con el resultado (por defecto la salida estándar)")
+    opciones = parser.parse_args(args)
+
+    for ruta in opciones.archivos:
+        if not os.path.isfile(ruta):
+            parser.error(f"no existe el archivo: {ruta}")
+    if opciones.concurrencia is not None and opciones.concurrencia < 1:
+        parser.error("--concurrencia debe ser al menos 1")
+    return opciones
+
+
+def _configurar_entorno(opciones):
+    """Las opciones se pasan como variables de entorno: load_dotenv() no pisa las que ya existen."""
+    if opciones.concurrencia is not None:
+        os.environ["MAX_WORKERS"] = str(opciones.concurrencia)
+        os.environ["ENVIO_ASYNC_CONEXIONES"] = str(opciones.concurrencia)
+    if opciones.por_segundo is not None:
+        os.environ["CUOTA_POR_SEGUNDO"] = str(opciones.por_segundo)
+    if opciones.cuota_diaria is not None:
+        os.environ["CUOTA_DIARIA"] = str(opciones.cuota_diaria)
+
+
+def _avisar(texto):
+    print(texto, file=sys.stderr, flush=True)
+
+
+def _simular(procesamiento, clientes):
+    """Resultado por cliente de generar su correo, sin enviarlo."""
+    resultados = []
+    for cliente in clientes:
+        destinatario, cc, asunto, cuerpo_html, cuerpo_texto = procesamiento.preparar_correo_agrupado(cliente)
+        error = procesamiento.validar_destinatario(destinatario)
+        resultado = procesamiento.resultado_cliente(cliente, destinatario, error is None, error, intentos=0)
+        resultado["destinatario_cc"] = cc
+        resultado["asunto"] = asunto
+        if error is None:
+            mensaje = procesamiento.crear_mensaje_email(destinatario, cc, asunto, cuerpo_html, cuerpo_texto)
+            resultado["bytes"] = len(mensaje.as_bytes())
+        resultados.append(resultado)
+    return resultados
+
+
+def _esperar(trabajo):
+    """Muestra el progreso del trabajo en stderr hasta que termina; Ctrl+C lo cancela."""
+    procesados = 0
+    while True:
+        try:
+            for tipo, _, datos in trabajo.eventos(desde=procesados, espera_maxima=1):
+                if tipo != "resultado":
+                    continue
+                procesados += 1
+                marca = "ok" if datos["success"] else f"ERROR: {datos['error']}"
+                _avisar(f"[{procesados}/{trabajo.total}] {datos['cliente']} <{datos['destinatario']}> {marca}")
+            return
+        except KeyboardInterrupt:
+            if trabajo.cancelado:
+                raise
+            _avisar("Cancelando: los correos en vuelo terminan y el resto queda pendiente en la bitácora "
+                    "(Ctrl+C otra vez para salir ya)")
+            trabajo.cancelar()
+
+
+def _enviar(procesamiento, clientes):
+    """
+    Envía a los clientes que caben en la cuota diaria (vencidas primero) y
+    retorna (resumen del trabajo, resultados, clientes sin cupo).
+    """
+    # Pool SMTP, bitácora y cuota (con lo ya enviado hoy); --simular no
+    # pasa por aquí y no los crea
+    procesamiento.inicializar()
+
+    # Como planificador.planificar, pero lo que no cabe no queda en cola:
+    # este proceso termina al final del envío
+    ordenados = sorted(clientes, key=prioridad_cliente)
+    disponibles = procesamiento.cuota_envio.disponibles_hoy()
+    admitidos = ordenados if disponibles is None else ordenados[:disponibles]
+    sin_cupo = ordenados[len(admitidos):]
+    procesamiento.cuota_envio.consumir(len(admitidos))
+
+    log.info("Iniciando envío de correos unificados", correos=len(admitidos), sin_cupo=len(sin_cupo))
+    trabajo = procesamiento.iniciar_envio(admitidos)
+    _esperar(trabajo)
+
+    return trabajo.resumen(), list(trabajo.resultados), sin_cupo
+
+
+def main(args=None):
+    opciones = _argumentos(args)
+    _configurar_entorno(opciones)
+
+    # Se importa después de fijar el entorno (la configuración se lee al importar)
+    import procesamiento
+
+    # La salida estándar queda para el reporte JSON
+    registro.configurar(procesamiento.LOG_NIVEL, procesamiento.LOG_FORMATO, procesamiento.LOG_MUESTRA,
+                        destino=sys.stderr)
+
+    if not opciones.simular and (not procesamiento.EMAIL_USER or not procesamiento.EMAIL_PASSWORD):
+        _avisar("Credenciales de correo no configuradas: define EMAIL_USER y EMAIL_PASSWORD en el archivo .env "
+                "(o usa --simular)")
+        return SALIDA_ERROR
+
+    inicio = time.perf_counter()
+    ruta1, ruta2 = opciones.archivos
+    try:
+        with open(ruta1, "rb") as archivo1, open(ruta2, "rb") as archivo2:
+            resultado = procesamiento.procesar_archivos(archivo1.read(), archivo2.read())
+    except procesamiento.TiposNoDetectados as e:
+        _avisar(str(e))
+        return SALIDA_ERROR
+    except Exception:
+        log.exception("Error al procesar Excel")
+        return SALIDA_ERROR
+
+    recordatorios = resultado["recordatorios"]
+    clientes = procesamiento.agrupar_recordatorios_por_cliente(recordatorios) if recordatorios else []
+
+    reporte = {
+        "success": True,
+        "simulacion": opciones.simular,
+        "archivos": [os.path.abspath(ruta) for ruta in opciones.archivos],
+        "stats": {
+            "facturas": len(recordatorios),
+            "clientes": len(clientes),
+            "vencidas": sum(c["total_vencidas"] for c in clientes),
+            "proximas": sum(c["total_proximas"] for c in clientes),
+            "no_vencidas": sum(c["total_no_vencidas"] for c in clientes)
+        },
+        "reporte_clientes": resultado["reporte_clientes"],
+        "reporte_emparejamiento": resultado["reporte_emparejamiento"],
+        "contadores": resultado["contadores"],
+        "tiempos_ms": resultado["tiempos_ms"]
+    }
+
+    if opciones.simular:
+        resultados = _simular(procesamiento, clientes)
+        fallidos = sum(1 for r in resultados if not r["success"])
+        reporte["envio"] = {"total": len(resultados), "validos": len(resultados) - fallidos, "invalidos": fallidos}
+        sin_cupo = []
+        salida = SALIDA_FALLIDOS if fallidos else SALIDA_OK
+    else:
+        resumen, resultados, sin_cupo = _enviar(procesamiento, clientes)
+        resumen["sin_cupo"] = len(sin_cupo)
+        reporte["envio"] = resumen
+        if resumen["fallidos"] or resumen["estado"] != "completado":
+            salida = SALIDA_FALLIDOS
+        elif sin_cupo:
+            salida = SALIDA_SIN_CUPO
+        else:
+            salida = SALIDA_OK
+
+    reporte["success"] = salida == SALIDA_OK
+    reporte["resultados"] = resultados
+    reporte["sin_cupo"] = [
+        {"cliente": c.get("cliente"), "destinatario": c.get("correo_cliente"), "vencidas": c.get("total_vencidas", 0)}
+        for c in sin_cupo
+    ]
+    reporte["duracion_s"] = round(time.perf_counter() - inicio, 2)
+
+    if opciones.reporte == "-":
+        json.dump(reporte, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(opciones.reporte, "w", encoding="utf-8") as salida_reporte:
+            json.dump(reporte, salida_reporte, ensure_ascii=False, indent=2)
+        _avisar(f"Reporte guardado en {opciones.reporte}")
+
+    return salida
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Registro (logging) estructurado y asíncrono.
+
+- Cada evento es una línea JSON con "ts", "nivel", "origen", "evento" y los
+  campos que se pasen como argumentos con nombre:
+
+      log = registro.obtener(__name__)
+      log.info("Excel 2 procesado", recordatorios=20314, sin_cliente=8493)
+
+  Con LOG_FORMATO=texto se escribe "[INFO] evento campo=valor ..." para
+  leer en consola.
+- Los hilos de las peticiones solo encolan el evento (QueueHandler); un
+  hilo aparte (QueueListener) lo formatea y lo escribe, así escribir en
+  stdout nunca frena una petición.
+- Niveles: INFO para contadores agregados; el detalle por fila va en DEBUG
+  y muestreado (las primeras `LOG_MUESTRA` filas, ver muestra()).
+"""
+
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime
+
+
+# Argumentos propios de Logger.log; el resto son campos del evento
+_ARGUMENTOS_LOGGING = ("exc_info", "stack_info", "stacklevel", "extra")
+
+_listener = None
+_muestra = 20
+
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por evento."""
+
+    def format(self, record):
+        datos = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "origen": record.name,
+            "evento": record.getMessage()
+        }
+        datos.update(getattr(record, "campos", {}))
+        if record.exc_info:
+            datos["error"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FormateadorTexto(logging.Formatter):
+    """[NIVEL] evento campo=valor ... (para consola)."""
+
+    def format(self, record):
+        campos = " ".join(f"{clave}={valor}" for clave, valor in getattr(record, "campos", {}).items())
+        linea = f"[{record.levelname}] {record.getMessage()}" + (f" {campos}" if campos else "")
+        if record.exc_info:
+            linea += "\n" + self.formatException(record.exc_info)
+        return linea
+
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    """
+    Encola el evento sin formatearlo: la cola es del mismo proceso, así que
+    la excepción (si hay) viaja tal cual y la formatea el hilo escritor.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class RegistroEstructurado(logging.LoggerAdapter):
+    """Logger que recibe los campos del evento como argumentos con nombre."""
+
+    def process(self, msg, kwargs):
+        campos = {clave: kwargs.pop(clave) for clave in list(kwargs) if clave not in _ARGUMENTOS_LOGGING}
+        kwargs["extra"] = {**kwargs.get("extra", {}), "campos": campos}
+        return msg, kwargs
+
+    def muestra(self, filas):
+        """Las primeras filas de `filas` si DEBUG está activo (si no, ninguna)."""
+        if not self.isEnabledFor(logging.DEBUG):
+            return []
+        return itertools.islice(filas, _muestra)
+
+
+def obtener(nombre):
+    """Logger estructurado `nombre` (normalmente __name__)."""
+    return RegistroEstructurado(logging.getLogger(nombre), {})
+
+
+def configurar(nivel="INFO", formato="json", muestra=20, destino=None):
+    """
+    Configura el logger raíz: nivel, formato ("json" o "texto") y filas de
+    detalle por evento en DEBUG. Los eventos se escriben en `destino`
+    (stdout por defecto) desde un hilo aparte. Se puede volver a llamar.
+    """
+    global _listener, _muestra
+
+    _muestra = max(0, int(muestra))
+    salida = logging.StreamHandler(destino or sys.stdout)
+    salida.setFormatter(FormateadorTexto() if formato == "texto" else FormateadorJSON())
+
+    raiz = logging.getLogger()
+    detener()
+    for handler in list(raiz.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            raiz.removeHandler(handler)
+
+    cola = queue.SimpleQueue()
+    raiz.addHandler(_ManejadorCola(cola))
+    raiz.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+
+
+def detener():
+    """Escribe lo que quede en la cola y detiene el hilo escritor."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(detener)
@@ -0,0 +1,144 @@
+"""
+Reintentos de envíos con error transitorio.
+
+- es_error_transitorio(): separa errores que vale la pena reintentar
+  (respuestas SMTP 4xx, conexiones caídas, timeouts) de los permanentes
+  (5xx, autenticación, destinatario inválido).
+- PoliticaReintentos: backoff exponencial con jitter completo.
+- ColaReintentos: reintentos programados que corren en sus propios hilos,
+  así los correos nuevos no esperan detrás de los que están en backoff.
+- ReintentosCorrida: presupuesto de reintentos de una corrida de envío y
+  espera hasta que se resuelvan todos sus reintentos pendientes.
+"""
+
+import heapq
+import itertools
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import registro
+
+log = registro.obtener(__name__)
+
+
+def _codigo_smtp(error):
+    codigo = getattr(error, "smtp_code", None)
+    if codigo is None:
+        codigo = getattr(error, "code", None)
+    return codigo if isinstance(codigo, int) else None
+
+
+def es_error_transitorio(error):
+    """True si el error de envío es temporal (conviene reintentar más tarde)."""
+    codigo = _codigo_smtp(error)
+    if codigo:
+        return 400 <= codigo < 500
+
+    # Destinatarios rechazados: transitorio solo si TODOS los rechazos son 4xx
+    rechazos = getattr(error, "recipients", None)
+    if isinstance(rechazos, dict) and rechazos:
+        return all(400 <= respuesta[0] < 500 for respuesta in rechazos.values())
+    if isinstance(rechazos, list) and rechazos:
+        return all(_codigo_smtp(r) and 400 <= _codigo_smtp(r) < 500 for r in rechazos)
+
+    return isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError))
+
+
+class PoliticaReintentos:
+    """Hasta `max_intentos` reintentos con espera aleatoria en [0, min(maximo, base * 2^(n-1))]."""
+
+    def __init__(self, max_intentos=3, base=2.0, maximo=60.0):
+        self.max_intentos = max(0, int(max_intentos))
+        self.base = float(base)
+        self.maximo = float(maximo)
+
+    def espera(self, intento):
+        return random.uniform(0, min(self.maximo, self.base * 2 ** (intento - 1)))
+
+
+class ColaReintentos:
+    """Ejecuta funciones después de una espera, en un pool de hilos propio."""
+
+    def __init__(self, max_hilos=2):
+        self._pendientes = []
+        self._secuencia = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_hilos)), thread_name_prefix="reintento")
+        self._cerrada = False
+        threading.Thread(target=self._despachar, name="cola-reintentos", daemon=True).start()
+
+    def programar(self, espera, funcion):
+        with self._cond:
+            heapq.heappush(self._pendientes, (time.monotonic() + espera, next(self._secuencia), funcion))
+            self._cond.notify()
+
+    def _despachar(self):
+        while True:
+            with self._cond:
+                while not self._cerrada and (not self._pendientes or self._pendientes[0][0] > time.monotonic()):
+                    espera = self._pendientes[0][0] - time.monotonic() if self._pendientes else None
+                    self._cond.wait(espera)
+                if self._cerrada:
+                    return
+                _, _, funcion = heapq.heappop(self._pendientes)
+            self._executor.submit(funcion)
+
+    def cerrar(self):
+        with self._cond:
+            self._cerrada = True
+            self._cond.notify()
+        self._executor.shutdown(wait=False)
+
+
+class ReintentosCorrida:
+    """Reintentos de una corrida de envío con presupuesto acotado."""
+
+    def __init__(self, cola, politica, presupuesto):
+        self.cola = cola
+        self.politica = politica
+        self.presupuesto = max(0, int(presupuesto))
+        self.usados = 0
+        self._en_curso = 0
+        self._cond = threading.Condition()
+
+    def programar(self, intento, funcion, al_fallar=None):
+        """
+        Agenda `funcion()` como el reintento número `intento`.
+
+        Si `funcion()` lanza una excepción se llama `al_fallar(error)`, para
+        que el reintento deje su resultado final igual que cuando termina.
+        Retorna False (sin agendar) si se pasó del máximo de reintentos por
+        correo o si la corrida ya gastó su presupuesto.
+        """
+        with self._cond:
+            if intento > self.politica.max_intentos or self.usados >= self.presupuesto:
+                return False
+            self.usados += 1
+            self._en_curso += 1
+
+        def _ejecutar():
+            try:
+                funcion()
+            except Exception as error:
+                log.exception("Reintento fallido inesperadamente")
+                if al_fallar is not None:
+                    try:
+                        al_fallar(error)
+                    except Exception:
+                        log.exception("No se pudo registrar el reintento fallido")
+            finally:
+                with self._cond:
+                    self._en_curso -= 1
+                    self._cond.notify_all()
+
+        self.cola.programar(self.politica.espera(intento), _ejecutar)
+        return True
+
+    def esperar(self):
+        """Bloquea hasta que no quede ningún reintento pendiente de esta corrida."""
+        with self._cond:
+            while self._en_curso:
+                self._cond.wait()
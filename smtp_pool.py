@@ -0,0 +1,180 @@
+"""
+Pool de conexiones SMTP autenticadas.
+
+Abrir una conexión por correo implica EHLO + STARTTLS + EHLO + LOGIN en cada
+envío. El pool reutiliza conexiones ya autenticadas entre los hilos de envío:
+
+- Máximo `max_conexiones` conexiones simultáneas (los hilos extra esperan).
+- Cada conexión se cierra tras `max_mensajes` correos (límite típico de los
+  proveedores por sesión) o si estuvo inactiva más de `max_inactividad` s.
+- Si el servidor corta la sesión o responde 421, se descarta la conexión y
+  se reintenta UNA vez con una conexión nueva.
+
+Las duraciones de la conexión (hasta LOGIN) y de cada sendmail (MAIL FROM,
+RCPT TO y DATA) van al histograma cartera_smtp_segundos (metricas.py).
+"""
+
+import queue
+import smtplib
+import threading
+import time
+
+import metricas
+
+
+# Errores en los que el servidor rechazó el mensaje pero la sesión sigue viva
+RECHAZOS_SMTP = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+
+SEGUNDOS_SMTP = metricas.histograma(
+    "cartera_smtp_segundos",
+    "Duración de las fases SMTP: conexion (hasta LOGIN) y envio (MAIL FROM, RCPT TO, DATA)",
+    ("fase", "motor")
+)
+
+
+def es_error_reconectable(error):
+    """True si el error indica una sesión caída (conviene reconectar y reintentar)."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError)):
+        return True
+    return getattr(error, "smtp_code", None) == 421
+
+
+class _ConexionSMTP:
+    """Conexión abierta del pool con sus contadores."""
+
+    __slots__ = ("smtp", "mensajes", "ultimo_uso")
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.mensajes = 0
+        self.ultimo_uso = time.monotonic()
+
+
+class PoolSMTP:
+    """Pool de conexiones SMTP compartido entre hilos."""
+
+    def __init__(self, host, port, usuario=None, password=None, usar_tls=True,
+                 max_conexiones=3, max_mensajes=100, max_inactividad=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.usuario = usuario
+        self.password = password
+        self.usar_tls = usar_tls
+        self.max_conexiones = max(1, int(max_conexiones))
+        self.max_mensajes = max(1, int(max_mensajes))
+        self.max_inactividad = max_inactividad
+        self.timeout = timeout
+
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(self.max_conexiones)
+        self._lock = threading.Lock()
+        self._stats = {
+            "conexiones_abiertas": 0,
+            "conexiones_cerradas": 0,
+            "reconexiones": 0,
+            "mensajes": 0
+        }
+
+    def _contar(self, clave, cantidad=1):
+        with self._lock:
+            self._stats[clave] += cantidad
+
+    def _conectar(self):
+        """Abre y autentica una conexión nueva (EHLO, STARTTLS, EHLO, LOGIN)."""
+        with SEGUNDOS_SMTP.cronometrar(fase="conexion", motor="hilos"):
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                smtp.ehlo()
+                if self.usar_tls:
+                    smtp.starttls()
+                    smtp.ehlo()
+                if self.usuario and self.password:
+                    smtp.login(self.usuario, self.password)
+            except Exception:
+                self._cerrar_smtp(smtp)
+                raise
+
+        self._contar("conexiones_abiertas")
+        return _ConexionSMTP(smtp)
+
+    @staticmethod
+    def _cerrar_smtp(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _descartar(self, conexion):
+        self._cerrar_smtp(conexion.smtp)
+        self._contar("conexiones_cerradas")
+
+    def _tomar(self):
+        """Retorna una conexión libre y vigente, o abre una nueva."""
+        while True:
+            try:
+                conexion = self._libres.get_nowait()
+            except queue.Empty:
+                return self._conectar()
+
+            if time.monotonic() - conexion.ultimo_uso > self.max_inactividad:
+                self._descartar(conexion)
+                continue
+            return conexion
+
+    def _devolver(self, conexion):
+        conexion.mensajes += 1
+        conexion.ultimo_uso = time.monotonic()
+        if conexion.mensajes >= self.max_mensajes:
+            self._descartar(conexion)
+        else:
+            self._libres.put(conexion)
+
+    def enviar(self, remitente, destinatarios, mensaje):
+        """
+        Envía un mensaje ya serializado usando una conexión del pool.
+
+        Retorna el dict de destinatarios rechazados de sendmail (vacío si todos
+        se aceptaron). Propaga las excepciones SMTP que no se resuelven
+        reconectando.
+        """
+        with self._cupos:
+            for intento in (1, 2):
+                conexion = self._tomar() if intento == 1 else self._conectar()
+                try:
+                    with SEGUNDOS_SMTP.cronometrar(fase="envio", motor="hilos"):
+                        rechazados = conexion.smtp.sendmail(remitente, destinatarios, mensaje)
+                except Exception as e:
+                    if es_error_reconectable(e) or not isinstance(e, RECHAZOS_SMTP):
+                        self._descartar(conexion)
+                    else:
+                        # Rechazo del mensaje: smtplib ya hizo RSET, la sesión sigue sirviendo
+                        self._devolver(conexion)
+                    if intento == 1 and es_error_reconectable(e):
+                        self._contar("reconexiones")
+                        continue
+                    raise
+
+                self._devolver(conexion)
+                self._contar("mensajes")
+                return rechazados
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres."""
+        while True:
+            try:
+                conexion = self._libres.get_nowait()
+            except queue.Empty:
+                return
+            self._descartar(conexion)
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["conexiones_libres"] = self._libres.qsize()
+        stats["max_conexiones"] = self.max_conexiones
+        stats["max_mensajes_por_conexion"] = self.max_mensajes
+        return stats
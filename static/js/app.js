@@ -6,6 +6,7 @@ let file1Obj = null;
 let file2Obj = null;
 let recordatoriosGlobal = [];
 let clientesAgrupados = [];
+let corridaIdGlobal = null;
 
 // ==========================================
 // UTILIDADES
@@ -122,78 +123,99 @@ function checkFilesReady() {
 }
 
 // ==========================================
-// AGRUPAR POR CLIENTE (UNIFICADO)
+// FORMATO COLUMNAR DE /procesar-excel
 // ==========================================
 
-function agruparPorCliente(recordatorios) {
-    const agrupados = {};
-
-    recordatorios.forEach(r => {
-        const email = r.correo_cliente;
-        const cliente = r.cliente;
-        const estado = r.estado;
-
-        // KEY única: cliente + email
-        const key = `${cliente}|${email}`;
-
-        if (!agrupados[key]) {
-            agrupados[key] = {
-                cliente: cliente,
-                correo_cliente: email,
-                vendedor: r.vendedor,
-                correo_vendedor: r.correo_vendedor,
-                local: r.local,
-                facturas_vencidas: [],
-                facturas_proximas: [],
-                facturas_no_vencidas: [],
-                total_facturas: 0,
-                total_vencidas: 0,
-                total_proximas: 0,
-                total_no_vencidas: 0,
-                total_saldo: 0,
-                cupo: r.cupo || 0,
-                cupo_disponible: 0
-            };
-        }
+const FORMATO_SALDO = new Intl.NumberFormat("en-US", { maximumFractionDigits: 0 });
 
-        // Clasificar factura según estado
-        const factura = {
-            numero_factura: r.numero_factura,
-            fecha_emision: r.fecha_emision,
-            fecha_vencimiento: r.fecha_vencimiento,
-            dias: r.dias,
-            saldo: r.saldo,
-            saldo_numerico: r.saldo_numerico,
-            estado: r.estado,
-            correo_cliente: r.correo_cliente,
-            correo_vendedor: r.correo_vendedor,
-            local: r.local
+// Mismo texto que f"${valor:,.0f}" en Python (redondeo al par en los .5)
+function formatearSaldo(valor) {
+    const numero = Number(valor) || 0;
+    let entero = Math.round(numero);
+    if (Math.abs(numero % 1) === 0.5 && entero % 2 !== 0) {
+        entero -= 1;
+    }
+    return "$" + FORMATO_SALDO.format(entero);
+}
+
+// La agrupación por cliente + email la hace el servidor una sola vez; cada
+// grupo llega con su resumen (totales y subtotales por estado) y aquí solo
+// se le cuelgan las referencias a sus facturas.
+const CAMPOS_GRUPO = [
+    "cliente", "correo_cliente", "vendedor", "correo_vendedor", "local",
+    "total_facturas", "total_vencidas", "total_proximas", "total_no_vencidas",
+    "subtotal_vencidas", "subtotal_proximas", "subtotal_no_vencidas",
+    "total_saldo", "cupo", "cupo_disponible"
+];
+
+function agregarPaginaColumnar(pagina, clientesPorId, gruposPorId, recordatorios) {
+    const clientes = pagina.clientes;
+    clientes.id.forEach((id, i) => {
+        clientesPorId[id] = {
+            cliente: clientes.cliente[i],
+            correo_cliente: clientes.correo_cliente[i],
+            vendedor: clientes.vendedor[i],
+            correo_vendedor: clientes.correo_vendedor[i],
+            local: clientes.local[i],
+            cupo: clientes.cupo[i]
         };
+    });
 
-        if (estado === 'vencido') {
-            agrupados[key].facturas_vencidas.push(factura);
-            agrupados[key].total_vencidas += 1;
-        } else if (estado === 'proximo') {
-            agrupados[key].facturas_proximas.push(factura);
-            agrupados[key].total_proximas += 1;
-        } else if (estado === 'no_vencido') {
-            agrupados[key].facturas_no_vencidas.push(factura);
-            agrupados[key].total_no_vencidas += 1;
+    const grupos = pagina.grupos;
+    grupos.id.forEach((id, i) => {
+        if (!gruposPorId.has(id)) {
+            const grupo = { id: id, facturas: [] };
+            CAMPOS_GRUPO.forEach(campo => { grupo[campo] = grupos[campo][i]; });
+            gruposPorId.set(id, grupo);
         }
-
-        agrupados[key].total_facturas += 1;
-        agrupados[key].total_saldo += r.saldo_numerico || 0;
     });
 
-    // Calcular cupo_disponible para cada cliente
-    Object.values(agrupados).forEach(cliente => {
-        cliente.cupo_disponible = cliente.cupo - cliente.total_saldo;
-    });
+    const facturas = pagina.facturas;
+    for (let i = 0; i < facturas.cliente.length; i++) {
+        const cliente = clientesPorId[facturas.cliente[i]];
+        const recordatorio = {
+            cliente: cliente.cliente,
+            correo_cliente: cliente.correo_cliente,
+            vendedor: cliente.vendedor,
+            correo_vendedor: cliente.correo_vendedor,
+            local: cliente.local,
+            cupo: cliente.cupo,
+            numero_factura: facturas.numero_factura[i],
+            fecha_emision: facturas.fecha_emision[i],
+            fecha_vencimiento: facturas.fecha_vencimiento[i],
+            dias: facturas.dias[i],
+            saldo: formatearSaldo(facturas.saldo_numerico[i]),
+            saldo_numerico: facturas.saldo_numerico[i],
+            estado: pagina.estados[facturas.estado[i]]
+        };
+        recordatorios.push(recordatorio);
+        gruposPorId.get(facturas.grupo[i]).facturas.push(recordatorio);
+    }
+}
 
-    return Object.values(agrupados).sort((a, b) => {
-        // Ordenar por total de vencidas (descendente)
-        return b.total_vencidas - a.total_vencidas;
-    });
+// Une todas las páginas de la corrida: recordatorios de siempre y clientes
+// agrupados (ordenados por total de vencidas, descendente)
+async function cargarCorridaColumnar(primeraPagina) {
+    const recordatorios = [];
+    const clientesPorId = {};
+    const gruposPorId = new Map();
+    agregarPaginaColumnar(primeraPagina, clientesPorId, gruposPorId, recordatorios);
+
+    const { total_paginas, por_pagina } = primeraPagina.pagina;
+    for (let numero = 2; numero <= total_paginas; numero++) {
+        const response = await fetch(
+            `/corridas/${primeraPagina.corrida_id}/facturas?pagina=${numero}&por_pagina=${por_pagina}`
+        );
+        const pagina = await response.json();
+        if (!response.ok || !pagina.success) {
+            throw new Error(pagina.message || "Error al cargar las facturas");
+        }
+        agregarPaginaColumnar(pagina, clientesPorId, gruposPorId, recordatorios);
+    }
+
+    const clientes = Array.from(gruposPorId.values())
+        .sort((a, b) => b.total_vencidas - a.total_vencidas || a.id - b.id);
+    return { recordatorios, clientes };
 }
 
 // ==========================================
@@ -210,7 +232,7 @@ async function analizarArchivos() {
         formData.append("file1", file1Obj);
         formData.append("file2", file2Obj);
 
-        const response = await fetch("/procesar-excel", {
+        const response = await fetch("/procesar-excel?formato=columnar", {
             method: "POST",
             body: formData
         });
@@ -226,7 +248,12 @@ async function analizarArchivos() {
             throw new Error(resultado.message || "Error desconocido");
         }
 
-        recordatoriosGlobal = resultado.recordatorios || [];
+        const corrida = resultado.formato === "columnar"
+            ? await cargarCorridaColumnar(resultado)
+            : { recordatorios: [], clientes: [] };
+        recordatoriosGlobal = corrida.recordatorios;
+        clientesAgrupados = corrida.clientes;
+        corridaIdGlobal = resultado.corrida_id || null;
 
         if (recordatoriosGlobal.length === 0) {
             alert("No se encontraron facturas con email asignado.");
@@ -235,10 +262,7 @@ async function analizarArchivos() {
             return;
         }
 
-        // Agrupar clientes de forma unificada
-        clientesAgrupados = agruparPorCliente(recordatoriosGlobal);
-
-        renderTablaUnificada();
+        inicializarTablaClientes();
         renderEstadisticas(resultado.stats);
 
         document.getElementById("step2").style.display = "block";
@@ -261,31 +285,143 @@ async function analizarArchivos() {
 // RENDER DE TABLA UNIFICADA
 // ==========================================
 
+// Solo las filas visibles (más un margen) existen en el DOM; el resto de la
+// altura la ocupan dos filas espaciadoras. La selección vive en un
+// Uint8Array por índice de cliente con su contador, así marcar una casilla
+// y contar los seleccionados es O(1). Las sub-tablas de facturas se generan
+// solo al expandir un cliente.
+
+const ALTO_FILA_ESTIMADO = 49;
+const FILAS_MARGEN = 10;
+
+let seleccionClientes = new Uint8Array(0);   // 1 = seleccionado, por índice en clientesAgrupados
+let totalSeleccionados = 0;                  // seleccionados entre los filtrados
+let indicesFiltrados = [];                   // índices en clientesAgrupados que pasan el filtro
+let altosClientes = new Float32Array(0);     // alto medido de fila + detalle (0 = sin medir)
+let posicionesFilas = new Float64Array(1);   // posicionesFilas[i] = px sobre la fila filtrada i
+let detallesClientes = new Map();            // índice expandido -> HTML de sus sub-tablas
+let pintadoPendiente = false;
+
+function inicializarTablaClientes() {
+    seleccionClientes = new Uint8Array(clientesAgrupados.length).fill(1);
+    altosClientes = new Float32Array(clientesAgrupados.length);
+    detallesClientes = new Map();
+    document.getElementById("selectAllClientes").checked = true;
+    renderTablaUnificada();
+}
+
 function renderTablaUnificada() {
     const filterValue = document.getElementById("filterClientes").value.toLowerCase();
+
+    indicesFiltrados = [];
+    totalSeleccionados = 0;
+    clientesAgrupados.forEach((cliente, idx) => {
+        if (cliente.cliente.toLowerCase().includes(filterValue)) {
+            indicesFiltrados.push(idx);
+            totalSeleccionados += seleccionClientes[idx];
+        }
+    });
+
+    document.getElementById("countClientesTabla").textContent = indicesFiltrados.length;
+
+    recalcularPosicionesFilas();
+    pintarFilasVisibles();
+    actualizarConteoEnvio();
+}
+
+function altoCliente(idx) {
+    return altosClientes[idx] || ALTO_FILA_ESTIMADO;
+}
+
+function recalcularPosicionesFilas() {
+    posicionesFilas = new Float64Array(indicesFiltrados.length + 1);
+    for (let i = 0; i < indicesFiltrados.length; i++) {
+        posicionesFilas[i + 1] = posicionesFilas[i] + altoCliente(indicesFiltrados[i]);
+    }
+}
+
+// Fila filtrada que ocupa la altura `y` (búsqueda binaria)
+function filaEnPosicion(y) {
+    let bajo = 0;
+    let alto = indicesFiltrados.length - 1;
+    while (bajo < alto) {
+        const medio = (bajo + alto + 1) >> 1;
+        if (posicionesFilas[medio] <= y) {
+            bajo = medio;
+        } else {
+            alto = medio - 1;
+        }
+    }
+    return Math.max(0, bajo);
+}
+
+function filaEspaciadora(alto) {
+    return `<tr class="fila-espaciadora"><td colspan="11" style="height: ${alto}px; padding: 0; border: 0;"></td></tr>`;
+}
+
+function programarPintado() {
+    if (pintadoPendiente) return;
+    pintadoPendiente = true;
+    requestAnimationFrame(() => {
+        pintadoPendiente = false;
+        pintarFilasVisibles();
+    });
+}
+
+function pintarFilasVisibles() {
     const tbody = document.getElementById("tbodyClientes");
-    tbody.innerHTML = '';
+    const contenedor = tbody.closest(".table-container");
+    const total = indicesFiltrados.length;
 
-    const filtrados = clientesAgrupados.filter(c =>
-        c.cliente.toLowerCase().includes(filterValue)
-    );
+    const inicio = Math.max(0, filaEnPosicion(contenedor.scrollTop) - FILAS_MARGEN);
+    const fin = Math.min(total, filaEnPosicion(contenedor.scrollTop + contenedor.clientHeight) + 1 + FILAS_MARGEN);
+
+    let html = filaEspaciadora(posicionesFilas[inicio]);
+    for (let i = inicio; i < fin; i++) {
+        html += filaClienteHtml(indicesFiltrados[i]);
+    }
+    html += filaEspaciadora(posicionesFilas[total] - posicionesFilas[fin]);
+    tbody.innerHTML = html;
+
+    medirFilasPintadas(tbody, fin);
+}
 
-    document.getElementById("countClientesTabla").textContent = filtrados.length;
+// Corrige las alturas estimadas con las reales; solo cambia el espaciador
+// de abajo, así el contenido visible no salta
+function medirFilasPintadas(tbody, fin) {
+    let cambio = false;
+    tbody.querySelectorAll("tr.fila-cliente").forEach(tr => {
+        const idx = Number(tr.dataset.idx);
+        let alto = tr.offsetHeight;
+        if (detallesClientes.has(idx)) {
+            alto += tr.nextElementSibling.offsetHeight;
+        }
+        if (alto && Math.abs(alto - altosClientes[idx]) > 0.5) {
+            altosClientes[idx] = alto;
+            cambio = true;
+        }
+    });
+
+    if (cambio) {
+        recalcularPosicionesFilas();
+        const total = indicesFiltrados.length;
+        tbody.lastElementChild.firstElementChild.style.height = `${posicionesFilas[total] - posicionesFilas[fin]}px`;
+    }
+}
 
-    filtrados.forEach((cliente, idx) => {
-        const uniqueKey = `${cliente.cliente}|${cliente.correo_cliente}`;
+function filaClienteHtml(idx) {
+    const cliente = clientesAgrupados[idx];
+    const expandido = detallesClientes.has(idx);
 
-        // Formatear montos
-        const totalCarteraFormat = `$${cliente.total_saldo.toLocaleString('es-CO', {maximumFractionDigits: 0})}`;
-        const cupoDisponibleFormat = `$${cliente.cupo_disponible.toLocaleString('es-CO', {maximumFractionDigits: 0})}`;
-        const cupoDisponibleColor = cliente.cupo_disponible < 0 ? '#dc2626' : '#10b981';
+    // Formatear montos
+    const totalCarteraFormat = `$${cliente.total_saldo.toLocaleString('es-CO', {maximumFractionDigits: 0})}`;
+    const cupoDisponibleFormat = `$${cliente.cupo_disponible.toLocaleString('es-CO', {maximumFractionDigits: 0})}`;
+    const cupoDisponibleColor = cliente.cupo_disponible < 0 ? '#dc2626' : '#10b981';
 
-        const tr = document.createElement('tr');
-        tr.innerHTML = `
+    let html = `
+        <tr class="fila-cliente" data-idx="${idx}">
             <td>
-                <input type="checkbox" class="check-cliente" value="${uniqueKey}"
-                       data-cliente="${cliente.cliente}"
-                       data-email="${cliente.correo_cliente}" checked>
+                <input type="checkbox" class="check-cliente" data-idx="${idx}" ${seleccionClientes[idx] ? "checked" : ""}>
             </td>
             <td><strong>${cliente.cliente}</strong></td>
             <td>${cliente.correo_cliente}</td>
@@ -298,56 +434,39 @@ function renderTablaUnificada() {
             <td style="text-align: right; font-weight: bold; color: ${cupoDisponibleColor};">${cupoDisponibleFormat}</td>
             <td>
                 <button class="btn-expand" onclick="toggleFacturasCliente(${idx})">
-                    <span id="expand-cliente-${idx}">▼</span> Ver Facturas
+                    <span>${expandido ? "▲" : "▼"}</span> Ver Facturas
                 </button>
             </td>
-        `;
-
-        tbody.appendChild(tr);
-
-        // Fila de detalle con TRES sub-tablas
-        const detailRow = document.createElement('tr');
-        detailRow.id = `detail-cliente-${idx}`;
-        detailRow.style.display = 'none';
-
-        // Generar sub-tabla de vencidas
-        const subTablaVencidas = generarSubTabla(
-            cliente.facturas_vencidas,
-            "VENCIDAS",
-            "#dc2626",
-            "🔴"
-        );
-
-        // Generar sub-tabla de próximas
-        const subTablaProximas = generarSubTabla(
-            cliente.facturas_proximas,
-            "PRÓXIMAS (≤ 5 días)",
-            "#f59e0b",
-            "🟡"
-        );
-
-        // Generar sub-tabla de no vencidas
-        const subTablaNoVencidas = generarSubTabla(
-            cliente.facturas_no_vencidas,
-            "NO VENCIDAS (> 5 días)",
-            "#10b981",
-            "🟢"
-        );
+        </tr>
+    `;
 
-        detailRow.innerHTML = `
-            <td colspan="11" style="padding: 20px; background-color: #f8f9fa;">
-                <div style="display: grid; gap: 20px;">
-                    ${subTablaVencidas}
-                    ${subTablaProximas}
-                    ${subTablaNoVencidas}
-                </div>
-            </td>
+    // Fila de detalle con TRES sub-tablas
+    if (expandido) {
+        html += `
+            <tr class="detalle-cliente">
+                <td colspan="11" style="padding: 20px; background-color: #f8f9fa;">
+                    <div style="display: grid; gap: 20px;">
+                        ${detallesClientes.get(idx)}
+                    </div>
+                </td>
+            </tr>
         `;
+    }
+
+    return html;
+}
 
-        tbody.appendChild(detailRow);
+function detalleClienteHtml(cliente) {
+    const porEstado = { vencido: [], proximo: [], no_vencido: [] };
+    cliente.facturas.forEach(f => {
+        if (porEstado[f.estado]) {
+            porEstado[f.estado].push(f);
+        }
     });
 
-    actualizarConteoEnvio();
+    return generarSubTabla(porEstado.vencido, "VENCIDAS", "#dc2626", "🔴") +
+        generarSubTabla(porEstado.proximo, "PRÓXIMAS (≤ 5 días)", "#f59e0b", "🟡") +
+        generarSubTabla(porEstado.no_vencido, "NO VENCIDAS (> 5 días)", "#10b981", "🟢");
 }
 
 function generarSubTabla(facturas, titulo, colorBg, emoji) {
@@ -387,16 +506,15 @@ function generarSubTabla(facturas, titulo, colorBg, emoji) {
 }
 
 function toggleFacturasCliente(idx) {
-    const detailRow = document.getElementById(`detail-cliente-${idx}`);
-    const expandIcon = document.getElementById(`expand-cliente-${idx}`);
-
-    if (detailRow.style.display === 'none') {
-        detailRow.style.display = 'table-row';
-        expandIcon.textContent = '▲';
+    if (detallesClientes.has(idx)) {
+        detallesClientes.delete(idx);
     } else {
-        detailRow.style.display = 'none';
-        expandIcon.textContent = '▼';
+        detallesClientes.set(idx, detalleClienteHtml(clientesAgrupados[idx]));
     }
+
+    altosClientes[idx] = 0;
+    recalcularPosicionesFilas();
+    pintarFilasVisibles();
 }
 
 function renderEstadisticas(stats) {
@@ -407,8 +525,30 @@ function renderEstadisticas(stats) {
 }
 
 function actualizarConteoEnvio() {
-    const clientesSeleccionados = document.querySelectorAll('.check-cliente:checked').length;
-    document.getElementById("countClientesEnviar").textContent = clientesSeleccionados;
+    document.getElementById("countClientesEnviar").textContent = totalSeleccionados;
+}
+
+function cambiarSeleccionCliente(idx, seleccionado) {
+    const valor = seleccionado ? 1 : 0;
+    if (seleccionClientes[idx] !== valor) {
+        seleccionClientes[idx] = valor;
+        totalSeleccionados += seleccionado ? 1 : -1;
+        actualizarConteoEnvio();
+    }
+}
+
+// "Seleccionar todos" y el envío aplican a los clientes que pasan el filtro
+function seleccionarClientesFiltrados(seleccionado) {
+    indicesFiltrados.forEach(idx => { seleccionClientes[idx] = seleccionado ? 1 : 0; });
+    totalSeleccionados = seleccionado ? indicesFiltrados.length : 0;
+    pintarFilasVisibles();
+    actualizarConteoEnvio();
+}
+
+function clientesSeleccionadosParaEnvio() {
+    return indicesFiltrados
+        .filter(idx => seleccionClientes[idx])
+        .map(idx => clientesAgrupados[idx]);
 }
 
 // ==========================================
@@ -430,20 +570,26 @@ document.addEventListener("DOMContentLoaded", () => {
     const selectAllClientes = document.getElementById("selectAllClientes");
     if (selectAllClientes) {
         selectAllClientes.addEventListener("change", (e) => {
-            document.querySelectorAll('.check-cliente').forEach(cb => cb.checked = e.target.checked);
-            actualizarConteoEnvio();
+            seleccionarClientesFiltrados(e.target.checked);
         });
     }
 
     // Cambio en checkboxes individuales
     document.addEventListener("change", (e) => {
         if (e.target.classList.contains('check-cliente')) {
-            actualizarConteoEnvio();
+            cambiarSeleccionCliente(Number(e.target.dataset.idx), e.target.checked);
         }
     });
 
+    // Tabla virtualizada: al desplazarse se pintan las filas que quedan a la vista
+    const tablaClientes = document.getElementById("tbodyClientes").closest(".table-container");
+    tablaClientes.addEventListener("scroll", programarPintado, { passive: true });
+
     document.getElementById("btnAnalizar").addEventListener("click", analizarArchivos);
     document.getElementById("btnEnviarCorreos").addEventListener("click", enviarCorreos);
+    document.getElementById("btnPausarEnvio").addEventListener("click", pausarOReanudarEnvio);
+    document.getElementById("btnCancelarEnvio").addEventListener("click", cancelarEnvio);
+    document.getElementById("btnReenviarFallidos").addEventListener("click", reenviarFallidos);
 
     console.log("✅ App inicializada");
 });
@@ -453,15 +599,16 @@ document.addEventListener("DOMContentLoaded", () => {
 // ==========================================
 
 async function enviarCorreos() {
-    const checkboxes = document.querySelectorAll('.check-cliente:checked');
+    // Extraer clientes seleccionados
+    const clientesSeleccionados = clientesSeleccionadosParaEnvio();
 
-    if (checkboxes.length === 0) {
+    if (clientesSeleccionados.length === 0) {
         alert("No hay clientes seleccionados");
         return;
     }
 
     const confirmacion = confirm(
-        `¿Enviar ${checkboxes.length} correos unificados?\n\n` +
+        `¿Enviar ${clientesSeleccionados.length} correos unificados?\n\n` +
         `Cada cliente recibirá UN SOLO correo con todas sus facturas (vencidas, próximas y no vencidas).`
     );
 
@@ -469,25 +616,8 @@ async function enviarCorreos() {
         return;
     }
 
-    // Extraer clientes seleccionados
-    const clientesSeleccionados = Array.from(checkboxes).map(cb => ({
-        cliente: cb.getAttribute('data-cliente'),
-        email: cb.getAttribute('data-email')
-    }));
-
     console.log(`📧 Enviando correos a ${clientesSeleccionados.length} clientes...`);
 
-    // Filtrar recordatorios para clientes seleccionados
-    const recordatoriosFiltrados = recordatoriosGlobal.filter(r => {
-        return clientesSeleccionados.some(cs => {
-            const clienteMatch = normalizarTexto(cs.cliente) === normalizarTexto(r.cliente);
-            const emailMatch = normalizarTexto(cs.email) === normalizarTexto(r.correo_cliente);
-            return clienteMatch && emailMatch;
-        });
-    });
-
-    console.log(`Total recordatorios a enviar: ${recordatoriosFiltrados.length}`);
-
     const btn = document.getElementById("btnEnviarCorreos");
     btn.disabled = true;
     btn.textContent = "Enviando...";
@@ -498,35 +628,59 @@ async function enviarCorreos() {
     const progressFill = document.getElementById("progressFill");
     const progressText = document.getElementById("progressText");
 
+    document.getElementById("resultExitosos").textContent = 0;
+    document.getElementById("resultFallidos").textContent = 0;
+    document.getElementById("resultsArea").style.display = "block";
+    document.getElementById("btnReenviarFallidos").style.display = "none";
+
     try {
-        progressFill.style.width = "20%";
-        progressText.textContent = `Enviando ${clientesSeleccionados.length} correos...`;
+        progressFill.style.width = "0%";
+        progressText.textContent = `Iniciando envío de ${clientesSeleccionados.length} correos...`;
+
+        // El servidor conserva la corrida (ya agrupada): basta con el id y
+        // los ids de los grupos seleccionados
+        let response = await solicitarEnvio(
+            corridaIdGlobal
+                ? { corrida_id: corridaIdGlobal, grupos: clientesSeleccionados.map(c => c.id) }
+                : { recordatorios: recordatoriosDeClientes(clientesSeleccionados) }
+        );
 
-        const response = await fetch("/enviar-correos", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ recordatorios: recordatoriosFiltrados })
-        });
+        // Si la corrida venció en el servidor, se envían los recordatorios completos
+        if (response.status === 410) {
+            console.warn("⚠️ Corrida expirada en el servidor; enviando recordatorios completos");
+            corridaIdGlobal = null;
+            response = await solicitarEnvio({ recordatorios: recordatoriosDeClientes(clientesSeleccionados) });
+        }
 
         if (!response.ok) {
             const errorData = await response.json();
             throw new Error(errorData.message || "Error en servidor");
         }
 
-        const resultado = await response.json();
+        const inicio = await response.json();
+        trabajoEnvioActual = inicio.trabajo_id;
+
+        console.log(`📤 Trabajo ${inicio.trabajo_id}: ${inicio.total} correos`);
+
+        if (inicio.en_cola) {
+            alert(
+                `${inicio.en_cola} correos quedaron en cola por la cuota diaria.\n\n` +
+                `Se enviarán automáticamente en la siguiente ventana (fin estimado: ${inicio.estimacion.fin_estimado}).`
+            );
+        }
 
-        console.log(`✅ Envío completado:`);
+        const resultado = await seguirProgresoEnvio(inicio);
+        mostrarReenvioFallidos(resultado);
+
+        console.log(`✅ Envío ${resultado.estado}:`);
         console.log(`  - Total: ${resultado.total}`);
         console.log(`  - Exitosos: ${resultado.exitosos}`);
         console.log(`  - Fallidos: ${resultado.fallidos}`);
 
         progressFill.style.width = "100%";
-        progressText.textContent = "✅ Envío completado";
-
-        document.getElementById("resultExitosos").textContent = resultado.exitosos;
-        document.getElementById("resultFallidos").textContent = resultado.fallidos;
-
-        document.getElementById("resultsArea").style.display = "block";
+        progressText.textContent = resultado.estado === "cancelado"
+            ? `⛔ Envío cancelado (${resultado.exitosos} enviados)`
+            : "✅ Envío completado";
 
         setTimeout(() => progressArea.style.display = "none", 2000);
 
@@ -535,7 +689,174 @@ async function enviarCorreos() {
         alert("Error: " + error.message);
         progressText.textContent = "❌ Error en envío";
     } finally {
+        trabajoEnvioActual = null;
         btn.disabled = false;
         btn.textContent = "Enviar Correos";
     }
 }
+
+
+function solicitarEnvio(cuerpo) {
+    return fetch("/enviar-correos", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(cuerpo)
+    });
+}
+
+function recordatoriosDeClientes(clientesSeleccionados) {
+    // Recordatorios de los clientes agrupados seleccionados
+    const recordatorios = clientesSeleccionados.flatMap(c => c.facturas);
+
+    console.log(`Total recordatorios a enviar: ${recordatorios.length}`);
+    return recordatorios;
+}
+
+// ==========================================
+// PROGRESO DEL TRABAJO DE ENVÍO
+// ==========================================
+
+let trabajoEnvioActual = null;
+
+function seguirProgresoEnvio(inicio) {
+    // Consume el stream SSE del trabajo y actualiza la barra y los contadores
+    // con cada resultado. Resuelve con el resumen final del trabajo.
+    const progressFill = document.getElementById("progressFill");
+    const progressText = document.getElementById("progressText");
+    const exitososEl = document.getElementById("resultExitosos");
+    const fallidosEl = document.getElementById("resultFallidos");
+
+    const total = inicio.total;
+    let exitosos = 0;
+    let fallidos = 0;
+
+    return new Promise((resolve, reject) => {
+        const stream = new EventSource(inicio.progreso);
+
+        stream.addEventListener("resultado", (evento) => {
+            const r = JSON.parse(evento.data);
+            if (r.success) {
+                exitosos++;
+            } else {
+                fallidos++;
+                console.warn(`❌ ${r.cliente} <${r.destinatario}>: ${r.error}`);
+            }
+
+            const procesados = exitosos + fallidos;
+            progressFill.style.width = `${total ? Math.round(procesados * 100 / total) : 100}%`;
+            progressText.textContent = `Enviando... ${procesados} de ${total}`;
+            exitososEl.textContent = exitosos;
+            fallidosEl.textContent = fallidos;
+        });
+
+        stream.addEventListener("estado", (evento) => {
+            const resumen = JSON.parse(evento.data);
+            actualizarBotonPausa(resumen.estado);
+
+            if (resumen.estado === "pausado") {
+                progressText.textContent = `⏸️ Pausado (${resumen.procesados} de ${total})`;
+            } else if (resumen.estado === "cancelando") {
+                progressText.textContent = "Cancelando...";
+            }
+
+            if (["completado", "cancelado", "error"].includes(resumen.estado)) {
+                stream.close();
+                exitososEl.textContent = resumen.exitosos;
+                fallidosEl.textContent = resumen.fallidos;
+                if (resumen.estado === "error") {
+                    reject(new Error(resumen.error || "Error en servidor"));
+                } else {
+                    resolve(resumen);
+                }
+            }
+        });
+
+        // EventSource reintenta solo (con Last-Event-ID); solo se aborta si el
+        // servidor ya no conoce el trabajo.
+        stream.onerror = () => {
+            if (stream.readyState === EventSource.CLOSED) {
+                reject(new Error("Se perdió la conexión con el trabajo de envío"));
+            }
+        };
+    });
+}
+
+function actualizarBotonPausa(estado) {
+    const btnPausar = document.getElementById("btnPausarEnvio");
+    btnPausar.textContent = estado === "pausado" ? "▶️ Reanudar" : "⏸️ Pausar";
+    btnPausar.disabled = !["en_curso", "pausado"].includes(estado);
+    document.getElementById("btnCancelarEnvio").disabled = !["en_curso", "pausado"].includes(estado);
+}
+
+async function controlarTrabajoEnvio(accion) {
+    if (!trabajoEnvioActual) {
+        return;
+    }
+
+    try {
+        const response = await fetch(`/enviar-correos/${trabajoEnvioActual}/${accion}`, { method: "POST" });
+        const resumen = await response.json();
+        if (!response.ok) {
+            throw new Error(resumen.message || "Error en servidor");
+        }
+        actualizarBotonPausa(resumen.estado);
+    } catch (error) {
+        console.error(`❌ Error al ${accion} el envío:`, error);
+        alert("Error: " + error.message);
+    }
+}
+
+function pausarOReanudarEnvio() {
+    const pausado = document.getElementById("btnPausarEnvio").textContent.includes("Reanudar");
+    controlarTrabajoEnvio(pausado ? "reanudar" : "pausar");
+}
+
+function cancelarEnvio() {
+    if (confirm("¿Cancelar el envío? Los correos que aún no se enviaron no se enviarán.")) {
+        controlarTrabajoEnvio("cancelar");
+    }
+}
+
+function mostrarReenvioFallidos(resumen) {
+    const btnReenviar = document.getElementById("btnReenviarFallidos");
+    btnReenviar.dataset.trabajo = resumen.trabajo_id;
+    btnReenviar.style.display = resumen.fallidos > 0 ? "inline-block" : "none";
+}
+
+async function reenviarFallidos() {
+    // Reenvía solo los fallidos del último trabajo (los enviados no se repiten)
+    const btnReenviar = document.getElementById("btnReenviarFallidos");
+    const progressArea = document.getElementById("progressArea");
+    const progressText = document.getElementById("progressText");
+
+    btnReenviar.disabled = true;
+
+    try {
+        const response = await fetch(`/enviar-correos/${btnReenviar.dataset.trabajo}/reenviar-fallidos`, { method: "POST" });
+        const inicio = await response.json();
+        if (!response.ok) {
+            throw new Error(inicio.message || "Error en servidor");
+        }
+        if (!inicio.total) {
+            alert(inicio.message);
+            return;
+        }
+
+        trabajoEnvioActual = inicio.trabajo_id;
+        progressArea.style.display = "block";
+        document.getElementById("resultExitosos").textContent = 0;
+        document.getElementById("resultFallidos").textContent = 0;
+
+        const resultado = await seguirProgresoEnvio(inicio);
+        mostrarReenvioFallidos(resultado);
+        progressText.textContent = `✅ Reenvío completado: ${resultado.exitosos} enviados, ${resultado.fallidos} fallidos`;
+        setTimeout(() => progressArea.style.display = "none", 2000);
+
+    } catch (error) {
+        console.error(`❌ ERROR EN REENVÍO:`, error);
+        alert("Error: " + error.message);
+    } finally {
+        trabajoEnvioActual = null;
+        btnReenviar.disabled = false;
+    }
+}
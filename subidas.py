@@ -0,0 +1,106 @@
+"""
+Archivos subidos guardados en disco y leídos a través de un mapa de memoria.
+
+Werkzeug deja en memoria los archivos chicos (hasta 500 KB) y después los
+pasa a un temporal; leerlos con .read() y envolverlos en BytesIO para cada
+lectura dejaba varias copias del Excel vivas por petición. Aquí:
+
+- SolicitudEnDisco (request_class de Flask) escribe cada archivo subido en
+  un temporal desde el primer byte y corta la subida con 413 apenas pasa
+  de `max_bytes_subida`, sin esperar a recibirla completa.
+- mapear() expone el temporal como un mmap de solo lectura, que se usa
+  como los bytes del archivo (hashlib, lectura_excel.abrir) sin copiarlo,
+  y al salir libera el mapa y borra el temporal.
+"""
+
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import registro
+
+log = registro.obtener(__name__)
+
+
+class _TemporalAcotado:
+    """Temporal de una subida que se descarta si se le escriben más de `max_bytes`."""
+
+    def __init__(self, archivo, max_bytes):
+        self._archivo = archivo
+        self._max_bytes = max_bytes
+        self._escritos = 0
+
+    def write(self, datos):
+        self._escritos += len(datos)
+        if self._max_bytes and self._escritos > self._max_bytes:
+            self._archivo.close()
+            raise RequestEntityTooLarge()
+        return self._archivo.write(datos)
+
+    def __getattr__(self, nombre):
+        return getattr(self._archivo, nombre)
+
+    def __iter__(self):
+        return iter(self._archivo)
+
+
+class SolicitudEnDisco(Request):
+    """
+    Request que guarda los archivos subidos en temporales en disco.
+
+    `directorio_subidas` es la carpeta de los temporales (None = la del
+    sistema) y `max_bytes_subida` el tamaño máximo de cada archivo
+    (0 = sin límite).
+    """
+
+    directorio_subidas = None
+    max_bytes_subida = 0
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        max_bytes = self.max_bytes_subida
+        # Si el cliente declara el tamaño, se rechaza sin leer nada
+        if max_bytes and content_length and content_length > max_bytes:
+            raise RequestEntityTooLarge()
+        archivo = tempfile.TemporaryFile("wb+", dir=self.directorio_subidas, prefix="subida-")
+        return _TemporalAcotado(archivo, max_bytes)
+
+
+@contextmanager
+def mapear(archivo):
+    """
+    Contenido del archivo subido (FileStorage) como mmap de solo lectura.
+
+    Al salir se cierran el mapa y el temporal (que se borra). Un archivo
+    vacío da b"" (no se puede mapear) y uno que no está en disco (otra
+    request_class) se lee a bytes.
+    """
+    flujo = archivo.stream
+    try:
+        flujo.seek(0, os.SEEK_END)
+        if flujo.tell() == 0:
+            yield b""
+            return
+
+        try:
+            descriptor = flujo.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            flujo.seek(0)
+            yield flujo.read()
+            return
+
+        mapa = mmap.mmap(descriptor, 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapa
+        finally:
+            try:
+                mapa.close()
+            except BufferError:
+                # Queda una vista abierta sobre el mapa: se libera cuando se libere esa vista
+                log.warning("Mapa de una subida con vistas abiertas; se libera después", archivo=archivo.filename)
+    finally:
+        flujo.close()
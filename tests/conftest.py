@@ -0,0 +1,215 @@
+"""
+Configuración común de las pruebas.
+
+procesamiento.py lee la configuración al importarse, así que el entorno se
+fija aquí, antes de cualquier import: sin bitácora en disco, sin caché de
+clientes en disco, la preparación de correos en el mismo proceso y el
+registro solo para advertencias.
+
+También están aquí los datos y servicios que comparten los módulos de
+prueba: los libros de Excel con los casos borde, el servidor SMTP local y
+procesamiento apuntando a él.
+"""
+
+import os
+import socket
+import sys
+from collections import deque
+from datetime import datetime
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+os.environ.update(
+    BITACORA_ENVIOS="",
+    CACHE_CLIENTES_DIR="",
+    PREPARACION_PROCESOS="0",
+    CUOTA_DIARIA="0",
+    CUOTA_POR_SEGUNDO="0",
+    EMAIL_USE_TLS="false",
+    LOG_NIVEL="WARNING"
+)
+
+
+# ==========================================
+# LIBROS DE EXCEL
+# ==========================================
+
+
+def _guardar(libro):
+    salida = BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def _libro_clientes():
+    """Listado de clientes y vendedores (encabezado en la primera fila)."""
+    libro = Workbook()
+    hoja = libro.active
+    hoja.title = "Hoja1"
+    hoja.append(("Nit", "Cliente", "Nombre comercial", "Correo cliente", "Vendedor", "Correo vendedor",
+                 "Canal", "Cupo"))
+    hoja.append((900001, "ALIMENTOS ANDINOS SAS", None, "compras@andinos.com", "VENDEDOR UNO",
+                 "uno@ejemplo.com", "HORECA", 10000000))
+    hoja.append((900002, "Panadería La Espiga", "La Espiga", " espiga@ejemplo.com ", "Vendedor Dos",
+                 "dos@ejemplo.com", "Tiendas", "sin cupo"))
+    # Sin correo: no entra al listado (su vendedor sí)
+    hoja.append((900003, "COMERCIAL PEÑA LTDA", None, None, "VENDEDOR TRES", "tres@ejemplo.com", None, 0))
+    # Sin nombre
+    hoja.append((None, None, None, "nadie@ejemplo.com", None, None, None, None))
+    hoja.append((900005, "  Distribuidora Norte  ", "Norte", "norte@ejemplo.com", "VENDEDOR CUATRO", None,
+                 "Mayoristas", 2500000.5))
+    return _guardar(libro)
+
+
+def _libro_cartera():
+    """"Cartera por edades" con el preámbulo del reporte antes del encabezado."""
+    libro = Workbook()
+    hoja = libro.active
+    hoja.title = "Cartera por edades"
+    for fila in (("EMPRESA DE PRUEBA S.A.S.",), ("CARTERA POR EDADES",)) + ((),) * 9:
+        hoja.append(fila)
+    hoja.append(("Tercero", "Nombre tercero", "Numero FAC", "Emision", "Vencimiento", "Dias", "Saldo",
+                 "Vendedor", "Local"))
+
+    filas = (
+        # Vencida, con emisión y local
+        (900001, "ALIMENTOS ANDINOS SAS", "FE001", datetime(2024, 11, 20), datetime(2025, 1, 5), -10,
+         1500000.5, "VENDEDOR UNO", "Bogotá"),
+        # Emisión y vencimiento como texto; próxima a vencer
+        (900001, "ALIMENTOS ANDINOS SAS", "FE002", "sin fecha", "2025-01-18", 3, 250000, "VENDEDOR UNO", None),
+        # Saldo no numérico (queda en 0 pero no se omite) y vendedor sin correo
+        (900001, "ALIMENTOS ANDINOS SAS", "FE003", datetime(2024, 12, 1), datetime(2025, 2, 14), 30,
+         "abc", "VENDEDOR DESCONOCIDO", "Cali"),
+        # Saldo en cero: se omite
+        (900001, "ALIMENTOS ANDINOS SAS", "FE004", None, datetime(2025, 1, 1), -14, 0, "VENDEDOR UNO", None),
+        # Nombre con otras mayúsculas; vence hoy
+        (900002, "panadería la espiga", "FE005", datetime(2025, 1, 2), datetime(2025, 1, 15), 0, 99.4,
+         "VENDEDOR DOS", "Medellín"),
+        # Nombre vacío: se ignora
+        (None, None, "FE006", None, datetime(2025, 1, 10), -5, 1000, None, None),
+        # Tercero que no está en el listado
+        (999999, "XQZ TERCERO SIN REGISTRO 77", "FE007", None, datetime(2025, 1, 10), -5, 1000, None, None),
+        # Vencimiento vacío
+        (900001, "ALIMENTOS ANDINOS SAS", "FE008", None, None, None, 5000, "VENDEDOR UNO", None),
+        # Vencimiento que no es fecha
+        (900001, "ALIMENTOS ANDINOS SAS", "FE009", None, "no es fecha", None, 5000, "VENDEDOR UNO", None),
+        # Número de factura numérico, nombre con espacios y saldo negativo; no vencida
+        (900005, "Distribuidora Norte", 12345, "2024-12-31", datetime(2025, 3, 1), 45, -320000,
+         "VENDEDOR CUATRO", None),
+        # Vendedor del listado cuyo cliente no tiene correo; número de factura vacío
+        (900005, "DISTRIBUIDORA NORTE", None, None, datetime(2024, 10, 1), -106, 75000.75, "VENDEDOR TRES",
+         "Bogotá"),
+    )
+    for fila in filas:
+        hoja.append(fila)
+    return _guardar(libro)
+
+
+@pytest.fixture(scope="session")
+def libro_clientes():
+    return _libro_clientes()
+
+
+@pytest.fixture(scope="session")
+def libro_cartera():
+    return _libro_cartera()
+
+
+@pytest.fixture
+def clientes(libro_clientes, libro_cartera):
+    """Clientes agrupados de los libros de prueba, listos para enviar."""
+    import procesamiento
+
+    resultado = procesamiento.procesar_archivos(libro_clientes, libro_cartera)
+    return procesamiento.agrupar_recordatorios_por_cliente(resultado["recordatorios"])
+
+
+# ==========================================
+# SMTP Y BITÁCORA
+# ==========================================
+
+
+class ServidorSMTP:
+    """
+    Servidor SMTP local (aiosmtpd) que guarda lo que recibe.
+
+    `respuestas` son los códigos con que se contestan los siguientes DATA
+    antes de volver a aceptar (p. ej. 421 o 451); `recibidos` guarda
+    (puerto del cliente, destinatarios) de cada mensaje aceptado, así que
+    los puertos distintos son las conexiones distintas.
+    """
+
+    def __init__(self):
+        self.respuestas = deque()
+        self.recibidos = []
+        self.rechazados = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.respuestas:
+            self.rechazados += 1
+            return f"{self.respuestas.popleft()} intente más tarde"
+        self.recibidos.append((session.peer[1], list(envelope.rcpt_tos)))
+        return "250 OK"
+
+    @property
+    def conexiones(self):
+        return len({puerto for puerto, _ in self.recibidos})
+
+
+@pytest.fixture
+def servidor_smtp():
+    aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+    from aiosmtpd.smtp import AuthResult
+
+    with socket.socket() as libre:
+        libre.bind(("127.0.0.1", 0))
+        puerto = libre.getsockname()[1]
+
+    servidor = ServidorSMTP()
+    # Acepta cualquier LOGIN, sin TLS
+    controlador = aiosmtpd_controller.Controller(
+        servidor, hostname="127.0.0.1", port=puerto,
+        authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False
+    )
+    controlador.start()
+    servidor.host, servidor.port = controlador.hostname, controlador.port
+    try:
+        yield servidor
+    finally:
+        controlador.stop()
+
+
+@pytest.fixture
+def envio(servidor_smtp, monkeypatch):
+    """procesamiento apuntando al servidor local, con reintentos casi inmediatos."""
+    import procesamiento
+    from reintentos import PoliticaReintentos
+    from smtp_pool import PoolSMTP
+
+    # Primero los recursos de siempre; después se reemplazan los de la prueba
+    procesamiento.inicializar()
+    monkeypatch.setattr(procesamiento, "EMAIL_HOST", servidor_smtp.host)
+    monkeypatch.setattr(procesamiento, "EMAIL_PORT", servidor_smtp.port)
+    monkeypatch.setattr(procesamiento, "EMAIL_USER", "cartera@ejemplo.com")
+    monkeypatch.setattr(procesamiento, "EMAIL_PASSWORD", "clave")
+    monkeypatch.setattr(procesamiento, "EMAIL_FROM_ADDRESS", "cartera@ejemplo.com")
+    monkeypatch.setattr(procesamiento, "EMAIL_USE_TLS", False)
+    pool = PoolSMTP(servidor_smtp.host, servidor_smtp.port, usar_tls=False, timeout=5)
+    monkeypatch.setattr(procesamiento, "pool_smtp", pool)
+    monkeypatch.setattr(procesamiento, "politica_reintentos", PoliticaReintentos(3, base=0.01, maximo=0.05))
+    yield servidor_smtp
+    pool.cerrar()
+
+
+@pytest.fixture
+def bitacora(tmp_path):
+    from bitacora import BitacoraEnvios
+
+    bitacora = BitacoraEnvios(str(tmp_path / "bitacora.db"))
+    yield bitacora
+    bitacora.cerrar()
@@ -0,0 +1,23 @@
+"""BitacoraEnvios: conteo de enviados del día para la cuota diaria."""
+
+from datetime import date, timedelta
+
+
+def _preparar(cliente):
+    return cliente["correo_cliente"], None
+
+
+def test_enviados_del_dia(bitacora):
+    clientes = [{"cliente": f"C{i}", "correo_cliente": f"c{i}@ejemplo.com"} for i in range(4)]
+    lote = bitacora.abrir_lote("lote-1", clientes, _preparar)
+    assert bitacora.enviados_del_dia(date.today()) == 0
+
+    lote.registrar(0, True, "h0", "250 OK")
+    lote.registrar(1, True, "h1", "250 OK", intentos=2)
+    lote.registrar(2, False, "h2", "550 buzón no existe")
+    otro = bitacora.abrir_lote("lote-2", clientes[:1], _preparar)
+    otro.registrar(0, True, "h0", "250 OK")
+
+    # Los fallidos y pendientes no cuentan; los de todos los lotes sí
+    assert bitacora.enviados_del_dia(date.today()) == 3
+    assert bitacora.enviados_del_dia(date.today() - timedelta(days=1)) == 0
@@ -0,0 +1,68 @@
+"""Caché por huella de contenido (cache.py) y su uso con el listado de clientes."""
+
+import os
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+import procesamiento
+from cache import CacheHuella, huella_contenido
+
+
+def test_lru_descarta_la_menos_usada():
+    cache = CacheHuella(max_entradas=2)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    assert cache.obtener("a")["valor"] == 1  # "a" pasa a ser la más reciente
+    cache.guardar("c", 3)
+
+    assert cache.obtener("b") is None
+    assert [cache.obtener(clave)["valor"] for clave in ("a", "c")] == [1, 3]
+    estadisticas = cache.estadisticas()
+    assert (estadisticas["entradas_memoria"], estadisticas["hits_memoria"], estadisticas["misses"]) == (2, 3, 1)
+
+
+def test_buscar_varias_claves_cuenta_una_consulta():
+    cache = CacheHuella(max_entradas=2)
+    cache.guardar("b", 2)
+    assert cache.buscar("a", "b") == ("b", cache.obtener("b"))
+    assert cache.buscar("x", "y") == (None, None)
+    assert cache.estadisticas()["tasa_aciertos"] == round(2 / 3, 3)
+
+
+def test_disco_sobrevive_a_la_memoria(tmp_path):
+    cache = CacheHuella(max_entradas=1, directorio=str(tmp_path))
+    cache.guardar("a", {"clientes": 1})
+    cache.guardar("b", {"clientes": 2})  # "a" sale de memoria pero sigue en disco
+
+    assert cache.obtener("a")["valor"] == {"clientes": 1}
+    assert CacheHuella(directorio=str(tmp_path)).obtener("b")["valor"] == {"clientes": 2}
+    assert cache.estadisticas()["hits_disco"] == 1
+
+
+def test_entrada_ilegible_en_disco_es_un_miss(tmp_path):
+    cache = CacheHuella(directorio=str(tmp_path))
+    with open(os.path.join(tmp_path, "rota.bin"), "wb") as archivo:
+        archivo.write(b"no es zlib")
+    assert cache.obtener("rota") is None
+    assert cache.estadisticas()["misses"] == 1
+
+
+def test_listado_modificado_cambia_la_huella(libro_clientes, libro_cartera, monkeypatch):
+    monkeypatch.setattr(procesamiento, "cache_clientes", CacheHuella(max_entradas=4))
+
+    primero = procesamiento.procesar_archivos(libro_clientes, libro_cartera)
+    segundo = procesamiento.procesar_archivos(libro_cartera, libro_clientes)
+    assert (primero["cache_clientes"]["hit"], segundo["cache_clientes"]["hit"]) == (False, True)
+    assert procesamiento.cache_clientes.obtener(huella_contenido(libro_clientes)) is not None
+
+    # Otro correo para un cliente: otros bytes, otra huella, se vuelve a parsear
+    libro = load_workbook(BytesIO(libro_clientes))
+    libro.active["D2"] = "pagos@andinos.com"
+    salida = BytesIO()
+    libro.save(salida)
+    modificado = procesamiento.procesar_archivos(salida.getvalue(), libro_cartera)
+
+    assert modificado["cache_clientes"]["hit"] is False
+    correos = {r.correo_cliente for r in modificado["recordatorios"] if r.cliente == "ALIMENTOS ANDINOS SAS"}
+    assert correos == {"pagos@andinos.com"}
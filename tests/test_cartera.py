@@ -0,0 +1,116 @@
+"""
+Paridad del motor columnar de leer_excel_cartera con el ciclo por fila anterior.
+
+datos/cartera_legado.json es la salida del código anterior al motor
+columnar (iterrows, commit 65756a0) para los libros de las fixtures
+libro_clientes y libro_cartera (conftest.py), con la fecha de hoy fija en
+HOY: el listado de clientes y vendedores, los recordatorios, los contadores
+del resumen (que el código anterior imprimía) y el HTML del correo de cada
+cliente agrupado. Los libros traen los casos borde del ciclo por fila:
+fechas escritas como texto, saldos no numéricos, nombres vacíos, saldos en
+cero, vencimientos vacíos o inválidos y terceros que no están en el listado.
+"""
+
+import json
+import os
+from datetime import date
+
+import pytest
+
+import procesamiento
+from facturas import como_dicts
+
+HOY = date(2025, 1, 15)
+
+LEGADO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "cartera_legado.json")
+
+
+class _Hoy(date):
+    @classmethod
+    def today(cls):
+        return HOY
+
+
+def procesar(modulo, contenido_clientes, contenido_cartera, **opciones):
+    """
+    (listado, recordatorios, html por cliente) de los libros de prueba con
+    las funciones de `modulo` (procesamiento o el app.py anterior).
+    `opciones` van a leer_excel_cartera.
+    """
+    _, df_clientes = modulo.cargar_excel(contenido_clientes, modulo.sondear_excel(contenido_clientes))
+    dict_clientes, dict_vendedores = modulo.leer_excel_clientes(None, df=df_clientes)
+
+    _, df_cartera = modulo.cargar_excel(contenido_cartera, modulo.sondear_excel(contenido_cartera))
+    recordatorios = modulo.leer_excel_cartera(None, dict_clientes, dict_vendedores, df=df_cartera, **opciones)
+
+    html = {
+        cliente["cliente"]: modulo.generar_html_recordatorio_agrupado(cliente)
+        for cliente in modulo.agrupar_recordatorios_por_cliente(recordatorios)
+    }
+    listado = {"clientes": dict_clientes, "vendedores": dict_vendedores}
+    return listado, como_dicts(recordatorios), html
+
+
+@pytest.fixture(scope="module")
+def legado():
+    with open(LEGADO, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+@pytest.fixture(scope="module")
+def actual(libro_clientes, libro_cartera):
+    original = procesamiento.date
+    procesamiento.date = _Hoy
+    contadores = {}
+    try:
+        listado, recordatorios, html = procesar(procesamiento, libro_clientes, libro_cartera,
+                                                contadores=contadores)
+    finally:
+        procesamiento.date = original
+    # Mismos tipos que el JSON grabado (tuplas, claves)
+    return json.loads(json.dumps({
+        "listado": listado, "recordatorios": recordatorios, "contadores": contadores, "html": html
+    }))
+
+
+def test_listado_clientes(actual, legado):
+    assert actual["listado"] == legado["listado"]
+
+
+def test_recordatorios(actual, legado):
+    assert actual["recordatorios"] == legado["recordatorios"]
+
+
+def test_contadores(actual, legado):
+    assert actual["contadores"] == legado["contadores"]
+
+
+def test_contadores_cubren_casos_borde(actual):
+    # Un tercero desconocido, un vencimiento vacío y un saldo en cero; el
+    # vencimiento inválido se omite sin contador y el nombre vacío sin contar
+    assert actual["contadores"] == {
+        "vencidas": 2, "proximas": 2, "no_vencidas": 2,
+        "sin_cliente": 1, "vencimiento_vacio": 1, "saldo_cero": 1
+    }
+
+
+def test_procesar_archivos_retorna_contadores(libro_clientes, libro_cartera):
+    resultado = procesamiento.procesar_archivos(libro_cartera, libro_clientes)
+    assert set(resultado["contadores"]) == {
+        "vencidas", "proximas", "no_vencidas", "sin_cliente", "vencimiento_vacio", "saldo_cero"
+    }
+    assert resultado["contadores"]["sin_cliente"] == 1
+
+
+def test_recordatorios_cubren_casos_borde(actual):
+    facturas = {r["numero_factura"]: r for r in actual["recordatorios"]}
+    # Omitidas: saldo en cero, nombre vacío, sin cliente, vencimiento vacío o inválido
+    assert set(facturas) == {"FE001", "FE002", "FE003", "FE005", "12345", "N/A"}
+    assert facturas["FE002"]["fecha_emision"] == "sin fecha"
+    assert facturas["FE003"]["saldo_numerico"] == 0
+
+
+def test_html_por_cliente(actual, legado):
+    assert actual["html"].keys() == legado["html"].keys()
+    for cliente, html in legado["html"].items():
+        assert actual["html"][cliente] == html, cliente
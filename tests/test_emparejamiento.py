@@ -0,0 +1,92 @@
+"""Emparejamiento de nombres de tercero con el listado de clientes (emparejamiento.py)."""
+
+import pandas as pd
+import pytest
+
+from emparejamiento import IndiceClientes
+
+CLIENTES = [
+    "alimentos andinos sas",
+    "ferreteria el tornillo 2 sas",
+    "distribuidora la economia sede norte",
+    "inversiones y servicios asociados ltda",
+    "comercializadora andina del pacifico sas",
+    "panaderia la espiga",
+    "la espiga ltda"
+]
+
+
+@pytest.fixture(scope="module")
+def indice():
+    return IndiceClientes(CLIENTES)
+
+
+def emparejar(indice, nombres, **opciones):
+    claves, reporte = indice.emparejar(pd.Series(nombres), **opciones)
+    return list(claves), reporte
+
+
+def test_exacta_y_canonica(indice):
+    claves, reporte = emparejar(indice, ["alimentos andinos sas"])
+    assert claves == ["alimentos andinos sas"]
+    assert reporte["facturas"]["exacta"] == 1
+
+    claves, reporte = emparejar(indice, ["alimentos andinos s.a.s."])
+    assert claves == ["alimentos andinos sas"]
+    assert reporte["facturas"]["canonica"] == 1
+
+
+def test_canonica_ambigua(indice):
+    # "panaderia la espiga" y "la espiga ltda" no comparten nombre canónico;
+    # dos claves con el mismo sí
+    indice_doble = IndiceClientes(["la espiga sas", "la espiga ltda"])
+    assert indice_doble.buscar("la espiga") == (None, "ambigua", 1.0, "la espiga ltda")
+
+
+def test_aproximada_solo_se_reporta(indice):
+    nombres = ["comercializadora andina del pacfico", "inversiones y servicios asociadas"]
+    claves, reporte = emparejar(indice, nombres)
+    assert claves == [None, None]
+    assert reporte["facturas"]["aproximada"] == 2
+    assert {d["candidato"] for d in reporte["detalle"]} == {
+        "comercializadora andina del pacifico sas", "inversiones y servicios asociados ltda"
+    }
+    assert all(d["cliente"] is None for d in reporte["detalle"])
+
+
+def test_aproximada_se_asigna_si_se_pide(indice):
+    claves, reporte = emparejar(indice, ["comercializadora andina del pacfico"], asignar_aproximadas=True)
+    assert claves == ["comercializadora andina del pacifico sas"]
+    assert reporte["aproximadas_asignadas"] is True
+
+
+@pytest.mark.parametrize("nombre, candidato", [
+    ("ferreteria el tornillo 3 sas", "ferreteria el tornillo 2 sas"),
+    ("ferreteria el tornillo sas", "ferreteria el tornillo 2 sas"),
+    ("distribuidora la economia sede sur", "distribuidora la economia sede norte"),
+    ("distribuidora la economia sede este", "distribuidora la economia sede norte")
+])
+def test_descarta_otros_numeros_o_sedes(indice, nombre, candidato):
+    clave, metodo, confianza, mejor = indice.buscar(nombre)
+    assert (clave, metodo, mejor) == (None, "descartada", candidato)
+    assert confianza >= 0.85
+
+    claves, reporte = emparejar(indice, [nombre], asignar_aproximadas=True)
+    assert claves == [None]
+    assert reporte["facturas"]["descartada"] == 1
+
+
+def test_sin_coincidencia(indice):
+    assert indice.buscar("xqz tercero sin registro 77")[:2] == (None, "sin_coincidencia")
+
+
+def test_desempate_independiente_del_orden():
+    # Los dos clientes quedan a la misma distancia del nombre buscado: gana
+    # el primero en orden alfabético, en cualquier orden del listado
+    claves = ["muebles rojo sas", "muebles roja sas"]
+    for orden in (claves, claves[::-1]):
+        indice = IndiceClientes(orden)
+        assert indice.buscar("muebles roj sas", umbral=0.5, margen=0.0) == (
+            "muebles roja sas", "aproximada", 0.87, "muebles roja sas"
+        )
+        assert indice.buscar("muebles roj sas", umbral=0.5) == (None, "ambigua", 0.87, "muebles roja sas")
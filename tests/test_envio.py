@@ -0,0 +1,71 @@
+"""Envío de un lote contra un servidor SMTP local: motores de envío y reintentos en la bitácora."""
+
+import pytest
+
+import procesamiento
+from agrupacion import cliente_plano
+
+
+@pytest.mark.parametrize("motor_async", [False, True], ids=["hilos", "async"])
+def test_reintento_queda_en_la_bitacora(envio, bitacora, clientes, monkeypatch, motor_async):
+    if motor_async:
+        pytest.importorskip("aiosmtplib")
+    monkeypatch.setattr(procesamiento, "ENVIO_ASYNC", motor_async)
+
+    lote = bitacora.abrir_lote("lote-reintento", clientes, procesamiento._preparar_destinatarios,
+                               serializar=cliente_plano)
+    # El primer DATA recibe un error transitorio
+    envio.respuestas.append(451)
+    resultados = procesamiento._enviar_lote_agrupado(clientes, lote=lote)
+    bitacora.vaciar()
+
+    assert all(r["success"] for r in resultados)
+    assert sorted(r["intentos"] for r in resultados) == [1] * (len(clientes) - 1) + [2]
+    assert envio.rechazados == 1
+    assert len(envio.recibidos) == len(clientes)
+
+    entradas = bitacora.entradas_lote("lote-reintento")
+    assert [e["estado"] for e in entradas] == ["enviado"] * len(clientes)
+    assert sorted(e["intentos"] for e in entradas) == [1] * (len(clientes) - 1) + [2]
+
+
+def test_motores_dan_los_mismos_resultados(envio, clientes, monkeypatch):
+    pytest.importorskip("aiosmtplib")
+    # Un destinatario inválido: falla en la validación, sin llegar al SMTP
+    clientes[0] = dict(clientes[0], correo_cliente="sin-arroba")
+
+    por_motor = {}
+    for motor_async in (False, True):
+        monkeypatch.setattr(procesamiento, "ENVIO_ASYNC", motor_async)
+        resultados = procesamiento._enviar_lote_agrupado(clientes)
+        por_motor[motor_async] = sorted(resultados, key=lambda r: r["cliente"])
+
+    assert por_motor[False] == por_motor[True]
+    assert [r["success"] for r in por_motor[True]].count(False) == 1
+    assert len(envio.recibidos) == 2 * (len(clientes) - 1)
+
+
+def test_reintento_que_lanza_excepcion_queda_fallido(envio, bitacora, clientes, monkeypatch):
+    monkeypatch.setattr(procesamiento, "ENVIO_ASYNC", False)
+    enviar = procesamiento._enviar_serializado
+    llamadas = []
+
+    def enviar_o_explotar(correo):
+        llamadas.append(correo)
+        if len(llamadas) > len(clientes):
+            raise RuntimeError("fallo inesperado en el reintento")
+        return enviar(correo)
+
+    monkeypatch.setattr(procesamiento, "_enviar_serializado", enviar_o_explotar)
+    lote = bitacora.abrir_lote("lote-excepcion", clientes, procesamiento._preparar_destinatarios,
+                               serializar=cliente_plano)
+    envio.respuestas.append(451)
+    resultados = procesamiento._enviar_lote_agrupado(clientes, lote=lote)
+    bitacora.vaciar()
+
+    assert len(resultados) == len(clientes)
+    fallidos = [r for r in resultados if not r["success"]]
+    assert [(r["error"], r["intentos"]) for r in fallidos] == [("fallo inesperado en el reintento", 2)]
+
+    entradas = bitacora.entradas_lote("lote-excepcion")
+    assert sorted(e["estado"] for e in entradas) == ["enviado"] * (len(clientes) - 1) + ["fallido"]
@@ -0,0 +1,50 @@
+"""Importar procesamiento no crea recursos; inicializar() los crea una sola vez."""
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import RAIZ
+
+PROGRAMA = """
+import json, os, threading
+hilos = threading.active_count()
+import procesamiento
+
+antes = {
+    "hilos_nuevos": threading.active_count() - hilos,
+    "recursos": [procesamiento.pool_smtp, procesamiento.preparador_correos, procesamiento.cola_reintentos,
+                 procesamiento.bitacora, procesamiento.planificador, procesamiento.cuota_envio],
+    "bitacora_en_disco": os.path.exists(procesamiento.BITACORA_ENVIOS)
+}
+procesamiento.inicializar()
+pool = procesamiento.pool_smtp
+procesamiento.inicializar()
+despues = {
+    "hilos_nuevos": threading.active_count() - hilos,
+    "bitacora_en_disco": os.path.exists(procesamiento.BITACORA_ENVIOS),
+    "con_bitacora": procesamiento.bitacora is not None,
+    "diferir": procesamiento.planificador.diferir is not None,
+    "mismo_pool": procesamiento.pool_smtp is pool
+}
+print(json.dumps({"antes": antes, "despues": despues}))
+"""
+
+
+def test_importar_no_crea_recursos(tmp_path):
+    entorno = dict(os.environ, BITACORA_ENVIOS=str(tmp_path / "bitacora.db"))
+    salida = subprocess.run([sys.executable, "-c", PROGRAMA], cwd=RAIZ, env=entorno,
+                            capture_output=True, text=True)
+    assert salida.returncode == 0, salida.stderr
+    estado = json.loads(salida.stdout.strip().splitlines()[-1])
+
+    assert estado["antes"] == {"hilos_nuevos": 0, "recursos": [None] * 6, "bitacora_en_disco": False}
+    # Hilos de la cola de reintentos y de la bitácora
+    assert estado["despues"].pop("hilos_nuevos") > 0
+    assert estado["despues"] == {
+        "bitacora_en_disco": True,
+        "con_bitacora": True,
+        "diferir": True,
+        "mismo_pool": True
+    }
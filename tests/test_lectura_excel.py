@@ -0,0 +1,44 @@
+"""Los motores de lectura (lectura_excel.py) dan el mismo DataFrame que pd.read_excel."""
+
+import pandas as pd
+import pytest
+
+import lectura_excel
+import procesamiento
+from cache import CacheHuella
+from facturas import como_dicts
+
+
+@pytest.fixture(params=["calamine", "openpyxl"])
+def motor(request):
+    if request.param == "calamine":
+        pytest.importorskip("python_calamine")
+    return request.param
+
+
+@pytest.fixture
+def libros(libro_clientes, libro_cartera):
+    """(bytes, hoja, fila de encabezado, tipo) de cada libro de prueba."""
+    return [
+        (libro_clientes, 0, 0, "clientes"),
+        (libro_cartera, procesamiento.HOJA_CARTERA, procesamiento.FILA_ENCABEZADO_CARTERA, "cartera")
+    ]
+
+
+@pytest.mark.parametrize("seleccionar", [False, True], ids=["todas", "seleccionadas"])
+def test_mismas_filas_que_pandas(motor, libros, seleccionar):
+    for contenido, hoja, fila_encabezado, tipo in libros:
+        columnas = procesamiento.columnas_a_leer(tipo) if seleccionar else None
+        esperado = lectura_excel.leer_hoja(contenido, hoja, fila_encabezado, seleccionar=columnas, motor="pandas")
+        obtenido = lectura_excel.leer_hoja(contenido, hoja, fila_encabezado, seleccionar=columnas, motor=motor)
+        pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_mismos_recordatorios_que_pandas(motor, libro_clientes, libro_cartera, monkeypatch):
+    por_motor = {}
+    for lector in ("pandas", motor):
+        monkeypatch.setattr(procesamiento, "LECTOR_EXCEL", lector)
+        monkeypatch.setattr(procesamiento, "cache_clientes", CacheHuella())
+        resultado = procesamiento.procesar_archivos(libro_clientes, libro_cartera)
+        por_motor[lector] = (como_dicts(resultado["recordatorios"]), resultado["contadores"])
+    assert por_motor[motor] == por_motor["pandas"]
@@ -0,0 +1,118 @@
+"""PlanificadorEnvios: cola por cuota diaria guardada en la bitácora y restaurada al reiniciar."""
+
+import pytest
+
+import procesamiento
+from planificador import CuotaCuenta, PlanificadorEnvios
+
+CUENTA = "cartera@ejemplo.com"
+
+
+class Despachos:
+    """`despachar` del planificador que solo anota lo que recibe."""
+
+    def __init__(self):
+        self.llamadas = []
+
+    def __call__(self, cuenta, clientes, referencias):
+        self.llamadas.append((cuenta, list(clientes), list(referencias)))
+
+
+@pytest.fixture
+def planificadores():
+    """Crea planificadores con una cuenta y cancela sus timers al terminar."""
+    creados = []
+
+    def crear(por_dia, despachar, diferir=None):
+        planificador = PlanificadorEnvios(despachar=despachar, diferir=diferir)
+        planificador.registrar_cuenta(CuotaCuenta(CUENTA, por_dia=por_dia))
+        creados.append(planificador)
+        return planificador
+
+    yield crear
+    for planificador in creados:
+        for timer in planificador._timers.values():
+            timer.cancel()
+
+
+def _cliente(nombre, vencidas):
+    return {"cliente": nombre, "correo_cliente": f"{nombre.lower()}@ejemplo.com", "total_vencidas": vencidas}
+
+
+def test_sin_diferir_la_cola_queda_en_memoria(planificadores):
+    despachos = Despachos()
+    planificador = planificadores(2, despachos)
+
+    admitidos, diferidos = planificador.planificar([_cliente("A", 0), _cliente("B", 3), _cliente("C", 1)], CUENTA)
+
+    # Vencidas primero, las de más vencidas antes
+    assert [c["cliente"] for c in admitidos] == ["B", "C"]
+    assert diferidos == 1
+    assert despachos.llamadas == []
+
+
+def test_diferir_guarda_solo_lo_que_queda_en_cola(planificadores):
+    guardados = []
+
+    def diferir(cuenta, clientes):
+        guardados.extend(c["cliente"] for c in clientes)
+        return [f"ref-{c['cliente']}" for c in clientes]
+
+    despachos = Despachos()
+    planificador = planificadores(1, despachos, diferir)
+
+    admitidos, diferidos = planificador.planificar([_cliente("A", 0), _cliente("B", 2)], CUENTA)
+    assert [c["cliente"] for c in admitidos] == ["B"]
+    assert diferidos == 1
+    assert guardados == ["A"]
+
+    # Se abre la ventana: lo que estaba en cola sale por despachar con su referencia
+    planificador.cuota(CUENTA).por_dia = 0
+    admitidos, diferidos = planificador.planificar([_cliente("C", 0)], CUENTA)
+    assert [c["cliente"] for c in admitidos] == ["C"]
+    assert diferidos == 0
+    assert despachos.llamadas == [(CUENTA, [_cliente("A", 0)], ["ref-A"])]
+
+
+def test_cola_sobrevive_al_reinicio(planificadores, bitacora, monkeypatch):
+    monkeypatch.setattr(procesamiento, "bitacora", bitacora)
+    clientes = [_cliente("A", 0), _cliente("B", 5), _cliente("C", 1)]
+
+    planificador = planificadores(1, Despachos(), procesamiento._guardar_diferidos)
+    admitidos, _ = planificador.planificar(clientes, CUENTA)
+    assert [c["cliente"] for c in admitidos] == ["B"]
+
+    guardados = bitacora.diferidos()
+    assert [cliente["cliente"] for _, _, cliente in guardados] == ["A", "C"]
+    lote_id = guardados[0][0]
+    assert bitacora.resumen_lote(lote_id)["diferidos"] == 2
+    # No son pendientes: reanudar el lote no los envía antes de tiempo
+    assert bitacora.lote_pendiente(lote_id)[1] == []
+    assert bitacora.lotes_incompletos() == []
+
+    # "Reinicio": planificador nuevo con la cola leída de la bitácora, con cupo para uno
+    despachos = Despachos()
+    reiniciado = planificadores(1, despachos, procesamiento._guardar_diferidos)
+    reiniciado.restaurar(CUENTA, [c for _, _, c in guardados], [(l, p) for l, p, _ in guardados])
+
+    [(_, enviados, referencias)] = despachos.llamadas
+    assert [c["cliente"] for c in enviados] == ["C"]
+    assert referencias == [(lote_id, 1)]
+    assert reiniciado.estimacion(CUENTA)["pendientes"] == 1
+
+
+def test_despachar_diferidos_anota_en_las_mismas_filas(envio, bitacora, clientes, monkeypatch):
+    monkeypatch.setattr(procesamiento, "bitacora", bitacora)
+    referencias = procesamiento._guardar_diferidos(CUENTA, clientes)
+    lote_id = referencias[0][0]
+
+    procesamiento._despachar_diferidos(CUENTA, clientes, referencias)
+    trabajo = procesamiento.trabajos_envio.ultimo()
+    for _ in trabajo.eventos(espera_maxima=10):
+        pass
+    bitacora.vaciar()
+
+    assert trabajo.lote.id == lote_id
+    assert bitacora.diferidos() == []
+    assert [e["estado"] for e in bitacora.entradas_lote(lote_id)] == ["enviado"] * len(clientes)
+    assert len(envio.recibidos) == len(clientes)
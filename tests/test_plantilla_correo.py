@@ -0,0 +1,101 @@
+"""
+Paridad de la plantilla compilada (plantilla_correo.py) con el f-string anterior.
+
+datos/plantilla_legado.json es el HTML que generaba
+generar_html_recordatorio_agrupado en el app.py anterior (commit 65756a0)
+para cada cliente de CASOS: las tres secciones, subtotales calculados,
+cupo negativo, claves faltantes y valores con llaves, comillas, barras,
+etiquetas HTML y caracteres no ASCII.
+"""
+
+import json
+import os
+
+import pytest
+
+import procesamiento
+from plantilla_correo import PlantillaCompilada
+
+LEGADO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "plantilla_legado.json")
+
+
+def _factura(numero, dias, saldo, emision="01/12/2024", vencimiento="15/01/2025"):
+    return {
+        "numero_factura": numero,
+        "fecha_emision": emision,
+        "fecha_vencimiento": vencimiento,
+        "dias": dias,
+        "saldo": f"${saldo:,.0f}",
+        "saldo_numerico": saldo
+    }
+
+
+CASOS = {
+    "tres_secciones": {
+        "cliente": "ALIMENTOS ANDINOS SAS",
+        "vendedor": "VENDEDOR UNO",
+        "correo_vendedor": "uno@ejemplo.com",
+        "facturas_vencidas": [_factura("FE001", -10, 1500000.5), _factura("FE010", -40, 20000)],
+        "facturas_proximas": [_factura("FE002", 3, 250000)],
+        "facturas_no_vencidas": [_factura("FE003", 30, 0)],
+        "subtotal_vencidas": 1520000.5,
+        "subtotal_proximas": 250000,
+        "subtotal_no_vencidas": 0,
+        "total_facturas": 4,
+        "total_vencidas": 2,
+        "total_proximas": 1,
+        "total_no_vencidas": 1,
+        "total_saldo": 1770000.5,
+        "cupo_disponible": 8229999.5
+    },
+    "subtotales_calculados_y_cupo_negativo": {
+        "cliente": "Panadería La Espiga",
+        "vendedor": "Vendedor Dos",
+        "facturas_proximas": [_factura("FE005", 0, 99.4), _factura("FE011", 5, 1e6)],
+        "total_facturas": 2,
+        "total_proximas": 2,
+        "total_saldo": 1000099.4,
+        "cupo_disponible": -1000099.4
+    },
+    "caracteres_especiales": {
+        "cliente": 'Comercial {Peña} & "Hijos" \\ <b>Ltda</b> 🍞',
+        "vendedor": "{vendedor}",
+        "correo_vendedor": "ventas+{x}@ejemplo.com",
+        "facturas_vencidas": [_factura("{0}", -1, 1234.5, emision="sin fecha", vencimiento="{{}}")],
+        "facturas_no_vencidas": [_factura(12345, 45, -320000, emision="2024-12-31", vencimiento='"3/1"')],
+        "total_facturas": 2,
+        "total_vencidas": 1,
+        "total_no_vencidas": 1,
+        "total_saldo": -318765.5,
+        "cupo_disponible": 0
+    },
+    "sin_claves": {}
+}
+
+
+@pytest.fixture(scope="module")
+def legado():
+    with open(LEGADO, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+@pytest.mark.parametrize("caso", sorted(CASOS))
+def test_html_identico_al_fstring_anterior(caso, legado):
+    assert procesamiento.generar_html_recordatorio_agrupado(CASOS[caso]) == legado[caso]
+
+
+def test_render_igual_a_str_format():
+    # Literales con comillas, barras y llaves escapadas; valores con llaves
+    texto = 'a "{x}" \\n {{literal}} \'{y}\'\n{x}{y}ñ'
+    valores = {"x": "{y}", "y": 'v"\\{'}
+    plantilla = PlantillaCompilada(texto)
+    assert plantilla.render(valores) == texto.format(**valores)
+    assert plantilla.render_varios([valores, {"x": 1, "y": 2.5}]) == (
+        texto.format(**valores) + texto.format(x=1, y=2.5)
+    )
+
+
+@pytest.mark.parametrize("texto", ["{x!r}", "{x:>5}", "{x.y}", "{0}"])
+def test_rechaza_campos_no_simples(texto):
+    with pytest.raises(ValueError):
+        PlantillaCompilada(texto)
@@ -0,0 +1,68 @@
+"""Backoff, límites y presupuesto de los reintentos (reintentos.py), con azar y cola falsos."""
+
+import pytest
+
+import reintentos
+from reintentos import PoliticaReintentos, ReintentosCorrida
+
+
+class ColaInmediata:
+    """Cola de reintentos que anota la espera y ejecuta la función en el acto."""
+
+    def __init__(self):
+        self.esperas = []
+
+    def programar(self, espera, funcion):
+        self.esperas.append(espera)
+        funcion()
+
+
+@pytest.fixture
+def azar_maximo(monkeypatch):
+    """random.uniform(a, b) siempre retorna b: la espera es el tope del backoff."""
+    monkeypatch.setattr(reintentos.random, "uniform", lambda a, b: b)
+
+
+def test_backoff_exponencial_con_tope(azar_maximo):
+    politica = PoliticaReintentos(6, base=2.0, maximo=10.0)
+    assert [politica.espera(n) for n in range(1, 7)] == [2.0, 4.0, 8.0, 10.0, 10.0, 10.0]
+
+
+def test_jitter_desde_cero(monkeypatch):
+    rangos = []
+    monkeypatch.setattr(reintentos.random, "uniform", lambda a, b: rangos.append((a, b)) or a)
+    politica = PoliticaReintentos(3, base=0.5, maximo=60.0)
+    assert politica.espera(3) == 0
+    assert rangos == [(0, 2.0)]
+
+
+def test_maximo_de_intentos_por_correo(azar_maximo):
+    cola = ColaInmediata()
+    corrida = ReintentosCorrida(cola, PoliticaReintentos(2, base=1.0, maximo=60.0), presupuesto=10)
+    ejecutados = []
+
+    def reintentar(intento):
+        return corrida.programar(intento, lambda: ejecutados.append(intento) or reintentar(intento + 1))
+
+    assert reintentar(1)
+    assert ejecutados == [1, 2]
+    assert cola.esperas == [1.0, 2.0]
+    assert corrida.usados == 2
+
+
+def test_presupuesto_de_la_corrida(azar_maximo):
+    corrida = ReintentosCorrida(ColaInmediata(), PoliticaReintentos(3, base=1.0, maximo=60.0), presupuesto=2)
+    assert [corrida.programar(1, lambda: None) for _ in range(3)] == [True, True, False]
+    assert corrida.usados == 2
+
+
+def test_excepcion_registra_el_fallo_y_libera_la_espera(azar_maximo):
+    corrida = ReintentosCorrida(ColaInmediata(), PoliticaReintentos(3, base=1.0, maximo=60.0), presupuesto=5)
+    fallos = []
+
+    def explota():
+        raise RuntimeError("conexión perdida")
+
+    assert corrida.programar(1, explota, al_fallar=fallos.append)
+    corrida.esperar()
+    assert [str(error) for error in fallos] == ["conexión perdida"]
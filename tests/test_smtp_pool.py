@@ -0,0 +1,87 @@
+"""PoolSMTP contra un servidor SMTP local: reconexión tras 421 y recambio por max_mensajes."""
+
+import smtplib
+
+import pytest
+
+from smtp_pool import PoolSMTP
+
+MENSAJE = b"Subject: prueba\r\n\r\nHola\r\n"
+
+
+def _pool(servidor, **opciones):
+    return PoolSMTP(servidor.host, servidor.port, usar_tls=False, timeout=5, **opciones)
+
+
+def test_reutiliza_la_conexion(servidor_smtp):
+    pool = _pool(servidor_smtp, max_conexiones=1)
+    for i in range(3):
+        assert pool.enviar("cartera@ejemplo.com", [f"c{i}@ejemplo.com"], MENSAJE) == {}
+    pool.cerrar()
+
+    assert len(servidor_smtp.recibidos) == 3
+    assert servidor_smtp.conexiones == 1
+    assert pool.estadisticas()["conexiones_abiertas"] == 1
+
+
+def test_reconecta_tras_421(servidor_smtp):
+    pool = _pool(servidor_smtp, max_conexiones=1)
+    pool.enviar("cartera@ejemplo.com", ["antes@ejemplo.com"], MENSAJE)
+
+    servidor_smtp.respuestas.append(421)
+    assert pool.enviar("cartera@ejemplo.com", ["despues@ejemplo.com"], MENSAJE) == {}
+    pool.cerrar()
+
+    assert servidor_smtp.rechazados == 1
+    assert [destinatarios for _, destinatarios in servidor_smtp.recibidos] == [
+        ["antes@ejemplo.com"], ["despues@ejemplo.com"]
+    ]
+    # El mensaje reintentado salió por una conexión nueva
+    assert servidor_smtp.conexiones == 2
+    stats = pool.estadisticas()
+    assert stats["reconexiones"] == 1
+    assert stats["conexiones_abiertas"] == 2
+    assert stats["mensajes"] == 2
+
+
+def test_reconecta_una_sola_vez(servidor_smtp):
+    pool = _pool(servidor_smtp, max_conexiones=1)
+    servidor_smtp.respuestas.extend((421, 421))
+
+    with pytest.raises(smtplib.SMTPDataError) as error:
+        pool.enviar("cartera@ejemplo.com", ["nadie@ejemplo.com"], MENSAJE)
+    pool.cerrar()
+
+    assert error.value.smtp_code == 421
+    assert servidor_smtp.recibidos == []
+    assert pool.estadisticas()["reconexiones"] == 1
+
+
+def test_rechazo_no_descarta_la_conexion(servidor_smtp):
+    pool = _pool(servidor_smtp, max_conexiones=1)
+    servidor_smtp.respuestas.append(550)
+
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.enviar("cartera@ejemplo.com", ["rechazo@ejemplo.com"], MENSAJE)
+    pool.enviar("cartera@ejemplo.com", ["otro@ejemplo.com"], MENSAJE)
+    pool.cerrar()
+
+    stats = pool.estadisticas()
+    assert stats["reconexiones"] == 0
+    assert stats["conexiones_abiertas"] == 1
+
+
+def test_recambia_la_conexion_tras_max_mensajes(servidor_smtp):
+    pool = _pool(servidor_smtp, max_conexiones=1, max_mensajes=2)
+    for i in range(5):
+        pool.enviar("cartera@ejemplo.com", [f"c{i}@ejemplo.com"], MENSAJE)
+    pool.cerrar()
+
+    puertos = [puerto for puerto, _ in servidor_smtp.recibidos]
+    # Dos mensajes por conexión: 2 + 2 + 1
+    assert puertos[0] == puertos[1] != puertos[2] == puertos[3] != puertos[4]
+    assert servidor_smtp.conexiones == 3
+    stats = pool.estadisticas()
+    assert stats["conexiones_abiertas"] == 3
+    assert stats["conexiones_cerradas"] == 3
+    assert stats["reconexiones"] == 0
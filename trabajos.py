@@ -0,0 +1,188 @@
+"""
+Trabajos de envío en segundo plano.
+
+Cada envío corre en su propio hilo como un TrabajoEnvio. La petición HTTP
+solo recibe el id; el progreso se consulta o se recibe en streaming a
+medida que llegan los resultados por destinatario. El trabajo se puede
+pausar, reanudar o cancelar (los correos ya en vuelo terminan; los
+pendientes no se envían).
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import registro
+
+log = registro.obtener(__name__)
+
+
+class TrabajoEnvio:
+    """Estado y resultados de un envío en segundo plano."""
+
+    def __init__(self, total):
+        self.id = uuid.uuid4().hex[:12]
+        self.total = total
+        self.estado = "en_curso"
+        self.error = None
+        self.resultados = []
+        self.fallidos = []
+        self.lote = None
+        self.creado_en = datetime.now()
+        self.terminado_en = None
+
+        self._cond = threading.Condition()
+        self._continuar = threading.Event()
+        self._continuar.set()
+        self._cancelado = False
+
+    # ---- control ----
+
+    def pausar(self):
+        with self._cond:
+            if self.estado == "en_curso":
+                self.estado = "pausado"
+                self._continuar.clear()
+                self._cond.notify_all()
+
+    def reanudar(self):
+        with self._cond:
+            if self.estado == "pausado":
+                self.estado = "en_curso"
+                self._continuar.set()
+                self._cond.notify_all()
+
+    def cancelar(self):
+        with self._cond:
+            if self.terminado:
+                return
+            self._cancelado = True
+            self.estado = "cancelando"
+            self._continuar.set()
+            self._cond.notify_all()
+
+    @property
+    def cancelado(self):
+        return self._cancelado
+
+    @property
+    def terminado(self):
+        return self.estado in ("completado", "cancelado", "error")
+
+    def esperar_si_pausado(self):
+        """Bloquea mientras el trabajo esté pausado. Retorna False si fue cancelado."""
+        self._continuar.wait()
+        return not self._cancelado
+
+    # ---- progreso ----
+
+    def registrar(self, resultado, indice=None, cliente=None):
+        """
+        Agrega un resultado final. Los fallidos con `cliente` se guardan
+        (con su `indice` en el lote) para poder reenviar solo esos.
+        """
+        with self._cond:
+            self.resultados.append(resultado)
+            if cliente is not None and not resultado["success"]:
+                self.fallidos.append((indice, cliente))
+            self._cond.notify_all()
+
+    def finalizar(self, error=None):
+        with self._cond:
+            if error is not None:
+                self.estado = "error"
+                self.error = str(error)
+            else:
+                self.estado = "cancelado" if self._cancelado else "completado"
+            self.terminado_en = datetime.now()
+            self._cond.notify_all()
+
+    def resumen(self):
+        with self._cond:
+            exitosos = sum(1 for r in self.resultados if r["success"])
+            return {
+                "trabajo_id": self.id,
+                "estado": self.estado,
+                "total": self.total,
+                "procesados": len(self.resultados),
+                "exitosos": exitosos,
+                "fallidos": len(self.resultados) - exitosos,
+                "error": self.error,
+                "creado_en": self.creado_en.isoformat(timespec="seconds"),
+                "terminado_en": self.terminado_en.isoformat(timespec="seconds") if self.terminado_en else None
+            }
+
+    def eventos(self, desde=0, espera_maxima=15):
+        """
+        Genera ("resultado", indice, resultado), ("estado", None, resumen) y
+        ("latido", None, None) hasta que el trabajo termina y se entregó todo.
+
+        `desde` permite retomar un stream interrumpido sin repetir resultados.
+        """
+        siguiente = desde
+        ultimo_estado = None
+
+        while True:
+            with self._cond:
+                if siguiente >= len(self.resultados) and self.estado == ultimo_estado and not self.terminado:
+                    self._cond.wait(timeout=espera_maxima)
+                nuevos = self.resultados[siguiente:]
+                estado = self.estado
+                terminado = self.terminado
+
+            for resultado in nuevos:
+                yield "resultado", siguiente, resultado
+                siguiente += 1
+
+            if estado != ultimo_estado or terminado:
+                ultimo_estado = estado
+                yield "estado", None, self.resumen()
+            elif not nuevos:
+                yield "latido", None, None
+
+            if terminado:
+                return
+
+
+class RegistroTrabajos:
+    """Trabajos recientes por id (se descartan los terminados más antiguos)."""
+
+    def __init__(self, max_terminados=20):
+        self.max_terminados = max_terminados
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def iniciar(self, total, funcion):
+        """Crea un trabajo y ejecuta `funcion(trabajo)` en un hilo aparte."""
+        trabajo = TrabajoEnvio(total)
+
+        def _ejecutar():
+            try:
+                funcion(trabajo)
+            except Exception as e:
+                log.exception("Trabajo de envío falló", trabajo=trabajo.id)
+                trabajo.finalizar(error=e)
+            else:
+                trabajo.finalizar()
+
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._purgar()
+
+        threading.Thread(target=_ejecutar, name=f"envio-{trabajo.id}", daemon=True).start()
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def ultimo(self):
+        """El trabajo iniciado más recientemente (o None)."""
+        with self._lock:
+            return next(reversed(self._trabajos.values()), None)
+
+    def _purgar(self):
+        terminados = [t.id for t in self._trabajos.values() if t.terminado]
+        for trabajo_id in terminados[:max(0, len(terminados) - self.max_terminados)]:
+            del self._trabajos[trabajo_id]